@@ -1,164 +1,197 @@
-import pandas as pd
 import os
-
-print("Starting data_analysis.py...")
-
-# Check if transformed data exists
-input_file = "../output/transformed_uber_data.csv"
-if not os.path.exists(input_file):
-    print(f"ERROR: {input_file} not found!")
-    print("Please run data_transformation.py first to create the transformed data file.")
-    exit()
-
-# Load transformed data
-print(f"Loading data from {input_file}...")
-try:
-    df = pd.read_csv(input_file, low_memory=False)
-    print(f"✅ Loaded data with shape: {df.shape}")
-    print(f"✅ Columns available: {df.columns.tolist()}")
-except Exception as e:
-    print(f"ERROR loading data: {e}")
-    exit()
-
-print("\n" + "="*60)
-print("🚗 UBER DATA ANALYSIS RESULTS")
-print("="*60)
-
-# ANALYSIS 1: Basic Data Overview
-print("\n📊 ANALYSIS 1: Data Overview")
-print("-" * 30)
-print(f"Total rides in dataset: {len(df):,}")
-print(f"Total columns: {len(df.columns)}")
-
-# Show data sample
-print("\nData sample:")
-print(df.head())
-
-# ANALYSIS 2: Rides per day analysis
-if 'pickup_datetime' in df.columns:
-    print("\n📅 ANALYSIS 2: Daily Ride Patterns")
+import sys
+import uber_config
+
+
+def analyze(input_file=None):
+    """Print the analysis report for the transformed data. Returns the summary (None on error)."""
+    import pandas as pd
+    from uber_backend import get_backend
+    from uber_quality import quality_report, summarize_report
+
+    print("Starting data_analysis.py...")
+
+    # Check if transformed data exists
+    input_file = input_file or uber_config.transformed_file()
+    if not os.path.exists(input_file):
+        print(f"ERROR: {input_file} not found!")
+        print("Please run data_transformation.py first to create the transformed data file.")
+        return None
+
+    # Load transformed data (pandas by default, Spark with UBER_BACKEND=spark)
+    backend = get_backend()
+    print(f"Loading data from {input_file} ({backend.name} backend)...")
+    try:
+        df = backend.read_transformed(input_file)
+        summary = backend.summarize(df)
+        print(f"✅ Loaded data with shape: ({summary['rows']}, {len(summary['columns'])})")
+        print(f"✅ Columns available: {summary['columns']}")
+    except Exception as e:
+        print(f"ERROR loading data: {e}")
+        return None
+
+    print("\n" + "="*60)
+    print("🚗 UBER DATA ANALYSIS RESULTS")
+    print("="*60)
+
+    # ANALYSIS 1: Basic Data Overview
+    print("\n📊 ANALYSIS 1: Data Overview")
     print("-" * 30)
-    
-    # Convert to datetime
-    df['pickup_datetime'] = pd.to_datetime(df['pickup_datetime'], errors='coerce')
-    
-    # Check how many valid datetime entries we have
-    valid_datetimes = df['pickup_datetime'].notna().sum()
-    print(f"Valid pickup_datetime entries: {valid_datetimes:,} out of {len(df):,}")
-    
-    if valid_datetimes > 0:
-        # Create date column
-        df['date'] = df['pickup_datetime'].dt.date
-        rides_per_day = df.groupby('date').size().sort_index()
+    print(f"Total rides in dataset: {summary['rows']:,}")
+    print(f"Total columns: {len(summary['columns'])}")
+
+    # Show data sample
+    print("\nData sample:")
+    print(summary['head'])
+
+    # ANALYSIS 2: Rides per day analysis
+    if 'pickup_datetime' in summary['columns']:
+        print("\n📅 ANALYSIS 2: Daily Ride Patterns")
+        print("-" * 30)
+        
+        # Check how many valid datetime entries we have
+        valid_datetimes = summary['valid_datetimes']
+        print(f"Valid pickup_datetime entries: {valid_datetimes:,} out of {summary['rows']:,}")
+        
+        if valid_datetimes > 0:
+            rides_per_day = summary['rides_per_day']
+            
+            print(f"\nDaily ride statistics:")
+            print(f"- Total days with data: {len(rides_per_day)}")
+            print(f"- Average rides per day: {rides_per_day.mean():.1f}")
+            print(f"- Maximum rides in a day: {rides_per_day.max()}")
+            print(f"- Minimum rides in a day: {rides_per_day.min()}")
+            
+            print(f"\nFirst 10 days with ride counts:")
+            print(rides_per_day.head(10))
+            
+            print(f"\nLast 10 days with ride counts:")
+            print(rides_per_day.tail(10))
+        else:
+            print("❌ No valid pickup_datetime data available for daily analysis")
+    else:
+        print("\n❌ ANALYSIS 2: No pickup_datetime column found")
+
+    # ANALYSIS 3: Hourly patterns (if we have hour data)
+    if 'rides_per_hour' in summary:
+        print("\n🕐 ANALYSIS 3: Hourly Ride Patterns")
+        print("-" * 30)
+        
+        hourly_rides = summary['rides_per_hour']
+        print("Rides by hour of day:")
+        for hour, count in hourly_rides.items():
+            if not pd.isna(hour):
+                print(f"  {int(hour):02d}:00 - {count:,} rides")
+        
+        busiest_hour = hourly_rides.idxmax()
+        quietest_hour = hourly_rides.idxmin()
+        print(f"\nBusiest hour: {int(busiest_hour):02d}:00 ({hourly_rides.max():,} rides)")
+        print(f"Quietest hour: {int(quietest_hour):02d}:00 ({hourly_rides.min():,} rides)")
+
+    # ANALYSIS 4: Day of week patterns
+    if 'rides_per_weekday' in summary:
+        print("\n📆 ANALYSIS 4: Day of Week Patterns")
+        print("-" * 30)
         
-        print(f"\nDaily ride statistics:")
-        print(f"- Total days with data: {len(rides_per_day)}")
-        print(f"- Average rides per day: {rides_per_day.mean():.1f}")
-        print(f"- Maximum rides in a day: {rides_per_day.max()}")
-        print(f"- Minimum rides in a day: {rides_per_day.min()}")
+        daily_rides = summary['rides_per_weekday']
         
-        print(f"\nFirst 10 days with ride counts:")
-        print(rides_per_day.head(10))
+        # Order days properly
+        day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+        daily_rides_ordered = daily_rides.reindex([day for day in day_order if day in daily_rides.index])
         
-        print(f"\nLast 10 days with ride counts:")
-        print(rides_per_day.tail(10))
+        print("Rides by day of week:")
+        for day, count in daily_rides_ordered.items():
+            print(f"  {day}: {count:,} rides")
+        
+        busiest_day = daily_rides.idxmax()
+        quietest_day = daily_rides.idxmin()
+        print(f"\nBusiest day: {busiest_day} ({daily_rides.max():,} rides)")
+        print(f"Quietest day: {quietest_day} ({daily_rides.min():,} rides)")
+
+    # ANALYSIS 5: Trip duration stats (if available)
+    if 'trip_duration_mins' in summary['columns']:
+        print("\n⏱️  ANALYSIS 5: Trip Duration Analysis")
+        print("-" * 30)
+        
+        # Count non-null trip durations
+        duration_stats = summary['duration']
+        if duration_stats is not None:
+            print(f"Available trip duration data: {int(duration_stats['count']):,} rides")
+            print("\nTrip duration statistics (minutes):")
+            print(duration_stats)
+        else:
+            print("❌ No trip duration data available (all values are null)")
     else:
-        print("❌ No valid pickup_datetime data available for daily analysis")
-else:
-    print("\n❌ ANALYSIS 2: No pickup_datetime column found")
+        print("\n❌ ANALYSIS 5: No trip_duration_mins column found")
 
-# ANALYSIS 3: Hourly patterns (if we have hour data)
-if 'pickup_hour' in df.columns:
-    print("\n🕐 ANALYSIS 3: Hourly Ride Patterns")
-    print("-" * 30)
-    
-    hourly_rides = df['pickup_hour'].value_counts().sort_index()
-    print("Rides by hour of day:")
-    for hour, count in hourly_rides.items():
-        if not pd.isna(hour):
-            print(f"  {int(hour):02d}:00 - {count:,} rides")
-    
-    busiest_hour = hourly_rides.idxmax()
-    quietest_hour = hourly_rides.idxmin()
-    print(f"\nBusiest hour: {int(busiest_hour):02d}:00 ({hourly_rides.max():,} rides)")
-    print(f"Quietest hour: {int(quietest_hour):02d}:00 ({hourly_rides.min():,} rides)")
-
-# ANALYSIS 4: Day of week patterns
-if 'pickup_day_of_week' in df.columns:
-    print("\n📆 ANALYSIS 4: Day of Week Patterns")
-    print("-" * 30)
-    
-    daily_rides = df['pickup_day_of_week'].value_counts()
-    
-    # Order days properly
-    day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    daily_rides_ordered = daily_rides.reindex([day for day in day_order if day in daily_rides.index])
-    
-    print("Rides by day of week:")
-    for day, count in daily_rides_ordered.items():
-        print(f"  {day}: {count:,} rides")
-    
-    busiest_day = daily_rides.idxmax()
-    quietest_day = daily_rides.idxmin()
-    print(f"\nBusiest day: {busiest_day} ({daily_rides.max():,} rides)")
-    print(f"Quietest day: {quietest_day} ({daily_rides.min():,} rides)")
-
-# ANALYSIS 5: Trip duration stats (if available)
-if 'trip_duration_mins' in df.columns:
-    print("\n⏱️  ANALYSIS 5: Trip Duration Analysis")
-    print("-" * 30)
-    
-    # Count non-null trip durations
-    non_null_duration = df['trip_duration_mins'].notna().sum()
-    if non_null_duration > 0:
-        print(f"Available trip duration data: {non_null_duration:,} rides")
-        print("\nTrip duration statistics (minutes):")
-        print(df['trip_duration_mins'].describe())
+    # ANALYSIS 6: Data source analysis
+    if 'rides_per_source' in summary:
+        print("\n📁 ANALYSIS 6: Data Source Breakdown")
+        print("-" * 30)
+        
+        rides_by_source = summary['rides_per_source']
+        print(f"Data from {len(rides_by_source)} different files:")
+        
+        for i, (source, count) in enumerate(rides_by_source.items(), 1):
+            percentage = (count / summary['rows']) * 100
+            print(f"  {i}. {source}: {count:,} rides ({percentage:.1f}%)")
+        
+        print(f"\nLargest file: {rides_by_source.index[0]} ({rides_by_source.iloc[0]:,} rides)")
+        print(f"Smallest file: {rides_by_source.index[-1]} ({rides_by_source.iloc[-1]:,} rides)")
     else:
-        print("❌ No trip duration data available (all values are null)")
-else:
-    print("\n❌ ANALYSIS 5: No trip_duration_mins column found")
+        print("\n❌ ANALYSIS 6: No source_file information available")
 
-# ANALYSIS 6: Data source analysis
-if 'source_file' in df.columns:
-    print("\n📁 ANALYSIS 6: Data Source Breakdown")
+    # ANALYSIS 7: Data Quality Summary
+    print("\n🔍 ANALYSIS 7: Data Quality Summary")
     print("-" * 30)
-    
-    rides_by_source = df['source_file'].value_counts()
-    print(f"Data from {len(rides_by_source)} different files:")
-    
-    for i, (source, count) in enumerate(rides_by_source.items(), 1):
-        percentage = (count / len(df)) * 100
-        print(f"  {i}. {source}: {count:,} rides ({percentage:.1f}%)")
-    
-    print(f"\nLargest file: {rides_by_source.index[0]} ({rides_by_source.iloc[0]:,} rides)")
-    print(f"Smallest file: {rides_by_source.index[-1]} ({rides_by_source.iloc[-1]:,} rides)")
-else:
-    print("\n❌ ANALYSIS 6: No source_file information available")
-
-# ANALYSIS 7: Data Quality Summary
-print("\n🔍 ANALYSIS 7: Data Quality Summary")
-print("-" * 30)
-
-print(f"Dataset overview:")
-print(f"- Total rows: {len(df):,}")
-print(f"- Total columns: {len(df.columns)}")
-
-# Check for missing values in key columns
-key_columns = ['pickup_datetime', 'source_file', 'pickup_hour', 'pickup_day_of_week']
-print(f"\nMissing value analysis:")
-for col in key_columns:
-    if col in df.columns:
-        missing = df[col].isna().sum()
-        missing_pct = (missing / len(df)) * 100
-        print(f"- {col}: {missing:,} missing ({missing_pct:.1f}%)")
-
-# Memory usage
-memory_usage_mb = df.memory_usage(deep=True).sum() / 1024 / 1024
-print(f"\nMemory usage: {memory_usage_mb:.1f} MB")
-
-print("\n" + "="*60)
-print("✅ DATA ANALYSIS COMPLETED SUCCESSFULLY!")
-print("="*60)
-
-print("\n🎉 data_analysis.py completed successfully!")
\ No newline at end of file
+
+    print(f"Dataset overview:")
+    print(f"- Total rows: {summary['rows']:,}")
+    print(f"- Total columns: {len(summary['columns'])}")
+
+    # Check for missing values in key columns
+    key_columns = ['pickup_datetime', 'source_file', 'pickup_hour', 'pickup_day_of_week']
+    print(f"\nMissing value analysis:")
+    for col in key_columns:
+        if col in summary['missing']:
+            missing = summary['missing'][col]
+            missing_pct = (missing / summary['rows']) * 100
+            print(f"- {col}: {missing:,} missing ({missing_pct:.1f}%)")
+
+    # Rule results stored by data_transformation.py (see uber_quality.py)
+    try:
+        report = quality_report()
+    except Exception as e:
+        print(f"\n⚠️  Could not read quality results: {e}")
+        report = None
+    if report is not None and not report.empty:
+        print(f"\nQuality rules ({report['source_file'].nunique()} partitions checked):")
+        for _, rule in summarize_report(report).iterrows():
+            if rule['informational']:
+                print(f"ℹ️  {rule['rule']}: {rule['failed']:,} of {rule['checked']:,} rows do not hold "
+                      f"({rule['failed_pct']:.2f}%, for information only)")
+                continue
+            mark = "✅" if rule['failed'] == 0 else "⚠️ "
+            print(f"{mark} {rule['rule']}: {rule['failed']:,} of {rule['checked']:,} failed "
+                  f"({rule['failed_pct']:.2f}%)")
+        failing = report[(report['failed'] > 0) & ~report['informational']]
+        for _, row in failing.iterrows():
+            print(f"   - {row['source_file']}: {row['rule']} ({row['failed']:,} rows)")
+    elif report is not None:
+        print("\nNo quality results yet, run data_transformation.py to check the rules")
+
+    # Memory usage
+    if summary['memory_mb'] is not None:
+        print(f"\nMemory usage: {summary['memory_mb']:.1f} MB")
+
+    print("\n" + "="*60)
+    print("✅ DATA ANALYSIS COMPLETED SUCCESSFULLY!")
+    print("="*60)
+
+    print("\n🎉 data_analysis.py completed successfully!")
+    return summary
+
+
+if __name__ == "__main__":
+    if analyze() is None:
+        sys.exit(1)
@@ -1,108 +1,207 @@
-import pandas as pd
 import os
+import sys
+import uber_config
 
-print("Starting data_cleaning.py...")
-
-# Check if input file exists
-input_file = "../output/combined_uber_data.csv"
-if not os.path.exists(input_file):
-    print(f"ERROR: {input_file} not found!")
-    print("Please run load_all_excel.py first to create the combined data file.")
-    exit()
-
-# Load combined data
-print(f"Loading data from {input_file}...")
-try:
-    df = pd.read_csv(input_file, low_memory=False)
-    print(f"✅ Loaded data with shape: {df.shape}")
-    print(f"✅ Columns: {df.columns.tolist()}")
-except Exception as e:
-    print(f"ERROR loading data: {e}")
-    exit()
-
-print("\nOriginal data sample:")
-print(df.head())
-
-# Get initial data info
-initial_rows = len(df)
-print(f"\nInitial data info:")
-print(f"- Rows: {initial_rows}")
-print(f"- Columns: {len(df.columns)}")
-
-# FIX: Handle duplicate column names by making them unique
-print("\nFixing duplicate column names...")
-df.columns = pd.io.common.dedup_names(df.columns, is_potential_multiindex=False)
-print(f"✅ Fixed duplicate column names")
-
-# Now find the best DATE and TIME columns
-print("\nLooking for date and time columns...")
-date_columns = [col for col in df.columns if 'date' in col.lower() and df[col].notna().sum() > 1000]
-time_columns = [col for col in df.columns if 'time' in col.lower() and df[col].notna().sum() > 1000]
-
-print(f"Found date columns with data: {date_columns}")
-print(f"Found time columns with data: {time_columns}")
-
-# Pick the columns with the most data
-if date_columns and time_columns:
-    # Find the date and time columns with most non-null values
-    best_date_col = max(date_columns, key=lambda x: df[x].notna().sum())
-    best_time_col = max(time_columns, key=lambda x: df[x].notna().sum())
-    
-    print(f"Using date column: {best_date_col} ({df[best_date_col].notna().sum()} values)")
-    print(f"Using time column: {best_time_col} ({df[best_time_col].notna().sum()} values)")
-    
-    print("\nCleaning data...")
-    
-    # Create pickup_datetime using the best columns
-    print("Creating pickup_datetime column...")
-    df['pickup_datetime'] = pd.to_datetime(
-        df[best_date_col].astype(str) + ' ' + df[best_time_col].astype(str), 
-        errors='coerce'
-    )
-    
-    # Check how many datetime conversions worked
-    valid_datetimes = df['pickup_datetime'].notna().sum()
-    invalid_datetimes = df['pickup_datetime'].isna().sum()
-    print(f"✅ Created pickup_datetime: {valid_datetimes:,} valid, {invalid_datetimes:,} invalid")
-    
-    # Remove rows with invalid datetime
-    df = df.dropna(subset=['pickup_datetime'])
-    print(f"✅ Removed {initial_rows - len(df):,} rows with invalid datetime")
-    
-    # Remove duplicates
-    before_dedup = len(df)
-    df = df.drop_duplicates()
-    duplicates_removed = before_dedup - len(df)
-    print(f"✅ Removed {duplicates_removed:,} duplicate rows")
-    
-else:
-    print("⚠️  Warning: Could not find suitable date/time columns with sufficient data")
-    print("Available columns:", df.columns.tolist()[:10], "...")  # Show first 10
-    print("Performing basic cleaning without datetime processing...")
-    
-    # Just remove duplicates if we can't process datetime
-    before_dedup = len(df)
-    df = df.drop_duplicates()
-    duplicates_removed = before_dedup - len(df)
-    print(f"✅ Removed {duplicates_removed:,} duplicate rows")
-
-print(f"\nCleaned data sample:")
-print(df.head())
-
-print(f"\nFinal data info:")
-print(f"- Rows: {len(df):,} (reduced by {initial_rows - len(df):,})")
-print(f"- Columns: {len(df.columns)}")
-
-# Save cleaned data
-output_file = "../output/cleaned_uber_data.csv"
-try:
-    print(f"\nSaving cleaned data (this may take a few minutes for large data)...")
-    df.to_csv(output_file, index=False)
-    print(f"✅ SUCCESS: Saved cleaned data to {output_file}")
-    file_size_mb = os.path.getsize(output_file) / 1024 / 1024
-    print(f"✅ File size: {file_size_mb:.1f} MB")
-except Exception as e:
-    print(f"ERROR saving cleaned data: {e}")
-    exit()
-
-print("\n🎉 data_cleaning.py completed successfully!")
\ No newline at end of file
+
+def print_dedup_report(report):
+    keys = report['keys']
+    if keys['missing']:
+        print(f"⚠️  Dedup keys not found in the data: {keys['missing']}, comparing whole rows instead")
+    elif keys['keys']:
+        print(f"Dedup keys used: {keys['keys']}")
+        if keys['full_row_rows']:
+            print(f"⚠️  {keys['full_row_rows']:,} rows without a value for every key were compared on all columns")
+    print(f"✅ Removed {report['duplicates']:,} duplicate rows")
+    print(f"  - within the same file: {report['within_file']:,}")
+    print(f"  - across different files: {report['across_files']:,}")
+    print(f"  - already seen in earlier runs: {report['history']:,}")
+    if not report['per_file'].empty:
+        print("  Duplicates per file:")
+        print(report['per_file'].to_string())
+
+
+def record_quality_fingerprints(df):
+    # The cross-file duplicate rule (uber_quality.py) counts the trips before
+    # they are removed here
+    from uber_quality import record_input_fingerprints
+
+    try:
+        files = record_input_fingerprints(df)
+        print(f"✅ Saved duplicate fingerprints of {files} source files for the quality checks")
+    except Exception as e:
+        print(f"⚠️  Could not save duplicate fingerprints for the quality checks: {e}")
+
+
+def record_quality_invalid_datetimes(df):
+    # The invalid datetime rule (uber_quality.py) counts the rows per source
+    # file before they are removed here
+    from uber_quality import record_invalid_datetimes
+
+    try:
+        record_invalid_datetimes(df)
+        print("✅ Saved invalid datetime counts per source file for the quality checks")
+    except Exception as e:
+        print(f"⚠️  Could not save invalid datetime counts for the quality checks: {e}")
+
+
+def clean_on_backend(backend, input_file, output_file):
+    """load -> clean -> dedup on a non-pandas backend (UBER_BACKEND). Returns the output path (None on error)."""
+    from uber_dedup import keys_from_env
+
+    print(f"Loading data from {input_file} ({backend.name} backend)...")
+    try:
+        df = backend.load_csv([input_file], encoding='utf-8')
+        initial_rows = df.count()
+        print(f"✅ Loaded {initial_rows:,} rows")
+
+        df = backend.clean(df)
+        valid_rows = df.count()
+        print(f"✅ Removed {initial_rows - valid_rows:,} rows with invalid datetime")
+
+        dedup_keys = keys_from_env()
+        print(f"Finding duplicates using keys: {dedup_keys}")
+        df = backend.dedup(df, dedup_keys)
+        final_rows = df.count()
+        print(f"✅ Removed {valid_rows - final_rows:,} duplicate rows")
+        # Fingerprints of earlier runs and of the quality checks are kept by the pandas path only
+        print(f"⚠️  Duplicates of earlier runs are not removed on the {backend.name} backend")
+
+        print(f"\nSaving cleaned data...")
+        backend.write_csv(df, output_file)
+        print(f"✅ SUCCESS: Saved cleaned data to {output_file}")
+    except Exception as e:
+        print(f"ERROR cleaning data on the {backend.name} backend: {e}")
+        return None
+
+    print(f"\nFinal data info:")
+    print(f"- Rows: {final_rows:,} (reduced by {initial_rows - final_rows:,})")
+    print("\n🎉 data_cleaning.py completed successfully!")
+    return output_file
+
+
+def clean(input_file=None, output_file=None):
+    """Clean the combined data into cleaned_uber_data.csv. Returns the output path (None on error)."""
+    import pandas as pd
+    from uber_backend import get_backend, parse_pickup_datetime
+    from uber_dedup import find_duplicates, keys_from_env
+
+    print("Starting data_cleaning.py...")
+
+    # Check if input file exists
+    input_file = input_file or uber_config.combined_file()
+    if not os.path.exists(input_file):
+        print(f"ERROR: {input_file} not found!")
+        print("Please run load_all_excel.py first to create the combined data file.")
+        return None
+
+    # Spark (UBER_BACKEND=spark) runs the same stages through uber_backend.py
+    output_file = output_file or uber_config.cleaned_file()
+    backend = get_backend()
+    if backend.name != "pandas":
+        return clean_on_backend(backend, input_file, output_file)
+
+    # Load combined data
+    print(f"Loading data from {input_file}...")
+    try:
+        df = pd.read_csv(input_file, low_memory=False)
+        print(f"✅ Loaded data with shape: {df.shape}")
+        print(f"✅ Columns: {df.columns.tolist()}")
+    except Exception as e:
+        print(f"ERROR loading data: {e}")
+        return None
+
+    print("\nOriginal data sample:")
+    print(df.head())
+
+    # Get initial data info
+    initial_rows = len(df)
+    print(f"\nInitial data info:")
+    print(f"- Rows: {initial_rows}")
+    print(f"- Columns: {len(df.columns)}")
+
+    # FIX: Handle duplicate column names by making them unique
+    print("\nFixing duplicate column names...")
+    df.columns = pd.io.common.dedup_names(df.columns, is_potential_multiindex=False)
+    print(f"✅ Fixed duplicate column names")
+
+    # Now find the best DATE and TIME columns
+    print("\nLooking for date and time columns...")
+    date_columns = [col for col in df.columns if 'date' in col.lower() and df[col].notna().sum() > 1000]
+    time_columns = [col for col in df.columns if 'time' in col.lower() and df[col].notna().sum() > 1000]
+
+    print(f"Found date columns with data: {date_columns}")
+    print(f"Found time columns with data: {time_columns}")
+
+    # Pick the columns with the most data
+    if date_columns and time_columns:
+        # Find the date and time columns with most non-null values
+        best_date_col = max(date_columns, key=lambda x: df[x].notna().sum())
+        best_time_col = max(time_columns, key=lambda x: df[x].notna().sum())
+        
+        print(f"Using date column: {best_date_col} ({df[best_date_col].notna().sum()} values)")
+        print(f"Using time column: {best_time_col} ({df[best_time_col].notna().sum()} values)")
+        
+        print("\nCleaning data...")
+        
+        # Create pickup_datetime using the best columns
+        print("Creating pickup_datetime column...")
+        # Same formats as the pandas and Spark backends (uber_backend.py)
+        df['pickup_datetime'] = parse_pickup_datetime(
+            df[best_date_col].astype(str) + ' ' + df[best_time_col].astype(str)
+        )
+        
+        # Check how many datetime conversions worked
+        valid_datetimes = df['pickup_datetime'].notna().sum()
+        invalid_datetimes = df['pickup_datetime'].isna().sum()
+        print(f"✅ Created pickup_datetime: {valid_datetimes:,} valid, {invalid_datetimes:,} invalid")
+        record_quality_invalid_datetimes(df)
+        
+        # Remove rows with invalid datetime
+        df = df.dropna(subset=['pickup_datetime'])
+        print(f"✅ Removed {initial_rows - len(df):,} rows with invalid datetime")
+        
+        # Remove duplicates (fingerprints of the key columns, not every column)
+        dedup_keys = keys_from_env()
+        record_quality_fingerprints(df)
+        print(f"Finding duplicates using keys: {dedup_keys}")
+        is_duplicate, dedup_report = find_duplicates(df, keys=dedup_keys)
+        df = df[~is_duplicate]
+        print_dedup_report(dedup_report)
+        
+    else:
+        print("⚠️  Warning: Could not find suitable date/time columns with sufficient data")
+        print("Available columns:", df.columns.tolist()[:10], "...")  # Show first 10
+        print("Performing basic cleaning without datetime processing...")
+        
+        # Just remove duplicates if we can't process datetime (all columns
+        # except the source_file tag)
+        record_quality_fingerprints(df)
+        is_duplicate, dedup_report = find_duplicates(df, keys=None)
+        df = df[~is_duplicate]
+        print_dedup_report(dedup_report)
+
+    print(f"\nCleaned data sample:")
+    print(df.head())
+
+    print(f"\nFinal data info:")
+    print(f"- Rows: {len(df):,} (reduced by {initial_rows - len(df):,})")
+    print(f"- Columns: {len(df.columns)}")
+
+    # Save cleaned data
+    try:
+        print(f"\nSaving cleaned data (this may take a few minutes for large data)...")
+        df.to_csv(output_file, index=False)
+        print(f"✅ SUCCESS: Saved cleaned data to {output_file}")
+        file_size_mb = os.path.getsize(output_file) / 1024 / 1024
+        print(f"✅ File size: {file_size_mb:.1f} MB")
+    except Exception as e:
+        print(f"ERROR saving cleaned data: {e}")
+        return None
+
+    print("\n🎉 data_cleaning.py completed successfully!")
+    return output_file
+
+
+if __name__ == "__main__":
+    if clean() is None:
+        sys.exit(1)
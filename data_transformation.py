@@ -1,113 +1,226 @@
-import pandas as pd
 import os
+import sys
+import uber_config
+
+
+def transform_on_pandas(input_file, output_file):
+    """Transform input_file in partitions and write output_file. Returns the transformed frame (None on error)."""
+    import pandas as pd
+    from uber_transform_engine import run_partitioned, combine_parts
+
+    # Load the data CSV
+    print(f"Loading data from {input_file}...")
+    try:
+        df = pd.read_csv(input_file, low_memory=False)
+        print(f"✅ Loaded data with shape: {df.shape}")
+    except Exception as e:
+        print(f"ERROR loading data: {e}")
+        return None
+
+    # Check columns available
+    print(f"✅ Columns in the dataset: {df.columns.tolist()}")
+    input_column_count = len(df.columns)
+
+    # Transform data based on what columns we have
+    if 'pickup_datetime' in df.columns:
+        print("✅ pickup_datetime column already exists")
+    elif 'DATE' in df.columns and 'TIME' in df.columns:
+        print("Creating pickup_datetime from DATE and TIME columns...")
+    else:
+        print("⚠️  Warning: No date/time columns found for pickup_datetime")
+        print("Available columns:", df.columns.tolist())
+
+    # Transform each partition (source file or month) in its own process
+    partition_by = os.environ.get("UBER_PARTITION_BY", "source_file")
+    workers = int(os.environ.get("UBER_TRANSFORM_WORKERS", "0")) or None
+    print(f"\nTransforming partitions by {partition_by} (workers: {workers or os.cpu_count()})...")
+    try:
+        results = run_partitioned(df, by=partition_by, workers=workers)
+    except Exception as e:
+        print(f"ERROR transforming data: {e}")
+        return None
+    del df
+
+    for key, _, part in results:
+        print(f"  ✅ {key}: {len(part):,} rows")
+    df = pd.concat([part for _, _, part in results], ignore_index=True)
 
-print("Starting data_transformation.py...")
-
-# Check if input file exists (can use either combined or cleaned data)
-cleaned_file = "../output/cleaned_uber_data.csv"
-combined_file = "../output/combined_uber_data.csv"
-
-# Try to use cleaned data first, fall back to combined data
-if os.path.exists(cleaned_file):
-    input_file = cleaned_file
-    print(f"Using cleaned data: {input_file}")
-elif os.path.exists(combined_file):
-    input_file = combined_file
-    print(f"Using combined data: {input_file}")
-    print("⚠️  Recommendation: Run data_cleaning.py first for better results")
-else:
-    print("ERROR: No input data found!")
-    print("Please run load_all_excel.py (and optionally data_cleaning.py) first.")
-    exit()
-
-# Load the data CSV
-print(f"Loading data from {input_file}...")
-try:
-    df = pd.read_csv(input_file, low_memory=False)
-    print(f"✅ Loaded data with shape: {df.shape}")
-except Exception as e:
-    print(f"ERROR loading data: {e}")
-    exit()
-
-# Check columns available
-print(f"✅ Columns in the dataset: {df.columns.tolist()}")
-
-# Transform data based on what columns we have
-if 'pickup_datetime' in df.columns:
-    print("✅ pickup_datetime column already exists")
-    
-    # Ensure it's in datetime format
-    df['pickup_datetime'] = pd.to_datetime(df['pickup_datetime'], errors='coerce')
-    valid_datetime = df['pickup_datetime'].notna().sum()
-    print(f"✅ Validated pickup_datetime: {valid_datetime} valid entries")
-    
-elif 'DATE' in df.columns and 'TIME' in df.columns:
-    print("Creating pickup_datetime from DATE and TIME columns...")
-    
-    # Create pickup_datetime column by combining DATE and TIME
-    df['pickup_datetime'] = pd.to_datetime(df['DATE'] + ' ' + df['TIME'], errors='coerce')
-    
-    # Check conversion success
     valid_datetime = df['pickup_datetime'].notna().sum()
     invalid_datetime = df['pickup_datetime'].isna().sum()
-    print(f"✅ Created pickup_datetime: {valid_datetime} valid, {invalid_datetime} invalid")
-    
-else:
-    print("⚠️  Warning: No date/time columns found for pickup_datetime")
-    print("Available columns:", df.columns.tolist())
-    # Create a placeholder pickup_datetime
-    df['pickup_datetime'] = pd.NaT
-
-# Add additional transformed columns
-print("\nAdding additional columns...")
-
-# Since there is no dropoff time in the data, create placeholder columns
-df['dropoff_datetime'] = pd.NaT
-print("✅ Added dropoff_datetime (placeholder)")
-
-df['trip_duration_mins'] = None
-print("✅ Added trip_duration_mins (placeholder)")
-
-# Add some useful derived columns if we have pickup_datetime
-if 'pickup_datetime' in df.columns and df['pickup_datetime'].notna().sum() > 0:
-    print("Creating additional time-based columns...")
-    
-    # Extract date components
-    df['pickup_date'] = df['pickup_datetime'].dt.date
-    df['pickup_hour'] = df['pickup_datetime'].dt.hour
-    df['pickup_day_of_week'] = df['pickup_datetime'].dt.day_name()
-    df['pickup_month'] = df['pickup_datetime'].dt.month
-    
+    print(f"✅ pickup_datetime: {valid_datetime} valid, {invalid_datetime} invalid")
+    print("✅ Added dropoff_datetime (placeholder)")
+    print("✅ Added trip_duration_mins (placeholder)")
     print("✅ Added pickup_date, pickup_hour, pickup_day_of_week, pickup_month")
 
-# Show sample of the transformed data
-print("\nSample of transformed data:")
-key_columns = ['pickup_datetime', 'dropoff_datetime', 'trip_duration_mins']
-# Only show columns that exist
-display_columns = [col for col in key_columns if col in df.columns]
-if len(display_columns) > 0:
-    print(df[display_columns].head())
-
-# Show additional columns if they exist
-if 'pickup_date' in df.columns:
-    print("\nTime-based columns sample:")
-    time_columns = ['pickup_date', 'pickup_hour', 'pickup_day_of_week', 'pickup_month']
-    display_time_columns = [col for col in time_columns if col in df.columns]
-    print(df[display_time_columns].head())
-
-print(f"\nTransformed data info:")
-print(f"- Rows: {len(df)}")
-print(f"- Columns: {len(df.columns)}")
-print(f"- New columns added: {len(df.columns) - len(pd.read_csv(input_file, nrows=0).columns)}")
-
-# Save transformed data
-output_file = "../output/transformed_uber_data.csv"
-try:
-    df.to_csv(output_file, index=False)
-    print(f"\n✅ SUCCESS: Saved transformed data to {output_file}")
-    print(f"✅ File size: {os.path.getsize(output_file)} bytes")
-except Exception as e:
-    print(f"ERROR saving transformed data: {e}")
-    exit()
-
-print("\n🎉 data_transformation.py completed successfully!")
\ No newline at end of file
+    # Show sample of the transformed data
+    print("\nSample of transformed data:")
+    key_columns = ['pickup_datetime', 'dropoff_datetime', 'trip_duration_mins']
+    # Only show columns that exist
+    display_columns = [col for col in key_columns if col in df.columns]
+    if len(display_columns) > 0:
+        print(df[display_columns].head())
+
+    # Show additional columns if they exist
+    if 'pickup_date' in df.columns:
+        print("\nTime-based columns sample:")
+        time_columns = ['pickup_date', 'pickup_hour', 'pickup_day_of_week', 'pickup_month']
+        display_time_columns = [col for col in time_columns if col in df.columns]
+        print(df[display_time_columns].head())
+
+    print(f"\nTransformed data info:")
+    print(f"- Rows: {len(df)}")
+    print(f"- Columns: {len(df.columns)}")
+    print(f"- New columns added: {len(df.columns) - input_column_count}")
+
+    # Save transformed data (the partitions are already written, just join them)
+    try:
+        combine_parts([path for _, path, _ in results], output_file)
+        print(f"\n✅ SUCCESS: Saved transformed data to {output_file}")
+        print(f"✅ File size: {os.path.getsize(output_file)} bytes")
+    except Exception as e:
+        print(f"ERROR saving transformed data: {e}")
+        return None
+    return df
+
+
+def transform_on_backend(backend, input_file, output_file):
+    """clean -> derive on a non-pandas backend. Returns the transformed frame (None on error).
+
+    The steps after the transformation (sample, quality, rollups, snapshot)
+    run on pandas, so the written file is read back for them.
+    """
+    import pandas as pd
+    from uber_transform_engine import transform_frame
+
+    print(f"Loading data from {input_file} ({backend.name} backend)...")
+    try:
+        df = backend.derive(backend.clean(backend.load_csv([input_file], encoding='utf-8')))
+        backend.write_csv(df, output_file)
+        print(f"\n✅ SUCCESS: Saved transformed data to {output_file}")
+        print(f"✅ File size: {os.path.getsize(output_file)} bytes")
+    except Exception as e:
+        print(f"ERROR transforming data on the {backend.name} backend: {e}")
+        return None
+
+    # Same column types as the pandas path for the steps below
+    df = transform_frame(pd.read_csv(output_file, low_memory=False))
+    print(f"✅ Transformed {len(df):,} rows with valid pickup_datetime")
+    return df
+
+
+def transform(input_file=None, output_file=None):
+    """Transform the cleaned (or combined) data. Returns the output path (None on error)."""
+    from uber_backend import get_backend
+    from uber_snapshot import new_version, publish_version, write_snapshot
+    from uber_warmup import start_warmup
+    from uber_rollups import update_rollups
+    from uber_sample import write_sample
+    from uber_quality import record_input_fingerprints, record_invalid_datetimes, update_quality
+
+    print("Starting data_transformation.py...")
+
+    # Check if input file exists (can use either combined or cleaned data)
+    cleaned_file = uber_config.cleaned_file()
+    combined_file = uber_config.combined_file()
+
+    # Try to use cleaned data first, fall back to combined data
+    if input_file:
+        print(f"Using data: {input_file}")
+    elif os.path.exists(cleaned_file):
+        input_file = cleaned_file
+        print(f"Using cleaned data: {input_file}")
+    elif os.path.exists(combined_file):
+        input_file = combined_file
+        print(f"Using combined data: {input_file}")
+        print("⚠️  Recommendation: Run data_cleaning.py first for better results")
+    else:
+        print("ERROR: No input data found!")
+        print("Please run load_all_excel.py (and optionally data_cleaning.py) first.")
+        return None
+
+    # Data that did not go through data_cleaning.py still has its duplicates,
+    # so the cross-file duplicate check counts them from this data
+    cleaned_input = os.path.abspath(input_file) == os.path.abspath(cleaned_file)
+
+    # Spark (UBER_BACKEND=spark) runs the same stages through uber_backend.py
+    output_file = output_file or uber_config.transformed_file()
+    backend = get_backend()
+    if backend.name == "pandas":
+        df = transform_on_pandas(input_file, output_file)
+    else:
+        df = transform_on_backend(backend, input_file, output_file)
+    if df is None:
+        return None
+
+    # The version published at the end; files read per version are written
+    # under it first
+    version = new_version()
+
+    # Stratified trip sample for the dashboard map and previews (written before
+    # publishing, so a dashboard that sees the new version also sees it)
+    try:
+        kept = write_sample(df, version)
+        print(f"✅ Trip sample: {kept:,} rows kept by date, hour and source file")
+    except Exception as e:
+        print(f"⚠️  Could not write trip sample: {e}")
+
+    # Data-quality rules (only partitions that changed are checked; written
+    # before publishing for the same reason as the sample)
+    try:
+        if not cleaned_input:
+            record_input_fingerprints(df)
+            record_invalid_datetimes(df)
+        quality = update_quality(df, prune_missing=True)
+        print(f"✅ Quality checks: {len(quality['checked'])} partitions checked, "
+              f"{len(quality['skipped'])} unchanged, {len(quality['removed'])} removed")
+    except Exception as e:
+        print(f"⚠️  Could not run quality checks: {e}")
+
+    # Refresh the time rollups (only partitions that changed are rebuilt)
+    try:
+        rollups = update_rollups(df, prune_missing=True)
+        print(f"✅ Time rollups: {len(rollups['rebuilt'])} partitions rebuilt, "
+              f"{len(rollups['skipped'])} unchanged, {len(rollups['removed'])} removed")
+    except Exception as e:
+        print(f"⚠️  Could not update time rollups: {e}")
+
+    # Publish: bump the data version last, so everything above is in place
+    # when readers keyed on the version (dashboard, API) see the new data
+    published = False
+    try:
+        write_snapshot(df, version=version)
+        published = True
+        print(f"✅ Published dashboard snapshot version {version}")
+    except ImportError:
+        publish_version(version=version)
+        published = True
+        print(f"⚠️  pyarrow not installed, skipping dashboard snapshot (dashboard will read the CSV); "
+              f"published data version {version}")
+    except Exception as e:
+        # The trips are still new, so readers keyed on the version must see
+        # them; without a snapshot the dashboard reads the CSV
+        print(f"⚠️  Could not write dashboard snapshot: {e}")
+        try:
+            publish_version(version=version)
+            published = True
+            print(f"✅ Published data version {version} without a snapshot")
+        except Exception as e:
+            print(f"⚠️  Could not publish data version: {e}")
+
+    # Precompute the dashboard's default views in the background
+    if published:
+        try:
+            worker = start_warmup(version)
+            if worker is not None:
+                print(f"✅ Started dashboard warm-up (process {worker.pid})")
+        except Exception as e:
+            print(f"⚠️  Could not start dashboard warm-up: {e}")
+
+    print("\n🎉 data_transformation.py completed successfully!")
+    return output_file
+
+
+# The guard keeps worker processes (spawned on Windows) from re-running the script
+if __name__ == "__main__":
+    if transform() is None:
+        sys.exit(1)
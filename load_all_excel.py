@@ -1,68 +1,93 @@
-import pandas as pd
 import os
+import sys
+import uber_config
 
-print("Starting load_all_excel.py...")
 
-# Check and create output directory if needed
-output_dir = "../output"
-if not os.path.exists(output_dir):
-    os.makedirs(output_dir)
-    print(f"Created output directory: {output_dir}")
+def load_all(data_folder=None, output_dir=None):
+    """Combine every source file in data_folder into combined_uber_data.csv. Returns the output path (None on error)."""
+    import pandas as pd
+    from uber_ingest import ingest_report, list_sources, read_source
 
-data_folder = "../data"
+    print("Starting load_all_excel.py...")
+    data_folder = data_folder or uber_config.data_dir()
+    output_dir = output_dir or uber_config.output_dir()
 
-# Check if data folder exists
-if not os.path.exists(data_folder):
-    print(f"ERROR: Data folder '{data_folder}' does not exist!")
-    print("Make sure your CSV files are in the '../data' folder")
-    exit()
+    # Check and create output directory if needed
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+        print(f"Created output directory: {output_dir}")
 
-# List all CSV files in data folder
-all_files = [f for f in os.listdir(data_folder) if f.endswith('.csv')]
+    # Check if data folder exists
+    if not os.path.exists(data_folder):
+        print(f"ERROR: Data folder '{data_folder}' does not exist!")
+        print(f"Make sure your data files are in the '{data_folder}' folder")
+        return None
 
-if not all_files:
-    print(f"ERROR: No CSV files found in {data_folder}")
-    print("Make sure you have CSV files in the data folder")
-    exit()
+    # List all data files (.csv, .csv.gz, .csv.zst, .zip, .xlsx) in data folder
+    all_files = list_sources(data_folder)
 
-print(f"Found {len(all_files)} CSV files: {all_files}")
+    if not all_files:
+        print(f"ERROR: No data files found in {data_folder}")
+        print("Make sure you have CSV (optionally compressed), zip or xlsx files in the data folder")
+        return None
 
-df_list = []
+    print(f"Found {len(all_files)} data files: {all_files}")
 
-for file in all_files:
-    file_path = os.path.join(data_folder, file)
-    print(f"Loading {file_path}...")
+    df_list = []
+    ingest_stats = []
+
+    for file in all_files:
+        file_path = os.path.join(data_folder, file)
+        print(f"Loading {file_path}...")
+        try:
+            # Compressed files are streamed, never unpacked to disk (see uber_ingest.py)
+            for source_file, df, stats in read_source(file_path):
+                df['source_file'] = source_file  # track origin file
+                df_list.append(df)
+                ingest_stats.append(stats)
+                print(f"  ✅ Successfully loaded {len(df)} rows from {source_file}")
+        except Exception as e:
+            print(f"  ❌ Error loading {file}: {e}")
+
+    if not df_list:
+        print("ERROR: No files were loaded successfully!")
+        return None
+
+    # Ingest report: MB/s read from disk (compressed) and MB/s parsed (uncompressed)
+    report = ingest_report(ingest_stats)
+    print("\nIngest report:")
+    print(report.to_string(index=False, float_format=lambda v: f"{v:,.2f}"))
+    total_seconds = max(report['seconds'].sum(), 1e-9)
+    print(f"Total: {report['compressed_mb'].sum():,.1f} MB on disk, "
+          f"{report['uncompressed_mb'].sum():,.1f} MB of CSV, "
+          f"{report['compressed_mb'].sum() / total_seconds:,.1f} MB/s compressed, "
+          f"{report['uncompressed_mb'].sum() / total_seconds:,.1f} MB/s uncompressed")
+
+    # Combine all DataFrames
+    print("\nCombining all data...")
+    combined_df = pd.concat(df_list, ignore_index=True)
+
+    print(f"✅ Combined data shape: {combined_df.shape}")
+    print(f"✅ Total columns: {len(combined_df.columns)}")
+    print(f"✅ Column names: {combined_df.columns.tolist()}")
+
+    print("\nFirst 5 rows of combined data:")
+    print(combined_df.head())
+
+    # Save combined data
+    output_file = os.path.join(output_dir, "combined_uber_data.csv")
     try:
-        df = pd.read_csv(file_path, encoding='latin1')  # use latin1 encoding
-        df['source_file'] = file  # track origin file
-        df_list.append(df)
-        print(f"  ✅ Successfully loaded {len(df)} rows from {file}")
+        combined_df.to_csv(output_file, index=False)
+        print(f"\n✅ SUCCESS: Saved combined data to {output_file}")
+        print(f"✅ File size: {os.path.getsize(output_file)} bytes")
     except Exception as e:
-        print(f"  ❌ Error loading {file}: {e}")
-
-if not df_list:
-    print("ERROR: No files were loaded successfully!")
-    exit()
-
-# Combine all DataFrames
-print("\nCombining all data...")
-combined_df = pd.concat(df_list, ignore_index=True)
-
-print(f"✅ Combined data shape: {combined_df.shape}")
-print(f"✅ Total columns: {len(combined_df.columns)}")
-print(f"✅ Column names: {combined_df.columns.tolist()}")
-
-print("\nFirst 5 rows of combined data:")
-print(combined_df.head())
-
-# Save combined data
-output_file = os.path.join(output_dir, "combined_uber_data.csv")
-try:
-    combined_df.to_csv(output_file, index=False)
-    print(f"\n✅ SUCCESS: Saved combined data to {output_file}")
-    print(f"✅ File size: {os.path.getsize(output_file)} bytes")
-except Exception as e:
-    print(f"❌ ERROR saving file: {e}")
-    exit()
-
-print("\n🎉 load_all_excel.py completed successfully!")
\ No newline at end of file
+        print(f"❌ ERROR saving file: {e}")
+        return None
+
+    print("\n🎉 load_all_excel.py completed successfully!")
+    return output_file
+
+
+if __name__ == "__main__":
+    if load_all() is None:
+        sys.exit(1)
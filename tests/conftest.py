@@ -0,0 +1,10 @@
+# Shared test setup: import the scripts from the repository root and send every
+# output (snapshots, caches, databases) to a temporary folder. Modules read
+# their paths when they are imported, so this runs before any test module.
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["UBER_OUTPUT_DIR"] = tempfile.mkdtemp(prefix="uber-tests-")
+os.environ["UBER_WARMUP"] = "0"
@@ -0,0 +1,112 @@
+import gzip
+import json
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("flask")
+
+from uber_api import GZIP_MIN_BYTES, create_app
+from uber_rollups import update_rollups
+from uber_snapshot import publish_version
+
+
+def trips():
+    """One trip at 08:15 on each of 30 days (a.csv), plus evening trips on Monday 2014-07-07 (b.csv)"""
+    days = pd.date_range("2014-07-01 08:15", periods=30, freq="D")
+    evening = pd.to_datetime(["2014-07-07 20:05", "2014-07-07 21:40", "2014-07-07 23:59"])
+    return pd.DataFrame({
+        "pickup_datetime": list(days) + list(evening),
+        "source_file": ["a.csv"] * len(days) + ["b.csv"] * len(evening),
+    })
+
+
+@pytest.fixture
+def api(tmp_path):
+    db_path = str(tmp_path / "uber_data.db")
+    snapshot_dir = str(tmp_path / "snapshot")
+    update_rollups(trips(), db_path=db_path)
+    publish_version(snapshot_dir)
+    app = create_app(db_path=db_path, snapshot_dir=snapshot_dir)
+    return app.test_client(), db_path, snapshot_dir
+
+
+def data(response):
+    return json.loads(response.get_data())["data"]
+
+
+def test_etag_gives_304_until_the_data_changes(api):
+    client, db_path, snapshot_dir = api
+    first = client.get("/api/trips/by-hour")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and first.headers["Cache-Control"] == "no-cache"
+
+    again = client.get("/api/trips/by-hour", headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.get_data() == b""
+    assert again.headers["ETag"] == etag
+    # Other filters are another resource with another ETag
+    other = client.get("/api/trips/by-hour?hour_from=20", headers={"If-None-Match": etag})
+    assert other.status_code == 200 and other.headers["ETag"] != etag
+
+    # New data published: the old ETag no longer matches and the counts are new
+    update_rollups(pd.concat([trips(), pd.DataFrame({
+        "pickup_datetime": pd.to_datetime(["2014-07-02 20:30"]), "source_file": ["c.csv"],
+    })]), db_path=db_path)
+    version = publish_version(snapshot_dir)
+    changed = client.get("/api/trips/by-hour", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+    assert json.loads(changed.get_data())["version"] == version
+    assert {row["hour"]: row["trips"] for row in data(changed)}[20] == 2
+
+
+def test_gzip_only_for_clients_that_accept_it_and_large_bodies(api):
+    client, _, _ = api
+    plain = client.get("/api/trips/by-day")
+    assert len(plain.get_data()) >= GZIP_MIN_BYTES
+    assert "Content-Encoding" not in plain.headers
+    assert plain.headers["Vary"] == "Accept-Encoding"
+
+    zipped = client.get("/api/trips/by-day", headers={"Accept-Encoding": "gzip, deflate"})
+    assert zipped.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(zipped.get_data()) == plain.get_data()
+
+    # Below the threshold the body is sent as it is
+    small = client.get("/api/trips/by-source", headers={"Accept-Encoding": "gzip"})
+    assert len(small.get_data()) < GZIP_MIN_BYTES
+    assert "Content-Encoding" not in small.headers
+    assert data(small) == [{"source_file": "a.csv", "trips": 30}, {"source_file": "b.csv", "trips": 3}]
+
+
+def test_hour_date_and_source_filters(api):
+    client, _, _ = api
+    evening = client.get("/api/trips/by-hour?hour_from=20&hour_to=23")
+    assert data(evening) == [{"hour": 20, "trips": 1}, {"hour": 21, "trips": 1}, {"hour": 23, "trips": 1}]
+
+    # 2014-07-07 is a Monday; the 08:15 trip of a.csv is outside the hours
+    weekdays = client.get("/api/trips/by-weekday?hour_from=20")
+    assert data(weekdays) == [{"weekday": "Monday", "trips": 3}]
+
+    one_week = client.get("/api/trips/by-weekday?start=2014-07-07&end=2014-07-13&source=a.csv")
+    assert [row["trips"] for row in data(one_week)] == [1] * 7
+    assert data(one_week)[0] == {"weekday": "Monday", "trips": 1}
+    filters = json.loads(one_week.get_data())["filters"]
+    assert filters == {"start": "2014-07-07", "end": "2014-07-13", "hour_from": 0, "hour_to": 23,
+                       "source": ["a.csv"]}
+
+
+@pytest.mark.parametrize("query", [
+    "hour_from=24", "hour_to=-1", "hour_from=x", "hour_from=9&hour_to=8", "start=2014-13-01", "end=yesterday",
+])
+def test_bad_filters_are_400(api, query):
+    client, _, _ = api
+    response = client.get(f"/api/trips/by-hour?{query}")
+    assert response.status_code == 400
+    assert "error" in json.loads(response.get_data())
+
+
+def test_unknown_grouping_is_404(api):
+    client, _, _ = api
+    response = client.get("/api/trips/by-month")
+    assert response.status_code == 404
+    assert json.loads(response.get_data())["error"].startswith("Unknown grouping 'month'")
+    assert client.get("/api/nothing").status_code == 404
@@ -0,0 +1,79 @@
+import os
+
+import pandas as pd
+import pytest
+
+import data_cleaning
+import uber_dedup
+from uber_backend import PandasBackend, compare_summaries, get_backend, run_stages
+from uber_benchmark import make_trips
+
+
+@pytest.fixture
+def trip_files(tmp_path):
+    """Per-file CSVs like bench_backend writes, with repeats, other formats and bad rows"""
+    trips = make_trips(4000, n_files=4)
+    # About 1% of trips appear a second time in another file
+    repeats = trips.sample(frac=0.01, random_state=1)
+    repeats["source_file"] = repeats["source_file"].str.replace(".csv", "-copy.csv", regex=False)
+    # One file with 12-hour times and one with dotted dates, as in the raw data
+    ampm = trips[trips["source_file"] == "synthetic-00.csv"].copy()
+    times = pd.to_datetime(ampm["TIME"], format="%H:%M:%S")
+    ampm["TIME"] = times.dt.strftime("%I:%M:%S %p")
+    dotted = trips[trips["source_file"] == "synthetic-01.csv"].copy()
+    dotted["DATE"] = pd.to_datetime(dotted["DATE"], format="%m/%d/%Y").dt.strftime("%Y.%m.%d")
+    trips = pd.concat([trips[~trips["source_file"].isin(["synthetic-00.csv", "synthetic-01.csv"])],
+                       ampm, dotted, repeats], ignore_index=True)
+    trips.loc[trips.index[:5], "TIME"] = "not a time"
+
+    paths = []
+    for name, part in trips.groupby("source_file"):
+        path = tmp_path / name
+        part.drop(columns=["source_file"]).to_csv(path, index=False)
+        paths.append(str(path))
+    return trips, paths
+
+
+def test_pandas_backend_matches_data_cleaning(trip_files, tmp_path):
+    trips, paths = trip_files
+    combined = tmp_path / "combined.csv"
+    trips.to_csv(combined, index=False)
+    if os.path.exists(uber_dedup.FINGERPRINT_FILE):
+        os.remove(uber_dedup.FINGERPRINT_FILE)
+
+    cleaned_file = data_cleaning.clean(str(combined), str(tmp_path / "cleaned.csv"))
+    cleaned = pd.read_csv(cleaned_file, low_memory=False)
+
+    backend = PandasBackend()
+    df = backend.dedup(backend.clean(backend.load_csv(paths)), uber_dedup.keys_from_env())
+
+    assert len(df) == len(cleaned) == len(trips) - 5 - len(trips[trips["source_file"].str.endswith("-copy.csv")])
+    expected = pd.to_datetime(cleaned["pickup_datetime"]).sort_values().reset_index(drop=True)
+    actual = df["pickup_datetime"].sort_values().reset_index(drop=True)
+    pd.testing.assert_series_equal(actual, expected, check_names=False)
+
+
+def test_spark_backend_matches_pandas(trip_files):
+    pytest.importorskip("pyspark")
+    _, paths = trip_files
+    spark = get_backend("spark")
+
+    expected = run_stages(PandasBackend(), paths)
+    actual = run_stages(spark, paths)
+
+    assert compare_summaries(expected, actual) == []
+    assert expected["rows"] > 0
+
+
+def test_spark_dedup_keeps_the_rows_pandas_keeps(trip_files):
+    pytest.importorskip("pyspark")
+    _, paths = trip_files
+    spark = get_backend("spark")
+    pandas_backend = PandasBackend()
+
+    expected = pandas_backend.dedup(pandas_backend.clean(pandas_backend.load_csv(paths)))
+    actual = spark.dedup(spark.clean(spark.load_csv(paths))).toPandas()
+
+    # The copies are loaded first, so both keep the copy and drop the original
+    assert actual["source_file"].value_counts().to_dict() == expected["source_file"].value_counts().to_dict()
+    assert not any(column.startswith("__") for column in actual.columns)
@@ -0,0 +1,199 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from uber_db_sink import INSERT_ROWS, TABLE, DatabaseSink, MySQLSink, ParallelWriter, SqliteSink, write_frames
+
+
+def trips(n_rows, seed=0):
+    """Chunk shaped like the transformed data, with a few missing values"""
+    rng = np.random.default_rng(seed)
+    pickup = pd.Series(np.datetime64("2014-07-01T00:00:00")
+                       + rng.integers(0, 90 * 24 * 3600, n_rows).astype("timedelta64[s]"))
+    hour = pd.array(pickup.dt.hour, dtype="Int8")
+    hour[0] = pd.NA
+    return pd.DataFrame({
+        "pickup_datetime": pickup,
+        "pickup_date": [ts.date() for ts in pickup],
+        "pickup_hour": hour,
+        "pickup_day_of_week": pd.Categorical(pickup.dt.day_name()),
+        "pickup_month": pickup.dt.month.astype(np.int8),
+        "pick_up_address": [f"{n} Main St, NY" for n in rng.integers(1, 500, n_rows)],
+        "source_file": np.where(rng.random(n_rows) < 0.5, "a.csv", None),
+    })
+
+
+@pytest.fixture
+def sqlite_sink(tmp_path):
+    sink = SqliteSink(str(tmp_path / "trips.db"))
+    sink.create_table()
+    yield sink
+    sink.close()
+
+
+def test_sqlite_write_frames_counts_and_types(sqlite_sink):
+    chunks = [trips(700, seed=i) for i in range(5)]
+    progress = []
+
+    written = write_frames(iter(chunks), sqlite_sink, writers=4, on_progress=progress.append)
+
+    assert written == sqlite_sink.count() == 3500
+    assert progress == [700, 1400, 2100, 2800, 3500]
+    conn = sqlite_sink._connection()
+    types = dict(conn.execute(
+        f"SELECT 'hour', typeof(pickup_hour) FROM {TABLE} WHERE id = 2 UNION ALL "
+        f"SELECT 'month', typeof(pickup_month) FROM {TABLE} WHERE id = 2 UNION ALL "
+        f"SELECT 'datetime', typeof(pickup_datetime) FROM {TABLE} WHERE id = 2 UNION ALL "
+        f"SELECT 'date', typeof(pickup_date) FROM {TABLE} WHERE id = 2"
+    ).fetchall())
+    assert types == {"hour": "integer", "month": "integer", "datetime": "text", "date": "text"}
+    # Missing values are stored as NULL, not as 'nan' or '<NA>'
+    assert conn.execute(f"SELECT COUNT(*) FROM {TABLE} WHERE pickup_hour IS NULL").fetchone()[0] == 5
+    missing_source = sum(int(chunk["source_file"].isna().sum()) for chunk in chunks)
+    assert conn.execute(f"SELECT COUNT(*) FROM {TABLE} WHERE source_file IS NULL").fetchone()[0] == missing_source
+    first = chunks[0].iloc[1]
+    assert conn.execute(f"SELECT pickup_datetime, pickup_date, pickup_day_of_week FROM {TABLE} WHERE id = 2"
+                        ).fetchone() == (str(first["pickup_datetime"]), str(first["pickup_date"]),
+                                         first["pickup_day_of_week"])
+
+
+def test_parallel_writer_reraises_writer_errors(sqlite_sink):
+    writer = ParallelWriter(sqlite_sink, writers=2)
+    writer.put(trips(10))
+    writer.put(trips(10).rename(columns={"pickup_hour": "no_such_column"}))
+    with pytest.raises(Exception, match="no_such_column"):
+        writer.close()
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.description = None
+
+    def execute(self, sql, params=None):
+        statement = {"sql": sql, "params": params}
+        if sql.startswith("LOAD DATA"):
+            # The CSV is removed after the statement, so read it now
+            with open(params[0], encoding="utf-8") as f:
+                statement["file"] = f.read()
+        if self.connection.fail:
+            raise RuntimeError("server went away")
+        self.connection.statements.append(statement)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """Just enough of a DB-API connection for MySQLSink.write_frame"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.statements = []
+        self.commits = self.rollbacks = self.closes = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closes += 1
+
+
+class FakePool:
+    def __init__(self, fail=False):
+        self.connections = []
+        self.fail = fail
+
+    def get_connection(self):
+        conn = FakeConnection(self.fail)
+        self.connections.append(conn)
+        return conn
+
+
+def fake_mysql_sink(bulk, fail=False):
+    # Skip __init__, which would open a real mysql-connector pool
+    sink = MySQLSink.__new__(MySQLSink)
+    sink.bulk = bulk
+    sink.database = "uber"
+    sink.host = "localhost"
+    sink.max_writers = 3
+    sink.pool = FakePool(fail)
+    return sink
+
+
+def test_mysql_insert_batches_rows():
+    sink = fake_mysql_sink("insert")
+    frame = trips(INSERT_ROWS * 2 + 5)
+
+    assert sink.write_frame(frame) == len(frame)
+
+    [conn] = sink.pool.connections
+    assert (conn.commits, conn.rollbacks, conn.closes) == (1, 0, 1)
+    assert [len(s["params"]) // len(frame.columns) for s in conn.statements] == [INSERT_ROWS, INSERT_ROWS, 5]
+    first = conn.statements[0]
+    assert first["sql"].startswith(f"INSERT INTO {TABLE} ({', '.join(frame.columns)}) VALUES (%s, ")
+    assert first["sql"].count("(%s") == INSERT_ROWS
+    row = first["params"][:len(frame.columns)]
+    assert row[0] == str(frame["pickup_datetime"].iloc[0])
+    assert row[1] == frame["pickup_date"].iloc[0]
+    assert row[2] is None  # pd.NA
+    assert isinstance(first["params"][len(frame.columns) + 2], int)
+
+
+def test_mysql_load_data_infile():
+    sink = fake_mysql_sink("infile")
+    frame = trips(50)
+
+    assert sink.write_frame(frame) == 50
+
+    [conn] = sink.pool.connections
+    [statement] = conn.statements
+    assert statement["sql"].startswith(f"LOAD DATA LOCAL INFILE %s INTO TABLE {TABLE}")
+    assert statement["sql"].endswith(f"({', '.join(frame.columns)})")
+    lines = statement["file"].split("\n")
+    assert lines[-1] == "" and len(lines) == 51
+    assert lines[0].split(",")[2] == "NULL"
+    assert lines[1].startswith(f"{frame['pickup_datetime'].iloc[1]},{frame['pickup_date'].iloc[1]},")
+    assert conn.commits == 1
+
+
+def test_mysql_rolls_back_failed_chunks():
+    sink = fake_mysql_sink("insert", fail=True)
+
+    with pytest.raises(RuntimeError, match="server went away"):
+        sink.write_frame(trips(10))
+
+    [conn] = sink.pool.connections
+    assert (conn.commits, conn.rollbacks, conn.closes) == (0, 1, 1)
+
+
+def test_mysql_parallel_writers():
+    sink = fake_mysql_sink("insert")
+    capped = ParallelWriter(sink, writers=8)
+    assert capped.writers == sink.max_writers
+    assert capped.close() == 0
+
+    written = write_frames((trips(300, seed=i) for i in range(6)), sink, writers=8)
+
+    assert written == 1800
+    # One pooled connection per chunk, returned after the write
+    assert len(sink.pool.connections) == 6
+    assert all(conn.closes == 1 for conn in sink.pool.connections)
+    assert sum(len(s["params"]) for conn in sink.pool.connections for s in conn.statements) == 1800 * 7
+
+
+def test_sinks_must_implement_the_whole_interface():
+    class CountOnlySink(DatabaseSink):
+        def count(self):
+            return 0
+
+    with pytest.raises(TypeError, match="abstract"):
+        CountOnlySink()
+    # The real sinks implement all of it
+    assert not MySQLSink.__abstractmethods__ and not SqliteSink.__abstractmethods__
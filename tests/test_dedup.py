@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+from uber_dedup import find_duplicates
+
+
+def raw_trips(n=2000, seed=0):
+    """Distinct trips shaped like the 2014 files: time, coordinates and base, no address"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        # Few distinct minutes, so many trips share a pickup time
+        "pickup_datetime": pd.Timestamp("2014-07-01") + pd.to_timedelta(rng.integers(0, 60, n), unit="min"),
+        "Lat": np.round(40.7 + rng.random(n) / 10, 6),
+        "Lon": np.round(-74.0 + rng.random(n) / 10, 6),
+        "Base": rng.choice(["B02512", "B02598"], n),
+        "source_file": "uber-raw-data-jul14.csv",
+    })
+
+
+def test_missing_key_column_compares_whole_rows():
+    df = raw_trips()
+    is_dup, report = find_duplicates(df, keys=["pickup_datetime", "address", "base"], history_path=None)
+    assert report["keys"]["missing"] == ["address"]
+    assert not is_dup.any()
+
+
+def test_repeated_trip_is_still_found_without_the_key():
+    df = raw_trips()
+    doubled = pd.concat([df, df.iloc[:10]], ignore_index=True)
+    is_dup, report = find_duplicates(doubled, keys=["pickup_datetime", "address", "base"], history_path=None)
+    assert report["duplicates"] == 10
+    assert is_dup[-10:].all()
+
+
+def test_rows_without_a_key_value_compare_whole_rows():
+    # Combined frame: one file has addresses, the other has none
+    raw = raw_trips(500)
+    fhv = pd.DataFrame({
+        "pickup_datetime": raw["pickup_datetime"].iloc[:5].to_numpy(),
+        "PU_Address": ["1 Main St"] * 5,
+        "Base": "B00256",
+        "source_file": "other-Dial7_B00887.csv",
+    })
+    df = pd.concat([raw, fhv], ignore_index=True)
+    is_dup, report = find_duplicates(df, keys=["pickup_datetime", "address", "base"], history_path=None)
+    assert report["keys"]["keys"] == ["pickup_datetime", "address", "base"]
+    assert report["keys"]["full_row_rows"] == len(raw)
+    assert not is_dup.any()
+
+
+def test_same_trip_across_files_with_different_address_columns():
+    a = pd.DataFrame({"pickup_datetime": ["2014-07-01 08:00"], "PICK UP ADDRESS": ["12 Main St."],
+                      "BASE": ["B00256"], "source_file": ["a.csv"]})
+    b = pd.DataFrame({"pickup_datetime": ["2014-07-01 08:00"], "PU_Address": ["12 MAIN ST"],
+                      "BASE": ["B00256"], "source_file": ["b.csv"]})
+    df = pd.concat([a, b], ignore_index=True)
+    is_dup, report = find_duplicates(df, keys=["pickup_datetime", "address", "base"], history_path=None)
+    assert is_dup.tolist() == [False, True]
+    assert report["across_files"] == 1
+
+
+def test_no_keys_matches_drop_duplicates():
+    df = raw_trips(300)
+    df = pd.concat([df, df.iloc[:7].assign(source_file="other.csv")], ignore_index=True)
+    expected = df.drop(columns="source_file").duplicated()
+    is_dup, _ = find_duplicates(df, keys=None, history_path=None)
+    assert is_dup.tolist() == expected.tolist()
@@ -0,0 +1,121 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import uber_ml_incremental as inc
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def write_part(directory, index, name, n_rows, seed, evening_share=0.5):
+    """A transformed part with the two columns the models use"""
+    rng = np.random.default_rng(seed)
+    evening = rng.random(n_rows) < evening_share
+    hours = np.where(evening, rng.integers(18, 24, n_rows), rng.integers(0, 18, n_rows))
+    frame = pd.DataFrame({
+        "pickup_hour": hours,
+        "pickup_day_of_week": rng.choice(DAYS, n_rows),
+    })
+    path = directory / f"part-{index:05d}-{name}.csv"
+    frame.to_csv(path, index=False)
+    return path, frame
+
+
+def test_changed_partition_is_not_trained_twice(tmp_path):
+    state = inc.new_state()
+    _, first = write_part(tmp_path, 0, "a", 300, seed=1)
+    write_part(tmp_path, 1, "b", 200, seed=2)
+    inc.update(state, inc.list_partitions(str(tmp_path)))
+    updates_before = state["sgd"].t_
+
+    # Partition a grows by 50 trips
+    _, extra = write_part(tmp_path, 9, "extra", 50, seed=3)
+    pd.concat([first, extra]).to_csv(tmp_path / "part-00000-a.csv", index=False)
+    (tmp_path / "part-00009-extra.csv").unlink()
+    results = inc.update(state, inc.list_partitions(str(tmp_path)))
+
+    assert [(r["partition"], r["rows"], r["new_rows"], r["changed"]) for r in results] == [("a", 350, 50, True)]
+    # partial_fit only saw the 50 new rows
+    assert state["sgd"].t_ - updates_before == 50
+    assert state["trained"]["a"].sum() == 350
+    # The window holds the current rows of a once, not the old and new copy
+    names = [name for name, _, _ in state["window"]]
+    assert sorted(names) == ["a", "b"]
+    assert results[0]["forest_rows"] == 550
+
+    # Unchanged on the next run
+    assert inc.update(state, inc.list_partitions(str(tmp_path))) == []
+
+
+def test_changed_partition_leaves_the_reservoir(tmp_path, monkeypatch):
+    monkeypatch.setattr(inc, "WINDOW_PARTITIONS", 1)
+    state = inc.new_state()
+    write_part(tmp_path, 0, "a", 300, seed=1)
+    write_part(tmp_path, 1, "b", 200, seed=2)
+    inc.update(state, inc.list_partitions(str(tmp_path)))
+    assert set(state["reservoir"]["partition"]) == {"a"}
+
+    write_part(tmp_path, 0, "a", 320, seed=4)
+    inc.update(state, {"a": str(tmp_path / "part-00000-a.csv")})
+
+    # a is the newest partition again: in the window, out of the reservoir
+    assert [name for name, _, _ in state["window"]] == ["a"]
+    assert set(state["reservoir"]["partition"]) == {"b"}
+    assert len(state["reservoir"]) == 200
+
+
+def test_reservoir_keeps_the_time_period_shares(tmp_path, monkeypatch):
+    monkeypatch.setattr(inc, "WINDOW_PARTITIONS", 1)
+    monkeypatch.setattr(inc, "RESERVOIR_PER_DAY", 100)
+    state = inc.new_state()
+    for i in range(6):
+        write_part(tmp_path, i, f"f{i}", 2000, seed=10 + i, evening_share=0.8)
+    inc.update(state, inc.list_partitions(str(tmp_path)))
+
+    reservoir = state["reservoir"]
+    assert reservoir.groupby("day").size().max() == 100
+    # Periods are not capped, so evenings keep their 80% share (not 25%)
+    evening = (reservoir["period"] == 3).mean()
+    assert evening == pytest.approx(0.8, abs=0.05)
+
+
+def test_main_reports_missing_partitions(tmp_path):
+    assert inc.main(str(tmp_path / "none"), str(tmp_path / "state.joblib")) is None
+
+    write_part(tmp_path, 0, "a", 100, seed=1)
+    assert len(inc.main(str(tmp_path), str(tmp_path / "state.joblib"))) == 1
+    # Nothing new is still a success
+    assert inc.main(str(tmp_path), str(tmp_path / "state.joblib")) == []
+
+
+def test_edit_that_keeps_the_size_is_picked_up(tmp_path):
+    state = inc.new_state()
+    path, frame = write_part(tmp_path, 0, "a", 300, seed=1)
+    inc.update(state, inc.list_partitions(str(tmp_path)))
+
+    # Move the first row to the end: the file keeps its size
+    assert not frame.iloc[0].equals(frame.iloc[-1])
+    size = path.stat().st_size
+    pd.concat([frame.iloc[1:], frame.iloc[:1]]).to_csv(path, index=False)
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert path.stat().st_size == size
+
+    results = inc.update(state, inc.list_partitions(str(tmp_path)))
+    assert [(r["partition"], r["changed"]) for r in results] == [("a", True)]
+
+
+def test_states_with_file_sizes_read_their_partitions_again(tmp_path):
+    state = inc.new_state()
+    path, _ = write_part(tmp_path, 0, "a", 300, seed=1)
+    inc.update(state, inc.list_partitions(str(tmp_path)))
+    state["seen"]["a"] = path.stat().st_size  # as saved by older versions
+    inc.save_state(state, str(tmp_path / "state.joblib"))
+
+    state = inc.load_state(str(tmp_path / "state.joblib"))
+    results = inc.update(state, inc.list_partitions(str(tmp_path)))
+    # Read again, but nothing is trained twice
+    assert [(r["partition"], r["new_rows"]) for r in results] == [("a", 0)]
+    assert inc.update(state, inc.list_partitions(str(tmp_path))) == []
@@ -0,0 +1,99 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.base import BaseEstimator, RegressorMixin
+from sklearn.dummy import DummyRegressor
+
+import uber_model_selection
+from uber_benchmark import make_trips
+from uber_model_selection import build_features, candidate_list, load_features, select_models
+from uber_transform_engine import transform_frame
+
+SEEN = []
+
+
+class RecordingRegressor(RegressorMixin, BaseEstimator):
+    """Predicts 0 and records the time ranks (column 0) it was trained and tested on"""
+
+    def fit(self, X, y):
+        self.train_last_ = float(np.max(X[:, 0]))
+        return self
+
+    def predict(self, X):
+        if len(X) > 1:
+            SEEN.append((self.train_last_, float(np.min(X[:, 0]))))
+        return np.zeros(len(X))
+
+
+@pytest.fixture
+def transformed_file(tmp_path):
+    path = tmp_path / "transformed.csv"
+    trips = transform_frame(make_trips(3000, n_files=3))
+    trips.sample(frac=1, random_state=0).to_csv(path, index=False)
+    return str(path)
+
+
+def test_features_are_ordered_by_pickup_time(transformed_file):
+    X, y = build_features(pd.read_csv(transformed_file, low_memory=False))
+    # Month and day of month never go back (the synthetic trips are within one year)
+    day_order = X[:, 1] * 100 + X[:, 2]
+    assert (np.diff(day_order) >= 0).all()
+    assert set(np.unique(y)) <= {0, 1, 2, 3}
+
+
+def test_folds_never_train_on_later_rows():
+    SEEN.clear()
+    X = np.column_stack([np.arange(600), np.zeros(600)]).astype(np.float32)
+    y = np.zeros(600, dtype=np.float32)
+
+    leaderboard = select_models(X, y, [("recorder", {}, RecordingRegressor())], n_splits=4, n_jobs=1)
+
+    assert leaderboard["folds"].tolist() == [4]
+    assert len(SEEN) == 4
+    for train_last, test_first in SEEN:
+        assert train_last < test_first
+
+
+def test_successive_halving_keeps_the_best_candidates():
+    X = np.zeros((500, 2), dtype=np.float32)
+    y = np.ones(500, dtype=np.float32)
+    # The error of each candidate is its distance from 1
+    candidates = candidate_list({"constant": (DummyRegressor(strategy="constant"),
+                                              {"constant": [4.0, 1.0, 3.0, 1.5, 2.5]})})
+
+    leaderboard = select_models(X, y, candidates, n_splits=3, keep_fraction=0.5, n_jobs=1)
+
+    status = dict(zip(leaderboard["model"], leaderboard["status"]))
+    assert leaderboard["model"].iloc[0] == "constant(constant=1.0)"
+    assert status["constant(constant=1.0)"] == "finished"
+    # 5 -> 3 after the first fold, 3 -> 2 after the second
+    assert status["constant(constant=1.5)"] == "finished"
+    assert status["constant(constant=2.5)"] == "stopped after fold 2"
+    assert status["constant(constant=3.0)"] == status["constant(constant=4.0)"] == "stopped after fold 1"
+    assert leaderboard.loc[0, "mae"] == 0
+
+
+def test_cached_features_are_reused_until_the_input_changes(transformed_file, tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / "cache")
+    X, y = load_features(transformed_file, cache_dir)
+    first_files = sorted(os.listdir(cache_dir))
+    assert len(first_files) == 2
+
+    def no_read(*args, **kwargs):
+        raise AssertionError("the features should come from the cache")
+
+    monkeypatch.setattr(uber_model_selection.pd, "read_csv", no_read)
+    X2, y2 = load_features(transformed_file, cache_dir)
+    assert isinstance(X2, np.memmap)
+    np.testing.assert_array_equal(X2, X)
+    np.testing.assert_array_equal(y2, y)
+    monkeypatch.undo()
+
+    # A newer input file gets a new cache, and the old one is removed
+    stat = os.stat(transformed_file)
+    os.utime(transformed_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    load_features(transformed_file, cache_dir)
+    files = sorted(os.listdir(cache_dir))
+    assert len(files) == 2 and files != first_files
@@ -0,0 +1,21 @@
+import pytest
+
+import uber_analytics
+from uber_ml_prediction import day_index
+
+
+@pytest.mark.parametrize("day, index", [("monday", 0), ("Sat", 5), (" SUNDAY ", 6), ("thurs", 3)])
+def test_day_names_and_abbreviations(day, index):
+    assert day_index(day) == index
+
+
+@pytest.mark.parametrize("day", ["funday", "mo", "Monkey", ""])
+def test_unknown_day_names(day):
+    with pytest.raises(ValueError, match="Unknown day"):
+        day_index(day)
+
+
+def test_predict_command_rejects_unknown_days(capsys):
+    # Checked before the model is loaded, so no trained model is needed
+    assert uber_analytics.main(["predict", "monday", "funday"]) == 1
+    assert "Unknown day 'funday'" in capsys.readouterr().out
@@ -0,0 +1,104 @@
+import pandas as pd
+import pytest
+
+from uber_benchmark import make_trips
+from uber_dedup import find_duplicates
+from uber_quality import RULES, quality_report, record_input_fingerprints, record_invalid_datetimes, update_quality
+from uber_transform_engine import transform_frame
+
+DUPLICATE_RULE = "trip not in another file"
+ORDER_RULE = "pickup_datetime in file order"
+INVALID_RULE = "date and time readable"
+
+
+@pytest.fixture
+def trips():
+    """Transformed trips in 3 files, plus 40 trips of one file repeated in a copy"""
+    df = transform_frame(make_trips(3000, n_files=3))
+    repeats = df[df["source_file"] == "synthetic-00.csv"].head(40).copy()
+    repeats["source_file"] = "synthetic-00-copy.csv"
+    return pd.concat([df, repeats], ignore_index=True)
+
+
+def failed_by_file(report, rule):
+    rows = report[report["rule"] == rule]
+    return dict(zip(rows["source_file"], rows["failed"]))
+
+
+def test_cross_file_duplicates_are_counted_before_dedup(trips, tmp_path):
+    db_path = str(tmp_path / "quality.db")
+    # What data_cleaning.py does: fingerprints first, then remove duplicates
+    record_input_fingerprints(trips, fingerprint_dir=str(tmp_path))
+    is_duplicate, report = find_duplicates(trips, history_path=None)
+    assert report["across_files"] == 40
+
+    update_quality(trips[~is_duplicate], db_path=db_path, fingerprint_dir=str(tmp_path))
+
+    failed = failed_by_file(quality_report(db_path), DUPLICATE_RULE)
+    assert failed["synthetic-00.csv"] == 40
+    assert failed["synthetic-01.csv"] == failed["synthetic-02.csv"] == 0
+    # The copy file is empty after dedup, so it has no partition to report on
+    assert "synthetic-00-copy.csv" not in failed
+
+
+def test_cross_file_duplicates_use_the_rule_keys(trips, tmp_path):
+    # Same time and file-independent keys, but a different address
+    trips.loc[trips["source_file"] == "synthetic-00-copy.csv", "PICK UP ADDRESS"] = "1 Other St, NY"
+    rules = [{"name": DUPLICATE_RULE, "check": "cross_file_duplicates", "keys": ["pickup_datetime"]},
+             {"name": "by address", "check": "cross_file_duplicates", "keys": ["pickup_datetime", "address"]}]
+    db_path = str(tmp_path / "quality.db")
+    record_input_fingerprints(trips, rules, fingerprint_dir=str(tmp_path))
+    update_quality(trips, rules, db_path=db_path, fingerprint_dir=str(tmp_path))
+
+    report = quality_report(db_path)
+    assert failed_by_file(report, DUPLICATE_RULE)["synthetic-00-copy.csv"] == 40
+    assert failed_by_file(report, "by address")["synthetic-00-copy.csv"] == 0
+
+
+def test_out_of_order_times_are_informational(trips, tmp_path):
+    db_path = str(tmp_path / "quality.db")
+    shuffled = trips.sample(frac=1, random_state=0)
+    first = update_quality(shuffled, db_path=db_path, fingerprint_dir=str(tmp_path))
+    assert len(first["checked"]) == 4
+
+    report = quality_report(db_path)
+    assert report.loc[~report["informational"], "failed"].sum() == 0
+    # Each file counted in its own row order: about half of a shuffled file goes backwards
+    out_of_order = failed_by_file(report, ORDER_RULE)
+    for source_file, part in shuffled.groupby("source_file"):
+        stamps = part["pickup_datetime"].dropna()
+        assert out_of_order[source_file] == (stamps.diff() < pd.Timedelta(0)).sum() > len(stamps) // 3
+
+    # Same rows in time order: rechecked, and nothing is out of order
+    again = update_quality(trips.sort_values("pickup_datetime"), db_path=db_path, fingerprint_dir=str(tmp_path))
+    assert len(again["checked"]) == 4
+    assert set(failed_by_file(quality_report(db_path), ORDER_RULE).values()) == {0}
+
+    # The same order once more: nothing to check again
+    same = update_quality(trips.sort_values("pickup_datetime"), db_path=db_path, fingerprint_dir=str(tmp_path))
+    assert same["checked"] == [] and len(same["skipped"]) == 4
+
+
+def test_invalid_datetimes_are_counted_before_cleaning_drops_them(trips, tmp_path):
+    db_path = str(tmp_path / "quality.db")
+    raw = trips.copy()
+    raw.loc[raw.index[raw["source_file"] == "synthetic-00.csv"][:7], "pickup_datetime"] = pd.NaT
+    raw.loc[raw["source_file"] == "synthetic-00-copy.csv", "pickup_datetime"] = pd.NaT
+    # What data_cleaning.py does: count, then drop the invalid rows
+    assert record_invalid_datetimes(raw, fingerprint_dir=str(tmp_path)) == 47
+    update_quality(raw.dropna(subset=["pickup_datetime"]), db_path=db_path, fingerprint_dir=str(tmp_path))
+
+    report = quality_report(db_path)
+    rows = report[report["rule"] == INVALID_RULE].set_index("source_file")
+    assert rows.loc["synthetic-00.csv", "failed"] == 7
+    assert rows.loc["synthetic-01.csv", "failed"] == 0
+    # A file without a single readable time is still reported
+    assert rows.loc["synthetic-00-copy.csv", ["checked", "failed"]].tolist() == [40, 40]
+    assert not rows["informational"].any()
+
+
+def test_removed_source_files_lose_their_fingerprints(trips, tmp_path):
+    assert record_input_fingerprints(trips, fingerprint_dir=str(tmp_path)) == 4
+    record_input_fingerprints(trips[trips["source_file"] != "synthetic-00-copy.csv"], fingerprint_dir=str(tmp_path))
+    assert len([name for name in tmp_path.iterdir() if name.suffix == ".npy"]) == 3
+    assert any(rule["check"] == "cross_file_duplicates" for rule in RULES)
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from uber_rollups import LEVELS, build_pyramid, query_range, update_rollups
+
+FREQS = {"minute": "min", "hour": "h", "day": "D"}
+
+
+def expected_counts(pickup, level):
+    """Trips per bucket start, counted straight from the rows with pandas"""
+    if level in FREQS:
+        starts = pickup.dt.floor(FREQS[level])
+    else:
+        starts = pickup.dt.to_period("W-SUN" if level == "week" else "M").dt.start_time
+    return starts.value_counts().sort_index()
+
+
+@pytest.fixture
+def pickup():
+    # Starts on a Tuesday at a new year, so the first week began in December
+    rng = np.random.default_rng(0)
+    start = np.datetime64("2013-01-01T00:00:00")
+    seconds = rng.integers(0, 120 * 86400, 20000).astype("timedelta64[s]")
+    return pd.Series(start + seconds).where(rng.random(20000) > 0.01)
+
+
+@pytest.mark.parametrize("level", [name for name, _ in LEVELS])
+def test_every_level_matches_the_rows(pickup, level):
+    buckets, counts = build_pyramid(pickup)[level]
+    actual = pd.Series(counts, index=pd.to_datetime(buckets, unit="s"))
+
+    expected = expected_counts(pickup.dropna(), level)
+    assert actual.index.equals(expected.index.as_unit("ns"))
+    assert actual.tolist() == expected.tolist()
+
+
+def test_months_do_not_start_before_the_data(pickup, tmp_path):
+    db_path = str(tmp_path / "rollups.db")
+    update_rollups(pd.DataFrame({"pickup_datetime": pickup, "source_file": "a.csv"}), db_path=db_path)
+
+    level, months = query_range("2012-01-01", "2014-01-01", level="month", db_path=db_path)
+    assert months["bucket_start"].min() == pd.Timestamp("2013-01-01")
+    assert months["trips"].sum() == pickup.notna().sum()
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import uber_sample
+from uber_sample import build_sample, representative_sample
+
+
+@pytest.fixture(scope="module")
+def trips():
+    """30 days where the evening hours are 15 times busier than the rest"""
+    rng = np.random.default_rng(0)
+    hours = pd.date_range("2014-07-01", periods=30 * 24, freq="h")
+    per_hour = np.where(hours.hour >= 17, 300, 20)
+    pickup = np.repeat(hours.to_numpy(), per_hour) + rng.integers(0, 3600, per_hour.sum()).astype("timedelta64[s]")
+    df = pd.DataFrame({
+        "pickup_datetime": pickup,
+        "source_file": rng.choice(["a.csv", "b.csv"], len(pickup)),
+    })
+    df["pickup_date"] = df["pickup_datetime"].dt.date
+    df["pickup_hour"] = df["pickup_datetime"].dt.hour
+    return df
+
+
+def shares(frame, column):
+    return frame[column].value_counts(normalize=True).sort_index()
+
+
+@pytest.mark.parametrize("n", [200, 1000, 2000])
+def test_draw_matches_the_hour_shares(trips, n):
+    sample = build_sample(trips)
+    drawn = representative_sample(sample, n)
+
+    assert len(drawn) == n
+    assert "_priority" not in drawn.columns and "_weight" not in drawn.columns
+    expected = shares(trips, "pickup_hour")
+    actual = shares(drawn, "pickup_hour").reindex(expected.index, fill_value=0)
+    # Busy hours keep their share; within one row of the exact split
+    assert (actual - expected).abs().max() <= 1.0 / n + 1e-9
+    # Files are not ordered on, so they only follow the data up to sampling noise
+    assert (shares(drawn, "source_file") - shares(trips, "source_file")).abs().max() < 3 * np.sqrt(0.25 / n)
+
+
+def test_draw_takes_every_row_of_strata_it_cannot_cover(trips):
+    sample = build_sample(trips)
+    evening_rows = (sample["pickup_hour"] >= 17).sum()
+    # 86% of 5000 rows would be evening rows, more than the sample has
+    assert evening_rows < 0.86 * 5000
+    drawn = representative_sample(sample, 5000)
+
+    assert len(drawn) == 5000
+    # (Nearly) all of them are taken and the rest of the draw goes to other hours
+    assert (drawn["pickup_hour"] >= 17).sum() >= 0.99 * evening_rows
+
+
+def test_draw_after_filtering_and_reruns(trips):
+    sample = build_sample(trips)
+    evening = sample[sample["pickup_hour"].between(16, 19)]
+    drawn = representative_sample(evening, 300)
+
+    full = trips[trips["pickup_hour"].between(16, 19)]
+    # Hour 16 is the quiet one: 20 of the 920 trips in each day's 16-19 window
+    assert shares(drawn, "pickup_hour")[16] == pytest.approx(shares(full, "pickup_hour")[16], abs=1 / 300)
+    pd.testing.assert_frame_equal(drawn, representative_sample(evening, 300))
+
+
+def test_small_filters_return_every_row(trips):
+    sample = build_sample(trips)
+    one_hour = sample[(sample["pickup_hour"] == 3) & (sample["pickup_date"] == trips["pickup_date"].iloc[0])]
+
+    assert len(representative_sample(one_hour, 1000)) == len(one_hour)
+
+
+def test_samples_are_kept_per_version(trips, tmp_path, monkeypatch):
+    monkeypatch.setattr(uber_sample, "KEEP_SAMPLES", 2)
+    for version, hours in [("100", (0, 5)), ("200", (6, 11)), ("1000", (12, 23))]:
+        subset = trips[trips["pickup_hour"].between(*hours)]
+        uber_sample.write_sample(subset, version, sample_dir=str(tmp_path))
+
+    # Each version reads its own sample; the oldest one was removed
+    assert uber_sample.read_sample("200", sample_dir=str(tmp_path))["pickup_hour"].max() == 11
+    assert uber_sample.read_sample("1000", sample_dir=str(tmp_path))["pickup_hour"].min() == 12
+    with pytest.raises(FileNotFoundError):
+        uber_sample.read_sample("100", sample_dir=str(tmp_path))
@@ -0,0 +1,56 @@
+import pandas as pd
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+
+from uber_snapshot import current_version, load_snapshot, new_version, publish_version, write_snapshot
+
+
+def test_strings_stay_backed_by_the_mapped_file(tmp_path):
+    df = pd.DataFrame({
+        "source_file": ["a.csv", "b.csv", None],
+        "BASE": ["B00256", "B00887", "B01362"],
+        "pickup_hour": [1, 2, 3],
+    })
+    version = write_snapshot(df, str(tmp_path))
+    loaded = load_snapshot(version, str(tmp_path))
+
+    assert loaded["source_file"].dtype == pd.StringDtype("pyarrow")
+    assert loaded["source_file"].isna().tolist() == [False, False, True]
+    assert loaded["BASE"].tolist() == df["BASE"].tolist()
+    assert loaded["pickup_hour"].tolist() == [1, 2, 3]
+
+
+def test_publish_version_without_snapshot(tmp_path):
+    version = publish_version(str(tmp_path))
+    assert current_version(str(tmp_path)) == version
+    assert load_snapshot(version, str(tmp_path)) is None
+
+
+def test_snapshot_published_under_a_chosen_version(tmp_path):
+    version = new_version()
+    assert write_snapshot(pd.DataFrame({"pickup_hour": [1]}), str(tmp_path), version=version) == version
+    assert current_version(str(tmp_path)) == version
+
+
+def test_transform_publishes_a_version_when_the_snapshot_fails(tmp_path, monkeypatch):
+    import data_transformation
+    import uber_snapshot
+    import uber_warmup
+    from uber_benchmark import make_trips
+
+    def broken_snapshot(df, snapshot_dir=None, version=None):
+        raise OSError("disk full")
+
+    started = []
+    monkeypatch.setattr(uber_snapshot, "write_snapshot", broken_snapshot)
+    monkeypatch.setattr(uber_warmup, "start_warmup", started.append)
+    input_file = tmp_path / "combined.csv"
+    make_trips(500, n_files=2).to_csv(input_file, index=False)
+    before = current_version()
+
+    assert data_transformation.transform(str(input_file), str(tmp_path / "transformed.csv")) is not None
+
+    version = current_version()
+    assert version is not None and version != before
+    assert started == [version]
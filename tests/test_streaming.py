@@ -0,0 +1,108 @@
+import json
+import socket
+import time
+
+import pandas as pd
+import pytest
+
+from uber_streaming import FileSource, SocketSource, StreamProcessor, decode_event, run_stream
+
+
+def event(minute, address="1 Main St"):
+    return {"DATE": "07/01/2014", "TIME": f"08:{minute:02d}:00", "PICK UP ADDRESS": address, "BASE": "B00256"}
+
+
+@pytest.fixture
+def processor(tmp_path):
+    processor = StreamProcessor(db_path=str(tmp_path / "uber_data.db"),
+                                cube_path=str(tmp_path / "cube" / "live_counts.json"))
+    yield processor
+    processor.close()
+
+
+def test_decode_event_rejects_malformed_lines():
+    assert decode_event('{"TIME": "08:00:00"}') == {"TIME": "08:00:00"}
+    assert decode_event(b'{"TIME": "08:00:00"}\n') == {"TIME": "08:00:00"}
+    assert decode_event('{"TIME": ') is None
+    assert decode_event(b'\xff\xfe') is None
+    assert decode_event('[1, 2]') is None
+
+
+def test_malformed_line_does_not_stop_the_stream(tmp_path, processor):
+    path = tmp_path / "events.jsonl"
+    lines = [json.dumps(event(1)), "{not json", json.dumps(event(2)), "42", json.dumps(event(3))]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    source = FileSource(str(path), from_start=True)
+    try:
+        run_stream(source, processor, batch_timeout=0.05, max_events=len(lines))
+    finally:
+        source.close()
+
+    stats = processor.stats()
+    assert stats["events"] == 5
+    assert stats["rejected"] == 2
+    # The valid events of the same poll are still counted
+    assert stats["trips_counted"] == 3
+
+
+def test_socket_source_keeps_serving_after_bad_line(processor):
+    source = SocketSource("127.0.0.1", 0)
+    try:
+        with socket.create_connection(source.address) as conn:
+            conn.sendall(b'{"broken\n' + json.dumps(event(5)).encode("utf-8") + b"\n")
+        deadline = time.monotonic() + 5
+        while processor.events_in < 2 and time.monotonic() < deadline:
+            processor.process(source.poll(100, 0.05))
+    finally:
+        source.close()
+    assert processor.rejected == 1
+    assert processor.trips_counted == 1
+
+
+def test_latency_samples_are_bounded(processor):
+    from uber_streaming import LATENCY_SAMPLES
+
+    now = time.time()
+    for start in range(0, 3 * LATENCY_SAMPLES, 5000):
+        processor.process([{**event(start % 60, f"{n} Main St"), "emitted_at": now}
+                           for n in range(start, start + 5000)])
+        processor.flush()
+    assert len(processor.latencies) == LATENCY_SAMPLES
+    assert "latency_p99_ms" in processor.stats()
+
+
+def test_fields_of_the_wrong_type_are_rejected(processor):
+    processor.process([
+        {"DATE": 20140701, "TIME": "08:00"},
+        {**event(1), "emitted_at": "soon"},
+        {**event(2), "emitted_at": str(time.time())},
+        event(3),
+    ])
+    processor.flush()
+
+    assert processor.rejected == 2
+    assert processor.trips_counted == 2
+    assert len(processor.latencies) == 1
+
+
+def test_each_event_is_parsed_on_its_own(processor):
+    processor.process([event(minute) for minute in range(10)]
+                      + [{**event(0), "TIME": "8:30 PM", "PICK UP ADDRESS": "2 Main St"}])
+
+    assert processor.invalid == 0
+    assert processor.trips_counted == 11
+    assert processor.counts.hourly[pd.Timestamp("2014-07-01 20:00")] == 1
+
+
+def test_pickup_datetime_and_date_time_events_in_one_batch(processor):
+    processor.process([
+        {"pickup_datetime": "2014-07-01 09:15:00", "PICK UP ADDRESS": "1 Main St", "BASE": "B00256"},
+        event(1),
+        {"pickup_datetime": None, **event(2, "2 Main St")},
+    ])
+
+    assert processor.invalid == 0
+    assert processor.trips_counted == 3
+    assert processor.counts.hourly[pd.Timestamp("2014-07-01 08:00")] == 2
+    assert processor.counts.hourly[pd.Timestamp("2014-07-01 09:00")] == 1
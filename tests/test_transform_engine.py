@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+
+from uber_benchmark import make_trips
+from uber_transform_engine import combine_parts, run_partitioned, transform_frame
+
+
+@pytest.fixture
+def trips():
+    df = make_trips(3000, n_files=3, seed=7)
+    # One file with unparseable times, so its hour/month columns have gaps
+    bad = df.index[df['source_file'] == 'synthetic-01.csv'][:25]
+    df.loc[bad, 'TIME'] = 'not a time'
+    return df
+
+
+def serial_output(df, path):
+    """The whole frame transformed at once, sorted like the partitions"""
+    frame = transform_frame(df.sort_values('source_file', kind='stable').reset_index(drop=True))
+    frame.to_csv(path, index=False)
+    return frame
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_partitioned_output_matches_serial(trips, tmp_path, workers):
+    expected = serial_output(trips.copy(), tmp_path / "serial.csv")
+
+    results = run_partitioned(trips.copy(), by="source_file", workers=workers, out_dir=str(tmp_path / "parts"))
+    combine_parts([path for _, path, _ in results], str(tmp_path / "combined.csv"))
+
+    assert (tmp_path / "combined.csv").read_bytes() == (tmp_path / "serial.csv").read_bytes()
+    frame = pd.concat([part for _, _, part in results], ignore_index=True)
+    pd.testing.assert_frame_equal(frame, expected)
+    # Nothing but the CSV parts is left behind
+    assert all(path.suffix == ".csv" for path in (tmp_path / "parts").iterdir())
+
+
+def test_time_column_dtypes(trips):
+    frame = transform_frame(trips.copy())
+    assert frame['pickup_hour'].dtype == 'Int8'
+    assert frame['pickup_hour'].isna().sum() == 25
+    valid = frame['pickup_datetime'].notna()
+    # pickup_date holds date objects, like .dt.date
+    assert frame.loc[valid, 'pickup_date'].tolist() == frame.loc[valid, 'pickup_datetime'].dt.date.tolist()
+    assert frame.loc[valid, 'pickup_hour'].tolist() == frame.loc[valid, 'pickup_datetime'].dt.hour.tolist()
+    assert frame.loc[valid, 'pickup_month'].tolist() == frame.loc[valid, 'pickup_datetime'].dt.month.tolist()
+    assert frame.loc[valid, 'pickup_day_of_week'].astype(str).tolist() == \
+        frame.loc[valid, 'pickup_datetime'].dt.day_name().tolist()
@@ -0,0 +1,71 @@
+import os
+import threading
+import time
+
+import pytest
+
+import uber_warmup
+from uber_warmup import cached
+
+
+def lock_path(tmp_path, key):
+    return uber_warmup._cache_path("1", key, str(tmp_path))[:-len(".pkl")] + ".lock"
+
+
+def test_concurrent_callers_compute_once(tmp_path):
+    calls = []
+    results = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"rows": 42}
+
+    threads = [threading.Thread(target=lambda: results.append(cached("1", "view", compute, str(tmp_path))))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [{"rows": 42}] * 8
+    assert not os.path.exists(lock_path(tmp_path, "view"))
+
+
+def test_failed_compute_releases_the_lock(tmp_path):
+    def fail():
+        raise RuntimeError("groupby failed")
+
+    with pytest.raises(RuntimeError, match="groupby failed"):
+        cached("1", "view", fail, str(tmp_path))
+
+    assert not os.path.exists(lock_path(tmp_path, "view"))
+    assert cached("1", "view", lambda: 7, str(tmp_path)) == 7
+
+
+def test_stale_lock_is_broken(tmp_path):
+    path = lock_path(tmp_path, "view")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("crashed-process")
+    old = time.time() - uber_warmup.LOCK_TIMEOUT - 10
+    os.utime(path, (old, old))
+
+    assert cached("1", "view", lambda: "fresh", str(tmp_path)) == "fresh"
+    assert not os.path.exists(path)
+
+
+def test_lock_taken_over_by_another_caller_is_left_alone(tmp_path):
+    path = lock_path(tmp_path, "view")
+
+    def slow_compute():
+        # Our lock was broken as stale and another caller took it
+        os.remove(path)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("other-caller")
+        return 1
+
+    assert cached("1", "view", slow_compute, str(tmp_path)) == 1
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == "other-caller"
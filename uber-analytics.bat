@@ -0,0 +1,3 @@
+@echo off
+REM Runs the pipeline CLI from any folder, e.g. "uber-analytics status"
+python "%~dp0uber_analytics.py" %*
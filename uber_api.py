@@ -0,0 +1,212 @@
+# uber_api.py
+# Small HTTP API with the standard trip counts, for services that would
+# otherwise re-read the CSV files.
+#
+#   GET /api/version
+#   GET /api/trips/by-hour       trips per hour of day (0-23)
+#   GET /api/trips/by-day        trips per date
+#   GET /api/trips/by-weekday    trips per day of week
+#   GET /api/trips/by-source     trips per source file
+#
+# The trips endpoints take these filters:
+#   start, end          first and last date (YYYY-MM-DD, inclusive)
+#   hour_from, hour_to  hours of the day (0-23, inclusive)
+#   source              source file; can be given more than once
+#
+# Results are summed from the hourly rows of the time_rollups table
+# (uber_rollups.py), never from the trips. Responses are cached in an
+# in-process LRU cache keyed on the data version, which is also the ETag
+# base, so a client that sends If-None-Match gets a 304 until
+# data_transformation.py publishes new data. Responses are gzipped when the
+# client accepts it.
+#
+# Usage:
+#   python uber_api.py [--host 127.0.0.1] [--port 5000]
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import date, datetime, timezone
+from functools import lru_cache
+
+from flask import Flask, Response, request
+
+from uber_config import database_file
+from uber_snapshot import SNAPSHOT_DIR, current_version
+
+DB_PATH = database_file()
+CACHE_SIZE = 256
+GZIP_MIN_BYTES = 512
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Bucket start (epoch seconds) -> group key, in SQL
+GROUPS = {
+    "hour": "(bucket % 86400) / 3600",
+    "day": "bucket - bucket % 86400",
+    # 1970-01-01 was a Thursday: +3 makes Monday 0
+    "weekday": "(bucket / 86400 + 3) % 7",
+    "source": "source_file",
+}
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def _parse_day(value, name):
+    try:
+        day = date.fromisoformat(value)
+    except ValueError:
+        raise BadRequest(f"{name} must be a date like 2014-07-01, got '{value}'")
+    return int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp())
+
+
+def _parse_hour(value, name):
+    try:
+        hour = int(value)
+    except ValueError:
+        hour = -1
+    if not 0 <= hour <= 23:
+        raise BadRequest(f"{name} must be an hour between 0 and 23, got '{value}'")
+    return hour
+
+
+def parse_filters(args):
+    """Normalised filters from the query string (a hashable tuple for the cache key)"""
+    start = _parse_day(args["start"], "start") if args.get("start") else None
+    end = _parse_day(args["end"], "end") + 86400 - 1 if args.get("end") else None
+    hour_from = _parse_hour(args["hour_from"], "hour_from") if args.get("hour_from") else 0
+    hour_to = _parse_hour(args["hour_to"], "hour_to") if args.get("hour_to") else 23
+    if hour_from > hour_to:
+        raise BadRequest("hour_from must not be after hour_to")
+    sources = tuple(sorted(set(args.getlist("source"))))
+    return start, end, hour_from, hour_to, sources
+
+
+def query_counts(db_path, group, start, end, hour_from, hour_to, sources):
+    """[(group key, trips)] from the hourly rollups"""
+    sql = f"SELECT {GROUPS[group]} AS key, SUM(trips) FROM time_rollups WHERE level = 'hour'"
+    params = []
+    if start is not None:
+        sql += " AND bucket >= ?"
+        params.append(start)
+    if end is not None:
+        sql += " AND bucket <= ?"
+        params.append(end)
+    if (hour_from, hour_to) != (0, 23):
+        sql += f" AND {GROUPS['hour']} BETWEEN ? AND ?"
+        params += [hour_from, hour_to]
+    if sources:
+        sql += f" AND source_file IN ({', '.join('?' for _ in sources)})"
+        params += list(sources)
+    sql += " GROUP BY key ORDER BY key"
+
+    # Read-only: the API never creates or changes the rollups
+    conn = sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True)
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+def _iso_day(seconds):
+    return datetime.fromtimestamp(seconds, timezone.utc).date().isoformat()
+
+
+def _format_rows(group, rows):
+    if group == "hour":
+        return [{"hour": key, "trips": trips} for key, trips in rows]
+    if group == "day":
+        return [{"date": _iso_day(key), "trips": trips} for key, trips in rows]
+    if group == "weekday":
+        return [{"weekday": WEEKDAYS[key], "trips": trips} for key, trips in rows]
+    return [{"source_file": key, "trips": trips} for key, trips in rows]
+
+
+def create_app(db_path=DB_PATH, snapshot_dir=SNAPSHOT_DIR, cache_size=CACHE_SIZE):
+    app = Flask(__name__)
+
+    def data_version():
+        # The snapshot version changes on every publish; without pyarrow there
+        # is no snapshot, so fall back to the rollup database's mtime
+        version = current_version(snapshot_dir)
+        if version is None and os.path.exists(db_path):
+            version = f"db-{os.stat(db_path).st_mtime_ns}"
+        return version
+
+    @lru_cache(maxsize=cache_size)
+    def cached_response(version, group, filters):
+        """(JSON body, gzipped body, ETag) for one version and set of filters"""
+        start, end, hour_from, hour_to, sources = filters
+        rows = query_counts(db_path, group, *filters)
+        body = json.dumps({
+            "version": version,
+            "filters": {
+                "start": _iso_day(start) if start is not None else None,
+                "end": _iso_day(end) if end is not None else None,
+                "hour_from": hour_from, "hour_to": hour_to, "source": list(sources),
+            },
+            "data": _format_rows(group, rows),
+        }).encode("utf-8")
+        etag = hashlib.sha1(f"{version}:{group}:{filters}".encode("utf-8")).hexdigest()[:20]
+        return body, gzip.compress(body, compresslevel=5), f'"{etag}"'
+
+    def json_response(body, status=200, gzipped=None, etag=None):
+        accepts_gzip = "gzip" in request.headers.get("Accept-Encoding", "")
+        use_gzip = gzipped is not None and accepts_gzip and len(body) >= GZIP_MIN_BYTES
+        response = Response(gzipped if use_gzip else body, status=status, mimetype="application/json")
+        if use_gzip:
+            response.headers["Content-Encoding"] = "gzip"
+        response.headers["Vary"] = "Accept-Encoding"
+        if etag:
+            response.headers["ETag"] = etag
+            response.headers["Cache-Control"] = "no-cache"  # revalidate with the ETag
+        return response
+
+    def error(message, status):
+        return json_response(json.dumps({"error": message}).encode("utf-8"), status)
+
+    @app.get("/api/version")
+    def version():
+        return json_response(json.dumps({"version": data_version()}).encode("utf-8"))
+
+    @app.get("/api/trips/by-<group>")
+    def trips(group):
+        if group not in GROUPS:
+            return error(f"Unknown grouping '{group}' (use {', '.join(GROUPS)})", 404)
+        try:
+            filters = parse_filters(request.args)
+        except BadRequest as e:
+            return error(str(e), 400)
+
+        version = data_version()
+        if version is None:
+            return error("No data published yet, run data_transformation.py first", 503)
+        try:
+            body, gzipped, etag = cached_response(version, group, filters)
+        except sqlite3.OperationalError as e:
+            return error(f"Rollups are not available: {e}", 503)
+
+        if etag in request.headers.get("If-None-Match", ""):
+            response = Response(status=304)
+            response.headers["ETag"] = etag
+            return response
+        return json_response(body, gzipped=gzipped, etag=etag)
+
+    app.cache_info = cached_response.cache_info
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP API with trip counts from the rollups")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    args = parser.parse_args()
+    create_app().run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
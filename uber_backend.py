@@ -0,0 +1,372 @@
+# uber_backend.py
+# Execution backends for the batch pipeline: pandas (default) or PySpark.
+#
+# Both backends implement the same stages with the same rules:
+#   load_csv          read the source CSVs and tag each row with source_file
+#   clean             build pickup_datetime, drop rows where it is invalid
+#   dedup             drop duplicate trips by normalised key columns, keeping
+#                     the first one in load order
+#   derive            add pickup_date / hour / day_of_week / month
+#   summarize         the aggregations printed by data_analysis.py
+#   write_csv         write a frame as one CSV file
+#
+# Pick the backend with UBER_BACKEND=pandas|spark (or get_backend("spark")).
+# Spark runs in local[*] mode unless UBER_SPARK_MASTER is set, so it can be
+# tried on one machine before pointing it at a cluster.
+#
+# All three pipeline scripts switch backends: data_cleaning.py runs load_csv,
+# clean and dedup, data_transformation.py runs clean and derive, and
+# data_analysis.py runs summarize. On pandas the scripts keep their own code
+# (dedup history across runs, partitioned transformation), which calls the same
+# functions as PandasBackend (parse_pickup_datetime, find_duplicates,
+# derive_time_columns), so the Spark stages are held to what the scripts do.
+import glob
+import os
+import shutil
+
+import pandas as pd
+
+from uber_dedup import DEFAULT_KEYS, find_duplicates
+from uber_transform_engine import DAY_NAMES, derive_time_columns
+
+# Datetime formats tried in order, as (pandas strftime, Spark pattern) pairs.
+# Both backends use the same list so they parse exactly the same rows. Rows in
+# none of these formats count as invalid and are dropped.
+DATETIME_FORMATS = [
+    ("%m/%d/%Y %H:%M:%S", "M/d/yyyy H:mm:ss"),
+    ("%m/%d/%Y %H:%M", "M/d/yyyy H:mm"),
+    ("%m/%d/%Y %I:%M:%S %p", "M/d/yyyy h:mm:ss a"),
+    ("%m/%d/%Y %I:%M %p", "M/d/yyyy h:mm a"),
+    ("%Y-%m-%d %H:%M:%S", "yyyy-MM-dd H:mm:ss"),
+    ("%Y-%m-%d %H:%M", "yyyy-MM-dd H:mm"),
+    ("%Y.%m.%d %H:%M:%S", "yyyy.MM.dd H:mm:ss"),
+    ("%Y.%m.%d %H:%M", "yyyy.MM.dd H:mm"),
+]
+
+KEY_COLUMNS = ['pickup_datetime', 'source_file', 'pickup_hour', 'pickup_day_of_week']
+
+# Spark columns that record the order rows were loaded in (file, row in file),
+# so dedup keeps the same row as pandas; dropped by dedup and write_csv
+LOAD_ORDER = ['__load_file', '__load_row']
+
+
+def get_backend(name=None):
+    """Return the backend selected by name or by UBER_BACKEND (default pandas)"""
+    name = (name or os.environ.get("UBER_BACKEND", "pandas")).lower()
+    if name == "pandas":
+        return PandasBackend()
+    if name == "spark":
+        return SparkBackend()
+    raise ValueError(f"Unknown backend '{name}' (use 'pandas' or 'spark')")
+
+
+def pick_datetime_columns(non_null_counts, min_values=1000):
+    """Pick the date and time columns with the most values (like data_cleaning.py).
+
+    Returns ('pickup_datetime', None) when that column already exists, or
+    (None, None) when nothing suitable is found.
+    """
+    if 'pickup_datetime' in non_null_counts:
+        return 'pickup_datetime', None
+    date_columns = [c for c, n in non_null_counts.items() if 'date' in c.lower() and n > min_values]
+    time_columns = [c for c, n in non_null_counts.items() if 'time' in c.lower() and n > min_values]
+    if not date_columns or not time_columns:
+        return None, None
+    return (max(date_columns, key=non_null_counts.get),
+            max(time_columns, key=non_null_counts.get))
+
+
+def parse_pickup_datetime(text):
+    """Parse a Series of 'date time' strings with DATETIME_FORMATS (NaT where none fits)"""
+    parsed = pd.Series(pd.NaT, index=text.index, dtype="datetime64[ns]")
+    for pandas_format, _ in DATETIME_FORMATS:
+        missing = parsed.isna()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(text[missing], format=pandas_format, errors='coerce')
+    return parsed
+
+
+def _source_name(path):
+    return os.path.basename(path)
+
+
+class PandasBackend:
+    """Single-node pandas implementation (what the scripts have always used)"""
+
+    name = "pandas"
+
+    def load_csv(self, paths, encoding='latin1'):
+        frames = []
+        for path in paths:
+            df = pd.read_csv(path, encoding=encoding, low_memory=False)
+            if 'source_file' not in df.columns:
+                df['source_file'] = _source_name(path)
+            frames.append(df)
+        return pd.concat(frames, ignore_index=True)
+
+    def clean(self, df, min_values=1000):
+        counts = df.notna().sum().to_dict()
+        date_col, time_col = pick_datetime_columns(counts, min_values)
+        if date_col is None:
+            return df
+        if time_col is None:
+            text = df[date_col].astype(str)
+        else:
+            text = df[date_col].astype(str) + ' ' + df[time_col].astype(str)
+        df = df.assign(pickup_datetime=parse_pickup_datetime(text))
+        return df[df['pickup_datetime'].notna()]
+
+    def dedup(self, df, keys=DEFAULT_KEYS):
+        is_duplicate, _ = find_duplicates(df, keys=keys, history_path=None)
+        return df[~is_duplicate]
+
+    def derive(self, df):
+        df = df.copy()
+        for col, values in derive_time_columns(df['pickup_datetime']).items():
+            df[col] = values
+        return df
+
+    def summarize(self, df):
+        """Everything data_analysis.py prints, as plain pandas objects"""
+        rows = len(df)
+        summary = {
+            "rows": rows,
+            "columns": df.columns.tolist(),
+            "head": df.head(),
+            "missing": {c: int(df[c].isna().sum()) for c in KEY_COLUMNS if c in df.columns},
+            "memory_mb": df.memory_usage(deep=True).sum() / 1024 / 1024,
+        }
+        if 'pickup_datetime' in df.columns:
+            pickup = pd.to_datetime(df['pickup_datetime'], errors='coerce')
+            summary["valid_datetimes"] = int(pickup.notna().sum())
+            rides_per_day = pickup.dropna().dt.date.value_counts().sort_index()
+            rides_per_day.index.name = 'date'
+            summary["rides_per_day"] = rides_per_day.rename(None)
+        if 'pickup_hour' in df.columns:
+            summary["rides_per_hour"] = df['pickup_hour'].value_counts().sort_index()
+        if 'pickup_day_of_week' in df.columns:
+            summary["rides_per_weekday"] = df['pickup_day_of_week'].dropna().astype(str).value_counts()
+        if 'trip_duration_mins' in df.columns:
+            duration = pd.to_numeric(df['trip_duration_mins'], errors='coerce')
+            summary["duration"] = duration.describe() if duration.notna().any() else None
+        if 'source_file' in df.columns:
+            summary["rides_per_source"] = df['source_file'].value_counts()
+        return summary
+
+    def read_transformed(self, path):
+        return pd.read_csv(path, low_memory=False)
+
+    def write_csv(self, df, path):
+        df.to_csv(path, index=False)
+
+
+class SparkBackend:
+    """PySpark implementation of the same stages (local[*] by default)"""
+
+    name = "spark"
+
+    def __init__(self, master=None, app_name="uber-analytics"):
+        from pyspark.sql import SparkSession
+
+        master = master or os.environ.get("UBER_SPARK_MASTER", "local[*]")
+        self.spark = (
+            SparkSession.builder.master(master)
+            .appName(app_name)
+            .config("spark.sql.session.timeZone", "UTC")
+            .getOrCreate()
+        )
+
+    def load_csv(self, paths, encoding='latin1'):
+        from pyspark.sql import functions as F
+
+        result = None
+        for index, path in enumerate(paths):
+            df = self.spark.read.csv(path, header=True, encoding=encoding)
+            if 'source_file' not in df.columns:
+                df = df.withColumn('source_file', F.lit(_source_name(path)))
+            # A file is read in splits of increasing offset, so the ids follow its rows
+            df = df.withColumn(LOAD_ORDER[0], F.lit(index)).withColumn(LOAD_ORDER[1], F.monotonically_increasing_id())
+            result = df if result is None else result.unionByName(df, allowMissingColumns=True)
+        return result
+
+    def clean(self, df, min_values=1000):
+        from pyspark.sql import functions as F
+
+        counts = df.select([F.count(F.col(f"`{c}`")).alias(c) for c in df.columns]).first().asDict()
+        date_col, time_col = pick_datetime_columns(counts, min_values)
+        if date_col is None:
+            return df
+        if time_col is None:
+            text = F.col(f"`{date_col}`").cast("string")
+        else:
+            text = F.concat_ws(' ', F.col(f"`{date_col}`"), F.col(f"`{time_col}`"))
+
+        parsed = F.coalesce(*[F.try_to_timestamp(text, F.lit(fmt)) for _, fmt in DATETIME_FORMATS])
+        return df.withColumn('pickup_datetime', parsed).where(F.col('pickup_datetime').isNotNull())
+
+    def _key_column(self, df, key):
+        from pyspark.sql import functions as F
+
+        if key in df.columns:
+            columns = [key]
+        else:
+            columns = [c for c in df.columns if key.lower() in c.lower() and c != 'source_file']
+        if not columns:
+            return None
+        column = F.coalesce(*[F.col(f"`{c}`") for c in columns])
+        if dict(df.dtypes).get(columns[0]) == "string":
+            # Same normalisation as uber_dedup._normalize_text
+            column = F.trim(F.lower(F.regexp_replace(column, '[^A-Za-z0-9]+', ' ')))
+        return column
+
+    def _keep_first(self, df, columns):
+        """Keep the first row in load order of every group of equal columns"""
+        from pyspark.sql import Window
+        from pyspark.sql import functions as F
+
+        if LOAD_ORDER[1] not in df.columns:
+            # Not loaded by load_csv: the frame's own order
+            df = df.withColumn(LOAD_ORDER[1], F.monotonically_increasing_id())
+        order = [F.col(c) for c in LOAD_ORDER if c in df.columns]
+        window = Window.partitionBy(*[F.col(f"`{c}`") for c in columns]).orderBy(*order)
+        return (
+            df.withColumn("__dedup_rank", F.row_number().over(window))
+            .where(F.col("__dedup_rank") == 1)
+            .drop("__dedup_rank", *LOAD_ORDER)
+        )
+
+    def dedup(self, df, keys=DEFAULT_KEYS):
+        from pyspark.sql import functions as F
+
+        row_columns = [c for c in df.columns if c != 'source_file' and c not in LOAD_ORDER]
+        if not keys:
+            return self._keep_first(df, row_columns)
+        key_columns = []
+        for i, key in enumerate(keys):
+            column = self._key_column(df, key)
+            if column is None:
+                # Same rule as uber_dedup.fingerprint_with_keys: a missing key
+                # means whole rows are compared
+                return self._keep_first(df, row_columns)
+            name = f"__dedup_key_{i}"
+            df = df.withColumn(name, column)
+            key_columns.append(name)
+        # Rows without a value for every key are compared on all columns
+        incomplete = F.greatest(*[F.col(c).isNull() for c in key_columns]) if len(key_columns) > 1 \
+            else F.col(key_columns[0]).isNull()
+        row_hash = F.sha2(F.to_json(F.struct(*[F.col(f"`{c}`") for c in row_columns])), 256)
+        df = df.withColumn("__dedup_row", F.when(incomplete, row_hash))
+        return self._keep_first(df, key_columns + ["__dedup_row"]).drop(*key_columns, "__dedup_row")
+
+    def derive(self, df):
+        from pyspark.sql import functions as F
+
+        pickup = F.col('pickup_datetime')
+        # dayofweek() is 1 = Sunday ... 7 = Saturday; map it to DAY_NAMES order
+        weekday_index = (F.dayofweek(pickup) + 5) % 7
+        weekday_name = F.element_at(F.array(*[F.lit(d) for d in DAY_NAMES]), weekday_index + 1)
+        return (
+            df.withColumn('pickup_date', F.to_date(pickup))
+            .withColumn('pickup_hour', F.hour(pickup))
+            .withColumn('pickup_day_of_week', weekday_name)
+            .withColumn('pickup_month', F.month(pickup))
+        )
+
+    def summarize(self, df):
+        """Same summary as PandasBackend.summarize, computed by Spark"""
+        from pyspark.sql import functions as F
+
+        df = df.drop(*LOAD_ORDER)
+
+        def counts(column, sort_by_index):
+            result = df.where(F.col(column).isNotNull()).groupBy(column).count().toPandas()
+            series = result.set_index(column)['count']
+            series.index.name = None
+            return series.sort_index() if sort_by_index else series.sort_values(ascending=False, kind="stable")
+
+        columns = df.columns
+        present = [c for c in KEY_COLUMNS if c in columns]
+        totals = df.select(
+            [F.count(F.lit(1)).alias("__rows")]
+            + [F.count(F.col(c)).alias(c) for c in present]
+        ).first().asDict()
+        rows = totals.pop("__rows")
+        summary = {
+            "rows": rows,
+            "columns": columns,
+            "head": df.limit(5).toPandas(),
+            "missing": {c: rows - totals[c] for c in present},
+            "memory_mb": None,
+        }
+        if 'pickup_datetime' in columns:
+            pickup = F.try_to_timestamp(F.col('pickup_datetime'))
+            with_date = df.withColumn('__date', F.to_date(pickup))
+            summary["valid_datetimes"] = with_date.where(F.col('__date').isNotNull()).count()
+            per_day = with_date.where(F.col('__date').isNotNull()).groupBy('__date').count().toPandas()
+            rides_per_day = per_day.set_index('__date')['count'].sort_index()
+            rides_per_day.index.name = 'date'
+            summary["rides_per_day"] = rides_per_day.rename(None)
+        if 'pickup_hour' in columns:
+            summary["rides_per_hour"] = counts('pickup_hour', sort_by_index=True)
+        if 'pickup_day_of_week' in columns:
+            summary["rides_per_weekday"] = counts('pickup_day_of_week', sort_by_index=False)
+        if 'trip_duration_mins' in columns:
+            duration = df.select(F.col('trip_duration_mins').try_cast("double").alias("d")).where(F.col("d").isNotNull())
+            summary["duration"] = duration.toPandas()["d"].describe() if duration.limit(1).count() else None
+        if 'source_file' in columns:
+            summary["rides_per_source"] = counts('source_file', sort_by_index=False)
+        return summary
+
+    def read_transformed(self, path):
+        from pyspark.sql import functions as F
+
+        df = self.spark.read.csv(path, header=True)
+        for column in ('pickup_hour', 'pickup_month'):
+            if column in df.columns:
+                df = df.withColumn(column, F.col(column).try_cast("double"))
+        return df
+
+    def write_csv(self, df, path):
+        """Write df as one CSV file: Spark writes parts, which are joined in order"""
+        from uber_transform_engine import combine_parts
+
+        parts_dir = path + ".parts"
+        (df.drop(*LOAD_ORDER).write.mode("overwrite")
+         .csv(parts_dir, header=True, timestampFormat="yyyy-MM-dd HH:mm:ss", dateFormat="yyyy-MM-dd"))
+        # Empty partitions write empty parts without a header
+        parts = [p for p in sorted(glob.glob(os.path.join(parts_dir, "part-*"))) if os.path.getsize(p)]
+        combine_parts(parts, path)
+        shutil.rmtree(parts_dir, ignore_errors=True)
+
+
+def run_stages(backend, paths, keys=DEFAULT_KEYS):
+    """load -> clean -> dedup -> derive -> summarize on the given backend"""
+    df = backend.load_csv(paths)
+    df = backend.clean(df)
+    df = backend.dedup(df, keys)
+    df = backend.derive(df)
+    return backend.summarize(df)
+
+
+def compare_summaries(expected, actual):
+    """Return a list of differences between two summaries (empty = same output)"""
+    problems = []
+    if expected["rows"] != actual["rows"]:
+        problems.append(f"rows: {expected['rows']} != {actual['rows']}")
+    if expected["missing"] != actual["missing"]:
+        problems.append(f"missing: {expected['missing']} != {actual['missing']}")
+    for key in ("rides_per_day", "rides_per_hour", "rides_per_weekday", "rides_per_source"):
+        if (key in expected) != (key in actual):
+            problems.append(f"{key}: present in only one backend")
+            continue
+        if key not in expected:
+            continue
+        left = {str(k): int(v) for k, v in expected[key].items()}
+        right = {str(k): int(v) for k, v in actual[key].items()}
+        if key == "rides_per_hour":
+            left = {str(int(float(k))): v for k, v in left.items()}
+            right = {str(int(float(k))): v for k, v in right.items()}
+        if left != right:
+            problems.append(f"{key}: counts differ")
+    return problems
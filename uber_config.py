@@ -0,0 +1,43 @@
+# uber_config.py
+# Where the pipeline reads and writes its files.
+#
+# The defaults are the original layout: CSV files in ../data and results in
+# ../output, relative to the folder the scripts are run from. Override them
+# with the UBER_DATA_DIR / UBER_OUTPUT_DIR environment variables, or with the
+# --data-dir / --output-dir options of uber_analytics.py.
+#
+# Modules read these paths when they are imported, so set the environment
+# before importing them (the CLI does this for you). Only the standard
+# library is used here, to keep CLI startup fast.
+import os
+
+# Files in the data folder that load_all_excel.py reads (see uber_ingest.py)
+SOURCE_SUFFIXES = ('.csv', '.csv.gz', '.csv.zst', '.zip', '.xlsx')
+
+
+def data_dir():
+    return os.environ.get("UBER_DATA_DIR", "../data")
+
+
+def output_dir():
+    return os.environ.get("UBER_OUTPUT_DIR", "../output")
+
+
+def output_path(*parts):
+    return os.path.join(output_dir(), *parts)
+
+
+def combined_file():
+    return output_path("combined_uber_data.csv")
+
+
+def cleaned_file():
+    return output_path("cleaned_uber_data.csv")
+
+
+def transformed_file():
+    return output_path("transformed_uber_data.csv")
+
+
+def database_file():
+    return output_path("uber_data.db")
@@ -3,7 +3,14 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import numpy as np
+import json
+import os
+from uber_config import output_path
+from uber_snapshot import current_version
+from uber_rollups import data_range, query_range
+from uber_sample import read_sample, representative_sample
+from uber_quality import quality_report, summarize_report
+from uber_warmup import cached, filter_trips, load_trips, view_key, view_payload
 
 # Page configuration
 st.set_page_config(
@@ -37,24 +44,13 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-@st.cache_data
-def load_data():
-    """Load and cache the data"""
+# max_entries=1: only the current version stays cached, so an old frame (and
+# its memory map of an old snapshot file) is released after a publish
+@st.cache_resource(max_entries=1)
+def load_data(data_version):
+    """Load and cache the data (one copy shared by every session)"""
     try:
-        df = pd.read_csv("../output/transformed_uber_data.csv")
-        
-        # Handle duplicate columns with a simpler approach
-        cols = df.columns.tolist()
-        seen = {}
-        for i, col in enumerate(cols):
-            if col in seen:
-                seen[col] += 1
-                cols[i] = f"{col}_{seen[col]}"
-            else:
-                seen[col] = 0
-        df.columns = cols
-        
-        return df
+        return load_trips(data_version)
     except FileNotFoundError:
         st.error("Data file not found. Please ensure 'transformed_uber_data.csv' exists in the output folder.")
         return pd.DataFrame()
@@ -62,8 +58,31 @@ def load_data():
         st.error(f"Error loading data: {str(e)}")
         return pd.DataFrame()
 
-# Load data
-df = load_data()
+@st.cache_resource(max_entries=1)
+def load_sample(data_version):
+    """Stratified trip sample written for this data version (None if missing)"""
+    try:
+        return read_sample(data_version)
+    except FileNotFoundError:
+        return None
+
+@st.cache_data
+def load_quality(data_version):
+    """Quality rule results stored by data_transformation.py (empty if never checked)"""
+    try:
+        return quality_report()
+    except Exception:
+        return pd.DataFrame()
+
+# Read the published data version once per rerun and key everything below on
+# it (data, view cache, sample, quality), so a publish in the middle of a rerun
+# cannot mix two versions on one page.
+data_version = current_version()
+
+# Load data (keyed on the snapshot version so a new publish is picked up).
+# The cached frame is shared, so work on a shallow copy: columns replaced
+# below must not leak into other sessions.
+df = load_data(data_version).copy(deep=False)
 
 if df.empty:
     st.stop()
@@ -101,41 +120,55 @@ if 'pickup_date' in df.columns:
     )
 
 # Apply filters
-filtered_df = df.copy()
-
-if 'ride_type' in df.columns and selected_ride:
-    filtered_df = filtered_df[filtered_df['ride_type'].isin(selected_ride)]
+def apply_filters(frame):
+    return filter_trips(frame, selected_ride, start_hour, end_hour)
+
+filtered_df = apply_filters(df)
+
+# Aggregates for the metrics and charts, from the on-disk cache shared by all
+# sessions (warmed up by uber_warmup.py when new data is published)
+all_rides = 'ride_type' not in df.columns or not selected_ride or set(selected_ride) == set(ride_types)
+if data_version is not None:
+    view = cached(
+        data_version,
+        view_key(None if all_rides else selected_ride, start_hour, end_hour),
+        lambda: view_payload(filtered_df)
+    )
+else:
+    view = view_payload(filtered_df)
 
-if 'pickup_hour' in filtered_df.columns:
-    filtered_df = filtered_df[
-        (filtered_df['pickup_hour'] >= start_hour) & 
-        (filtered_df['pickup_hour'] <= end_hour)
-    ]
+def filtered_sample(n):
+    """Representative sample of n filtered trips, the same on every rerun (None without a stored sample)"""
+    trip_sample = load_sample(data_version)
+    if trip_sample is None:
+        return None
+    return representative_sample(apply_filters(trip_sample), n)
 
 # Key Metrics Row
 st.markdown("## 📊 Key Metrics")
 col1, col2, col3, col4 = st.columns(4)
 
 with col1:
-    total_trips = len(filtered_df)
+    total_trips = view['rows']
     st.metric("Total Trips", f"{total_trips:,}", delta=None)
 
 with col2:
-    if 'trip_duration_mins' in filtered_df.columns:
-        avg_duration = filtered_df['trip_duration_mins'].mean()
+    if 'avg_duration' in view:
+        avg_duration = view['avg_duration']
         st.metric("Avg Duration", f"{avg_duration:.1f} min", delta=None)
     else:
         st.metric("Avg Duration", "N/A", delta=None)
 
 with col3:
-    if 'fare_amount' in filtered_df.columns:
-        total_revenue = filtered_df['fare_amount'].sum()
+    if 'total_revenue' in view:
+        total_revenue = view['total_revenue']
         st.metric("Total Revenue", f"${total_revenue:,.2f}", delta=None)
     else:
         st.metric("Total Revenue", "N/A", delta=None)
 
 with col4:
-    peak_hour = filtered_df.groupby('pickup_hour').size().idxmax() if 'pickup_hour' in filtered_df.columns else "N/A"
+    peak_hour = view.get('peak_hour')
+    peak_hour = "N/A" if peak_hour is None else peak_hour
     st.metric("Peak Hour", f"{peak_hour}:00" if peak_hour != "N/A" else "N/A", delta=None)
 
 st.divider()
@@ -145,9 +178,9 @@ col1, col2 = st.columns(2)
 
 with col1:
     # Enhanced Trips by Hour
-    if 'pickup_hour' in filtered_df.columns:
+    if 'trips_by_hour' in view:
         st.markdown("### 🕐 Trips by Hour")
-        trips_by_hour = filtered_df.groupby('pickup_hour').size().reset_index(name='trip_count')
+        trips_by_hour = view['trips_by_hour']
         
         fig_hour = px.bar(
             trips_by_hour, 
@@ -166,9 +199,9 @@ with col1:
 
 with col2:
     # Enhanced Trips by Weekday
-    if 'pickup_day_of_week' in filtered_df.columns:
+    if 'trips_by_weekday' in view:
         st.markdown("### 📅 Trips by Weekday")
-        trips_by_weekday = filtered_df.groupby('pickup_day_of_week').size().reset_index(name='trip_count')
+        trips_by_weekday = view['trips_by_weekday'].copy()
         
         # Map day numbers to names
         day_names = {0: 'Mon', 1: 'Tue', 2: 'Wed', 3: 'Thu', 4: 'Fri', 5: 'Sat', 6: 'Sun'}
@@ -216,9 +249,9 @@ with col1:
 
 with col2:
     # Ride Type Distribution (if available)
-    if 'ride_type' in filtered_df.columns:
+    if 'ride_type_counts' in view:
         st.markdown("### 🚗 Ride Type Distribution")
-        ride_type_counts = filtered_df['ride_type'].value_counts()
+        ride_type_counts = view['ride_type_counts']
         
         fig_pie = px.pie(
             values=ride_type_counts.values,
@@ -228,12 +261,38 @@ with col2:
         fig_pie.update_traces(textposition='inside', textinfo='percent+label')
         st.plotly_chart(fig_pie, use_container_width=True)
 
+# Long-Range Trend (read from the precomputed time rollups, not the trips)
+rollup_first, rollup_last = data_range()
+if rollup_first is not None:
+    st.markdown("### 📉 Long-Range Trend")
+    trend_start, trend_end = rollup_first, rollup_last
+    if 'pickup_date' in df.columns and isinstance(date_range, (list, tuple)) and len(date_range) == 2:
+        trend_start = pd.Timestamp(date_range[0])
+        trend_end = pd.Timestamp(date_range[1]) + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+    trend_level, trend_df = query_range(trend_start, trend_end, max_points=1500, min_level="hour")
+    
+    fig_trend = px.line(
+        trend_df,
+        x='bucket_start',
+        y='trips',
+        title=f"Trips per {trend_level}"
+    )
+    fig_trend.update_layout(
+        xaxis_title="Date",
+        yaxis_title="Number of Trips"
+    )
+    st.plotly_chart(fig_trend, use_container_width=True)
+
 # Map Visualization (Full Width)
 if 'start_lat' in filtered_df.columns and 'start_lng' in filtered_df.columns:
     st.markdown("### 🗺️ Trip Locations")
     
     # Sample data for better performance
-    if len(filtered_df) > 1000:
+    map_sample = filtered_sample(1000) if len(filtered_df) > 1000 else None
+    if map_sample is not None:
+        map_df = map_sample
+        st.info("Showing a sample of 1000 trips (spread over dates, hours and files) for better map performance")
+    elif len(filtered_df) > 1000:
         map_df = filtered_df.sample(n=1000)
         st.info("Showing a random sample of 1000 trips for better map performance")
     else:
@@ -267,6 +326,27 @@ if 'start_lat' in filtered_df.columns and 'start_lng' in filtered_df.columns:
     else:
         st.warning("No valid coordinate data available for map visualization")
 
+# Live Trips Section (written by uber_streaming.py, if it is running)
+live_cube_path = output_path("cube", "live_counts.json")
+if os.path.exists(live_cube_path):
+    with open(live_cube_path, "r", encoding="utf-8") as f:
+        live_cube = json.load(f)
+    
+    st.markdown("## 📡 Live Trips")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Events Received", f"{live_cube['stats']['events']:,}")
+    with col2:
+        st.metric("Events / sec", f"{live_cube['stats']['events_per_sec']:,.0f}")
+    with col3:
+        st.metric("Newest Event", live_cube['newest_event'] or "N/A")
+    
+    if live_cube['hourly']:
+        live_hourly = pd.DataFrame(list(live_cube['hourly'].items()), columns=['hour', 'trip_count'])
+        fig_live = px.bar(live_hourly, x='hour', y='trip_count', title="Trips per Hour (rolling window)")
+        fig_live.update_layout(xaxis_title="Hour", yaxis_title="Number of Trips")
+        st.plotly_chart(fig_live, use_container_width=True)
+
 # Advanced Analytics Section
 st.markdown("## 📈 Advanced Analytics")
 
@@ -274,10 +354,9 @@ col1, col2 = st.columns(2)
 
 with col1:
     # Correlation heatmap (if numeric columns exist)
-    numeric_cols = filtered_df.select_dtypes(include=[np.number]).columns
-    if len(numeric_cols) > 1:
+    if 'corr_matrix' in view:
         st.markdown("### 🔥 Correlation Matrix")
-        corr_matrix = filtered_df[numeric_cols].corr()
+        corr_matrix = view['corr_matrix']
         
         fig_heatmap = px.imshow(
             corr_matrix,
@@ -289,11 +368,9 @@ with col1:
 
 with col2:
     # Trip statistics by ride type
-    if 'ride_type' in filtered_df.columns and 'trip_duration_mins' in filtered_df.columns:
+    if 'ride_type_stats' in view:
         st.markdown("### 📊 Statistics by Ride Type")
-        stats_df = filtered_df.groupby('ride_type')['trip_duration_mins'].agg([
-            'count', 'mean', 'median', 'std'
-        ]).round(2)
+        stats_df = view['ride_type_stats'].copy()
         stats_df.columns = ['Count', 'Mean Duration', 'Median Duration', 'Std Dev']
         st.dataframe(stats_df, use_container_width=True)
 
@@ -314,10 +391,26 @@ with col1:
 with col2:
     st.info(f"Current dataset contains {len(filtered_df)} trips after applying filters")
 
+# Data Quality (precomputed per source file, no rows are scanned here)
+with st.expander("🧪 Data Quality", expanded=False):
+    quality = load_quality(data_version)
+    if quality.empty:
+        st.info("No quality results yet. Run data_transformation.py to check the rules.")
+    else:
+        st.dataframe(summarize_report(quality), use_container_width=True, hide_index=True)
+        failing = quality[(quality['failed'] > 0) & ~quality['informational']]
+        if not failing.empty:
+            st.markdown("**Failures by source file**")
+            st.dataframe(
+                failing.pivot(index='source_file', columns='rule', values='failed').fillna(0).astype(int),
+                use_container_width=True
+            )
+
 # Sample Data Display
 with st.expander("🔍 View Sample Data", expanded=False):
+    preview_df = filtered_sample(100)
     st.dataframe(
-        filtered_df.head(100), 
+        preview_df if preview_df is not None else filtered_df.head(100), 
         use_container_width=True,
         height=400
     )
@@ -0,0 +1,197 @@
+# uber_dedup.py
+# Hash-based duplicate detection for the cleaning stage.
+#
+# Instead of comparing every column of the (very wide, sparse) combined frame,
+# each row is reduced to a 64-bit fingerprint of a few key columns and the
+# duplicates are found by sorting the fingerprints. The key columns are
+# normalised first, so the same trip coming from two files with different
+# column names or address formatting still gets the same fingerprint.
+#
+# Fingerprints from earlier runs are kept in a small .npz file, so new files
+# can be checked against trips that were already cleaned before.
+import os
+
+import numpy as np
+import pandas as pd
+
+from uber_config import output_path
+
+DEFAULT_KEYS = ["pickup_datetime", "address", "base"]
+FINGERPRINT_FILE = output_path("dedup_fingerprints.npz")
+
+
+def keys_from_env(default=DEFAULT_KEYS):
+    """Read the dedup keys from UBER_DEDUP_KEYS (comma separated) if set"""
+    value = os.environ.get("UBER_DEDUP_KEYS", "")
+    keys = [k.strip() for k in value.split(",") if k.strip()]
+    return keys or list(default)
+
+
+def _normalize_text(values):
+    normalized = (
+        values.astype(str)
+        .str.lower()
+        .str.replace(r"[^a-z0-9]+", " ", regex=True)
+        .str.strip()
+    )
+    return normalized.where(values.notna())
+
+
+def build_key_frame(df, keys):
+    """Resolve each key to a single normalised column.
+
+    A key is either an exact column name or a word that is matched against the
+    column names (case-insensitive). When several columns match, e.g.
+    'PICK UP ADDRESS' and 'PU_Address' from different files, they are
+    coalesced into one value per row.
+    """
+    parts = {}
+    for key in keys:
+        if key in df.columns:
+            column = df[key]
+        else:
+            candidates = [
+                col for col in df.columns
+                if key.lower() in col.lower() and col != "source_file"
+            ]
+            if not candidates:
+                continue
+            if len(candidates) == 1:
+                column = df[candidates[0]]
+            else:
+                column = df[candidates].bfill(axis=1).iloc[:, 0]
+
+        if column.dtype == object or isinstance(column.dtype, pd.StringDtype):
+            column = _normalize_text(column)
+        parts[key] = column
+    return pd.DataFrame(parts, index=df.index)
+
+
+def _hash_rows(frame):
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy(dtype=np.uint64)
+
+
+def fingerprint_with_keys(df, keys=None):
+    """Return (one uint64 fingerprint per row, which keys were used).
+
+    With keys=None every column except source_file is hashed, which matches
+    a plain drop_duplicates() that ignores the per-row file tag.
+
+    A row is only compared on the keys when it has a value for every one of
+    them. If a key matches no column at all, or a row has no value for it
+    (e.g. trips from a file without an address column in the combined frame),
+    the row is compared on all of its columns instead. Otherwise distinct
+    trips that share a pickup time would be dropped as duplicates.
+    """
+    full_row = df.drop(columns=["source_file"], errors="ignore")
+    if keys is None:
+        return _hash_rows(full_row), {"keys": [], "missing": [], "full_row_rows": len(df)}
+
+    key_frame = build_key_frame(df, keys)
+    missing = [key for key in keys if key not in key_frame.columns]
+    if missing or len(key_frame.columns) == 0:
+        return _hash_rows(full_row), {"keys": list(key_frame.columns), "missing": missing,
+                                      "full_row_rows": len(df)}
+
+    fps = _hash_rows(key_frame)
+    incomplete = key_frame.isna().any(axis=1).to_numpy()
+    if incomplete.any():
+        fps[incomplete] = _hash_rows(full_row[incomplete])
+    return fps, {"keys": list(key_frame.columns), "missing": [], "full_row_rows": int(incomplete.sum())}
+
+
+def fingerprint(df, keys=None):
+    """Return one uint64 fingerprint per row (see fingerprint_with_keys())"""
+    return fingerprint_with_keys(df, keys)[0]
+
+
+def load_history(path=FINGERPRINT_FILE):
+    """Load fingerprints saved by earlier runs (sorted, with their file names)"""
+    if not path or not os.path.exists(path):
+        return np.empty(0, dtype=np.uint64), np.empty(0, dtype=object)
+    with np.load(path, allow_pickle=False) as saved:
+        files = saved["files"].astype(object)
+        return saved["fingerprints"], files[saved["file_index"]]
+
+
+def save_history(fingerprints, file_names, path=FINGERPRINT_FILE):
+    """Save fingerprints sorted, so the next run can binary-search them"""
+    order = np.argsort(fingerprints, kind="stable")
+    codes, files = pd.factorize(np.asarray(file_names, dtype=object)[order])
+    tmp_path = path + ".tmp.npz"
+    np.savez(
+        tmp_path,
+        fingerprints=fingerprints[order],
+        file_index=codes.astype(np.int32),
+        files=np.asarray(files, dtype=str),
+    )
+    os.replace(tmp_path, path)
+
+
+def find_duplicates(df, keys=DEFAULT_KEYS, history_path=FINGERPRINT_FILE):
+    """Flag duplicate rows. Returns (is_duplicate mask, report dict).
+
+    The first occurrence of a fingerprint is kept. A duplicate counts as
+    'within file' when the kept row came from the same source_file and as
+    'across files' otherwise. Rows matching a fingerprint from an earlier run
+    count as 'history' duplicates. Files that appear again in df replace their
+    old fingerprints, so re-running the full pipeline is not affected.
+    """
+    n = len(df)
+    fps, key_usage = fingerprint_with_keys(df, keys)
+    if "source_file" in df.columns:
+        file_names = df["source_file"].astype(str).to_numpy(dtype=object)
+    else:
+        file_names = np.full(n, "", dtype=object)
+    file_codes = pd.factorize(file_names)[0]
+
+    # Duplicates within this batch: sort fingerprints, compare neighbours
+    order = np.argsort(fps, kind="stable")
+    sorted_fps = fps[order]
+    dup_sorted = np.zeros(n, dtype=bool)
+    dup_sorted[1:] = sorted_fps[1:] == sorted_fps[:-1]
+    group_start = np.maximum.accumulate(np.where(dup_sorted, 0, np.arange(n)))
+    first_code_sorted = file_codes[order][group_start]
+
+    is_dup = np.empty(n, dtype=bool)
+    is_dup[order] = dup_sorted
+    first_code = np.empty(n, dtype=file_codes.dtype)
+    first_code[order] = first_code_sorted
+    across = is_dup & (file_codes != first_code)
+    within = is_dup & ~across
+
+    # Duplicates against fingerprints saved by earlier runs
+    hist_fps, hist_files = load_history(history_path)
+    keep_hist = ~np.isin(hist_files, np.unique(file_names))
+    hist_fps, hist_files = hist_fps[keep_hist], hist_files[keep_hist]
+    from_history = np.zeros(n, dtype=bool)
+    if len(hist_fps):
+        pos = np.searchsorted(hist_fps, fps)
+        pos = np.minimum(pos, len(hist_fps) - 1)
+        from_history = ~is_dup & (hist_fps[pos] == fps)
+    is_dup |= from_history
+
+    if history_path:
+        kept = ~is_dup
+        save_history(
+            np.concatenate([hist_fps, fps[kept]]),
+            np.concatenate([hist_files, file_names[kept]]),
+            history_path,
+        )
+
+    per_file = pd.DataFrame({
+        "source_file": file_names,
+        "within_file": within,
+        "across_files": across,
+        "history": from_history,
+    }).groupby("source_file").sum()
+    report = {
+        "rows": n,
+        "duplicates": int(is_dup.sum()),
+        "within_file": int(within.sum()),
+        "across_files": int(across.sum()),
+        "history": int(from_history.sum()),
+        "per_file": per_file[per_file.sum(axis=1) > 0],
+        "keys": key_usage,
+    }
+    return is_dup, report
@@ -0,0 +1,240 @@
+# uber_ingest.py
+# Readers for the source files in the data folder: plain, gzip and zstd
+# compressed CSVs, zip archives of CSVs, and Excel workbooks.
+#
+# Nothing is unpacked to disk. Compressed files are decompressed in a
+# background thread into a small queue of blocks, which pandas parses in
+# chunks on the calling thread while the next blocks are being decompressed.
+# Excel sheets are read with openpyxl in read-only (streaming) mode, also in a
+# background thread, and turned into DataFrames chunk by chunk.
+#
+# .csv.zst needs the optional zstandard package (pip install zstandard).
+import gzip
+import io
+import os
+import queue
+import threading
+import time
+import zipfile
+
+import pandas as pd
+
+from uber_config import SOURCE_SUFFIXES
+
+CHUNK_ROWS = 100_000
+BLOCK_SIZE = 1 << 20  # 1 MB of decompressed data per queued block
+QUEUE_BLOCKS = 8
+
+
+def list_sources(data_folder):
+    """Names of the readable source files in data_folder, sorted"""
+    return sorted(f for f in os.listdir(data_folder) if f.lower().endswith(SOURCE_SUFFIXES))
+
+
+def source_format(name):
+    lower = name.lower()
+    for suffix in SOURCE_SUFFIXES:
+        if lower.endswith(suffix):
+            return suffix.lstrip(".")
+    raise ValueError(f"Unsupported source file '{name}'")
+
+
+class BackgroundStream(io.RawIOBase):
+    """Read-only stream whose data is produced by a background thread.
+
+    open_stream() is called on the thread and must return a binary file
+    object; its blocks go through a bounded queue, so decompression runs at
+    most QUEUE_BLOCKS blocks ahead of the reader.
+    """
+
+    def __init__(self, open_stream, block_size=BLOCK_SIZE, queue_blocks=QUEUE_BLOCKS):
+        self.bytes_read = 0
+        self._queue = queue.Queue(maxsize=queue_blocks)
+        self._block = memoryview(b"")
+        self._eof = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._pump, args=(open_stream, block_size), daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _pump(self, open_stream, block_size):
+        try:
+            with open_stream() as stream:
+                while not self._stop.is_set():
+                    block = stream.read(block_size)
+                    if not block or not self._put(block):
+                        break
+        except Exception as e:
+            self._put(e)
+        self._put(None)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._block and not self._eof:
+            item = self._queue.get()
+            if item is None:
+                self._eof = True
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                self._block = memoryview(item)
+        n = min(len(buffer), len(self._block))
+        buffer[:n] = self._block[:n]
+        self._block = self._block[n:]
+        self.bytes_read += n
+        return n
+
+    def close(self):
+        self._stop.set()
+        super().close()
+
+
+def _background_items(produce, maxsize=2):
+    """Run the generator function produce() on a thread and yield its items"""
+    items = queue.Queue(maxsize=maxsize)
+    done = object()
+
+    def run():
+        try:
+            for item in produce():
+                items.put(item)
+        except Exception as e:
+            items.put(e)
+        items.put(done)
+
+    threading.Thread(target=run, daemon=True).start()
+    while True:
+        item = items.get()
+        if item is done:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+def _open_zstd(path):
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("reading .csv.zst files needs the zstandard package (pip install zstandard)")
+    return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+
+
+def _parse_csv(open_stream, chunk_rows, background):
+    """Parse a binary CSV stream in chunks. Returns (DataFrame, uncompressed bytes)."""
+    if background:
+        raw = BackgroundStream(open_stream)
+        stream = io.BufferedReader(raw, buffer_size=BLOCK_SIZE)
+    else:
+        raw = stream = open_stream()
+    try:
+        chunks = list(pd.read_csv(stream, encoding='latin1', chunksize=chunk_rows))
+        # Decompressing streams report their position in the uncompressed data
+        size = raw.bytes_read if background else raw.tell()
+    finally:
+        stream.close()
+    frame = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+    return frame, size
+
+
+def _xlsx_chunks(path, sheet_name, chunk_rows):
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook[sheet_name].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(c) if c is not None else f"Unnamed: {i}" for i, c in enumerate(header)]
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= chunk_rows:
+                yield pd.DataFrame(batch, columns=columns)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=columns)
+    finally:
+        workbook.close()
+
+
+def read_source(path, chunk_rows=CHUNK_ROWS, background=True):
+    """Read one source file. Yields (source_file tag, DataFrame, stats) per table.
+
+    A zip archive yields one table per CSV member and a workbook one per
+    sheet. The tag is the file name without the compression suffix (the zip
+    member name, or the workbook name plus the sheet for multi-sheet files),
+    so a file keeps its tag whether it arrives compressed or not.
+    """
+    name = os.path.basename(path)
+    kind = source_format(name)
+    compressed = os.path.getsize(path)
+
+    def stats(tag, frame, seconds, uncompressed, compressed_bytes=compressed):
+        return {"source_file": tag, "format": kind, "rows": len(frame), "seconds": seconds,
+                "compressed_bytes": compressed_bytes, "uncompressed_bytes": uncompressed}
+
+    start = time.perf_counter()
+    if kind in ("csv", "csv.gz", "csv.zst"):
+        opener = {
+            "csv": lambda: open(path, "rb"),
+            "csv.gz": lambda: gzip.open(path, "rb"),
+            "csv.zst": lambda: _open_zstd(path),
+        }[kind]
+        frame, size = _parse_csv(opener, chunk_rows, background)
+        tag = name[:-len(kind) - 1] + ".csv" if kind != "csv" else name
+        yield tag, frame, stats(tag, frame, time.perf_counter() - start, size)
+
+    elif kind == "zip":
+        with zipfile.ZipFile(path) as archive:
+            members = [m for m in archive.infolist() if m.filename.lower().endswith(".csv") and not m.is_dir()]
+            for member in members:
+                start = time.perf_counter()
+                frame, _ = _parse_csv(lambda: archive.open(member), chunk_rows, background)
+                tag = os.path.basename(member.filename)
+                yield tag, frame, stats(tag, frame, time.perf_counter() - start,
+                                        member.file_size, member.compress_size)
+
+    elif kind == "xlsx":
+        import openpyxl
+
+        workbook = openpyxl.load_workbook(path, read_only=True)
+        sheets = workbook.sheetnames
+        workbook.close()
+        # An .xlsx file is a zip archive; its XML parts are the uncompressed size
+        with zipfile.ZipFile(path) as archive:
+            uncompressed = sum(m.file_size for m in archive.infolist())
+        for sheet in sheets:
+            start = time.perf_counter()
+            produce = lambda: _xlsx_chunks(path, sheet, chunk_rows)
+            chunks = list(_background_items(produce) if background else produce())
+            frame = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+            tag = name if len(sheets) == 1 else f"{name}[{sheet}]"
+            share = compressed // len(sheets), uncompressed // len(sheets)
+            yield tag, frame, stats(tag, frame, time.perf_counter() - start, share[1], share[0])
+
+
+def ingest_report(all_stats):
+    """Per-table throughput: compressed MB/s (read from disk) and uncompressed MB/s (parsed)"""
+    report = pd.DataFrame(all_stats)
+    if report.empty:
+        return report
+    seconds = report['seconds'].clip(lower=1e-9)
+    report['compressed_mb'] = report['compressed_bytes'] / 1e6
+    report['uncompressed_mb'] = report['uncompressed_bytes'] / 1e6
+    report['compressed_mb_s'] = report['compressed_mb'] / seconds
+    report['uncompressed_mb_s'] = report['uncompressed_mb'] / seconds
+    report['rows_s'] = report['rows'] / seconds
+    return report[['source_file', 'format', 'rows', 'seconds', 'compressed_mb', 'uncompressed_mb',
+                   'compressed_mb_s', 'uncompressed_mb_s', 'rows_s']]
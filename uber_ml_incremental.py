@@ -0,0 +1,262 @@
+# uber_ml_incremental.py
+# Incremental training for the demo model in uber_ml_prediction.py
+# (predict the time period of a trip from its day of week).
+#
+# Instead of retraining on the whole history every run, only the transformed
+# partitions (one per source_file, written by data_transformation.py) that the
+# saved state has not seen yet are used:
+#   - SGDRegressor is updated with partial_fit on each new partition
+#   - RandomForestRegressor is refit on a bounded training set: the last
+#     WINDOW_PARTITIONS partitions plus a reservoir sample of the older rows
+#     (a fixed number per day of week, a uniform sample within each day so
+#     the time periods keep their real shares)
+# so the cost of an update stays about the same however much history there is.
+#
+# A partition whose file changed (modification time or size) is read again:
+# its old rows leave the window
+# and the reservoir, and only the rows it did not have before go through
+# partial_fit (the state keeps a day x time-period count per partition).
+#
+# The state (models, window, reservoir and the partitions already seen) is
+# saved with joblib in <output>/models/incremental_state.joblib.
+import os
+import time
+from collections import deque
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import SGDRegressor
+from sklearn.metrics import mean_absolute_error
+
+from uber_config import output_path
+from uber_transform_engine import PARTITION_DIR
+
+STATE_PATH = output_path("models", "incremental_state.joblib")
+WINDOW_PARTITIONS = 7
+RESERVOIR_PER_DAY = 2000
+
+DAYS_MAP = {'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3, 'friday': 4, 'saturday': 5, 'sunday': 6}
+
+
+def time_period(hour):
+    """0 early morning (0-5), 1 morning (6-11), 2 afternoon (12-17), 3 evening (18-23)"""
+    return np.searchsorted([6, 12, 18], hour, side='right').astype(np.int8)
+
+
+def prepare_features(df):
+    """Same features and target as uber_ml_prediction.py: (day_of_week, time_period)"""
+    hour = pd.to_numeric(df['pickup_hour'], errors='coerce')
+    day = df['pickup_day_of_week'].astype(str).str.lower().map(DAYS_MAP)
+    valid = hour.notna() & day.notna()
+    return day[valid].to_numpy(dtype=np.int8), time_period(hour[valid].to_numpy())
+
+
+def _one_hot(day):
+    return np.eye(7, dtype=np.float32)[day]
+
+
+def list_partitions(partition_dir=PARTITION_DIR):
+    """{partition name: path} for the transformed parts, oldest file first"""
+    parts = []
+    if os.path.isdir(partition_dir):
+        for name in os.listdir(partition_dir):
+            if name.startswith("part-") and name.endswith(".csv"):
+                path = os.path.join(partition_dir, name)
+                # part-00003-<source file>.csv -> <source file>
+                key = name.split("-", 2)[2][:-len(".csv")]
+                parts.append((os.path.getmtime(path), key, path))
+    return {key: path for _, key, path in sorted(parts)}
+
+
+def new_state():
+    return {
+        "seen": {},  # partition name -> (mtime_ns, size) of the file when it was trained on
+        "sgd": SGDRegressor(random_state=42),
+        "forest": None,
+        "trained": {},  # partition name -> day x period counts given to partial_fit
+        "window": deque(),  # (name, day, period) for the newest partitions
+        "reservoir": pd.DataFrame({"partition": pd.Series(dtype=object),
+                                   "day": np.empty(0, np.int8),
+                                   "period": np.empty(0, np.int8),
+                                   "priority": np.empty(0)}),
+        "rng": np.random.default_rng(42),
+        "history": [],
+    }
+
+
+def load_state(path=STATE_PATH):
+    if not os.path.exists(path):
+        return new_state()
+    state = joblib.load(path)
+    # States saved before changed partitions were tracked
+    state.setdefault("trained", {})
+    # States that only kept the file size: read those partitions once more
+    state["seen"] = {name: (None, seen) if isinstance(seen, int) else seen for name, seen in state["seen"].items()}
+    if "partition" not in state["reservoir"].columns:
+        state["reservoir"].insert(0, "partition", None)
+    return state
+
+
+def save_state(state, path=STATE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    joblib.dump(state, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _add_to_reservoir(state, name, day, period):
+    """Stratified reservoir: keep the rows with the smallest random priority per day.
+
+    Giving every row a uniform random priority and keeping the k smallest per
+    day is a uniform sample of everything that day has ever seen, and can be
+    merged batch by batch without a per-row loop. The time period is the
+    target, so it is not a stratum: capping it would even out the labels.
+    """
+    incoming = pd.DataFrame({
+        "partition": name,
+        "day": day,
+        "period": period,
+        "priority": state["rng"].random(len(day)),
+    })
+    merged = pd.concat([state["reservoir"], incoming], ignore_index=True)
+    merged = merged.sort_values("priority", kind="stable")
+    state["reservoir"] = merged.groupby("day").head(RESERVOIR_PER_DAY).reset_index(drop=True)
+
+
+def _drop_partition(state, name):
+    """Forget the window and reservoir rows of a partition that is read again"""
+    state["window"] = deque(entry for entry in state["window"] if entry[0] != name)
+    reservoir = state["reservoir"]
+    state["reservoir"] = reservoir[reservoir["partition"] != name].reset_index(drop=True)
+
+
+def _label_counts(day, period):
+    counts = np.zeros((7, 4), dtype=np.int64)
+    np.add.at(counts, (day, period), 1)
+    return counts
+
+
+def _untrained_rows(day, period, trained_counts):
+    """Mask of the rows partial_fit has not seen yet.
+
+    partial_fit already had trained_counts[d, p] rows with day d and period p
+    from this partition, so the first that many of each pair are skipped and
+    only the rest (rows added to the file) count as new.
+    """
+    if trained_counts is None:
+        return np.ones(len(day), dtype=bool)
+    pair = day.astype(np.int64) * 4 + period
+    rank = pd.Series(pair).groupby(pair).cumcount().to_numpy()
+    return rank >= trained_counts.ravel()[pair]
+
+
+def _fit_forest(state):
+    window_day = [day for _, day, _ in state["window"]]
+    window_period = [period for _, _, period in state["window"]]
+    day = np.concatenate(window_day + [state["reservoir"]["day"].to_numpy(np.int8)])
+    period = np.concatenate(window_period + [state["reservoir"]["period"].to_numpy(np.int8)])
+    if len(day) == 0:
+        state["forest"] = None
+        return 0
+    forest = RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=-1)
+    forest.fit(day.reshape(-1, 1), period)
+    state["forest"] = forest
+    return len(day)
+
+
+def file_signature(path):
+    """(mtime_ns, size): an edit that keeps the size still changes the time"""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def update(state, partitions):
+    """Train on partitions ({name: path}) that the state has not seen yet.
+
+    Returns a list of per-partition results. The new rows of each partition
+    are first used to evaluate the current models (prequential MAE), then to
+    train them.
+    """
+    results = []
+    for name, path in partitions.items():
+        signature = file_signature(path)
+        if state["seen"].get(name) == signature:
+            continue
+        start = time.perf_counter()
+        day, period = prepare_features(
+            pd.read_csv(path, usecols=['pickup_hour', 'pickup_day_of_week'], low_memory=False)
+        )
+        changed = name in state["seen"]
+        if changed:
+            _drop_partition(state, name)
+        elif len(day) == 0:
+            state["seen"][name] = signature
+            continue
+        fresh = _untrained_rows(day, period, state["trained"].get(name))
+        new_day, new_period = day[fresh], period[fresh]
+        result = {"partition": name, "rows": len(day), "new_rows": len(new_day), "changed": changed}
+
+        if len(new_day):
+            if state["forest"] is not None:
+                result["forest_mae"] = mean_absolute_error(
+                    new_period, state["forest"].predict(new_day.reshape(-1, 1)))
+            if hasattr(state["sgd"], "coef_"):
+                result["sgd_mae"] = mean_absolute_error(new_period, state["sgd"].predict(_one_hot(new_day)))
+            state["sgd"].partial_fit(_one_hot(new_day), new_period)
+            state["trained"][name] = np.maximum(
+                state["trained"].get(name, 0), _label_counts(day, period))
+
+        if len(day):
+            state["window"].append((name, day, period))
+        while len(state["window"]) > WINDOW_PARTITIONS:
+            old_name, old_day, old_period = state["window"].popleft()
+            _add_to_reservoir(state, old_name, old_day, old_period)
+
+        state["seen"][name] = signature
+        result["seconds"] = time.perf_counter() - start
+        results.append(result)
+
+    if results:
+        start = time.perf_counter()
+        rows = _fit_forest(state)
+        seconds = time.perf_counter() - start
+        for result in results:
+            result["forest_rows"] = rows
+        results[-1]["seconds"] += seconds
+        state["history"] = (state["history"] + results)[-1000:]
+    return results
+
+
+def main(partition_dir=PARTITION_DIR, state_path=STATE_PATH):
+    """Train on the new partitions. Returns the per-partition results (None on error)."""
+    print("Starting incremental training...")
+    partitions = list_partitions(partition_dir)
+    if not partitions:
+        print(f"ERROR: No transformed partitions found in {partition_dir}")
+        print("Please run data_transformation.py first.")
+        return None
+
+    state = load_state(state_path)
+    print(f"✅ State has seen {len(state['seen'])} partitions, {len(partitions)} available")
+
+    start = time.perf_counter()
+    results = update(state, partitions)
+    if not results:
+        print("✅ Models are up to date, nothing to train")
+        return results
+    save_state(state, state_path)
+
+    for result in results:
+        scores = ", ".join(
+            f"{model} MAE {result[model + '_mae']:.3f}"
+            for model in ("sgd", "forest") if model + "_mae" in result
+        )
+        changed = f" (changed since last run, {result['new_rows']:,} new)" if result["changed"] else ""
+        print(f"  ✅ {result['partition']}: {result['rows']:,} rows{changed}"
+              + (f" - before update: {scores}" if scores else ""))
+    print(f"✅ Random forest refit on {results[-1]['forest_rows']:,} rows "
+          f"({len(state['window'])} window partitions + {len(state['reservoir']):,} reservoir rows)")
+    print(f"✅ Update took {time.perf_counter() - start:.2f}s, state saved to {state_path}")
+    return results
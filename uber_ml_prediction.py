@@ -1,78 +1,135 @@
 # uber_ml_prediction.py
-import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.metrics import mean_absolute_error
-
-# Load and clean column names
-df = pd.read_csv("../output/transformed_uber_data.csv", low_memory=False)
-df.columns = df.columns.str.strip().str.lower().str.replace(" ", "_")
-
-print(f"Total rows: {len(df)}")
-
-# Check what's actually in these columns
-cols = ['pickup_hour', 'pickup_day_of_week', 'trip_duration_mins']
-for col in cols:
-    if col in df.columns:
-        print(f"\n{col}: {df[col].count()}/{len(df)} non-null")
-        print(f"Sample values: {df[col].dropna().head(5).tolist()}")
+import os
+import sys
+import uber_config
+
+DAY_NAMES = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+PERIOD_NAMES = ['Early AM', 'Morning', 'Afternoon', 'Evening']
+
+
+def model_file():
+    return uber_config.output_path("models", "demo_model.joblib")
+
+
+def train(input_file=None, model_path=None):
+    """Train the demo model and save it with joblib. Returns the MAE (None without data)."""
+    import joblib
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.metrics import mean_absolute_error
+
+    # Load and clean column names
+    df = pd.read_csv(input_file or uber_config.transformed_file(), low_memory=False)
+    df.columns = df.columns.str.strip().str.lower().str.replace(" ", "_")
+
+    print(f"Total rows: {len(df)}")
+
+    # Check what's actually in these columns
+    cols = ['pickup_hour', 'pickup_day_of_week', 'trip_duration_mins']
+    for col in cols:
+        if col in df.columns:
+            print(f"\n{col}: {df[col].count()}/{len(df)} non-null")
+            print(f"Sample values: {df[col].dropna().head(5).tolist()}")
+        else:
+            print(f"\n❌ {col} column missing!")
+
+    # Check ALL columns with data
+    print(f"\nColumns with actual data:")
+    for col in df.columns:
+        count = len(df[col].dropna())
+        if count > 0:
+            print(f"  {col}: {count} values")
+
+    # Since we don't have trip duration, let's check what we can predict
+    print(f"\nLet's see what's in pickup_datetime:")
+    print(f"Sample pickup_datetime values: {df['pickup_datetime'].dropna().head(5).tolist()}")
+
+    # Instead of predicting trip duration, let's predict pickup_hour from day_of_week
+    # This is just a demo to show the model works
+    print(f"\n=== Creating Demo Model: Predict Time Period from Day of Week ===")
+
+    # Clean the data we do have
+    df['pickup_hour'] = pd.to_numeric(df['pickup_hour'], errors='coerce')
+    days_map = {'monday':0, 'tuesday':1, 'wednesday':2, 'thursday':3, 'friday':4, 'saturday':5, 'sunday':6}
+    df['pickup_day_of_week'] = df['pickup_day_of_week'].astype(str).str.lower().map(days_map)
+
+    # Create a simple target: categorize hours into time periods
+    df['time_period'] = df['pickup_hour'].apply(lambda x: 
+        0 if x < 6 else    # Early morning (0-5)
+        1 if x < 12 else   # Morning (6-11)  
+        2 if x < 18 else   # Afternoon (12-17)
+        3)                 # Evening (18-23)
+
+    df_clean = df.dropna(subset=['pickup_hour', 'pickup_day_of_week'])
+    print(f"Clean data available: {len(df_clean)} rows")
+
+    if len(df_clean) > 0:
+        # Train model to predict time period from day of week
+        X = df_clean[['pickup_day_of_week']]
+        y = df_clean['time_period']
+        
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+        
+        model = RandomForestRegressor(n_estimators=100, random_state=42)
+        model.fit(X_train, y_train)
+        
+        y_pred = model.predict(X_test)
+        mae = mean_absolute_error(y_test, y_pred)
+        
+        print(f"✅ Demo Model MAE: {mae:.3f} (predicting time period 0-3)")
+        print(f"Training samples: {len(X_train)}, Test samples: {len(X_test)}")
+        
+        # Show some predictions
+        print(f"\nSample predictions:")
+        for i in range(min(5, len(X_test))):
+            day = int(X_test.iloc[i]['pickup_day_of_week'])
+            actual_period = int(y_test.iloc[i])
+            pred_period = int(round(y_pred[i]))
+            print(f"  {DAY_NAMES[day]} → Actual: {PERIOD_NAMES[actual_period]}, Predicted: {PERIOD_NAMES[pred_period]}")
+
+        model_path = model_path or model_file()
+        os.makedirs(os.path.dirname(model_path), exist_ok=True)
+        joblib.dump(model, model_path)
+        print(f"\n✅ Model saved to {model_path}")
+        return mae
+    else:
+        print("❌ No valid data found. Check your CSV file!")
+        return None
+
+
+def day_index(day):
+    """Index in DAY_NAMES of a day name or its first letters (at least 3), e.g. monday or Sat"""
+    from uber_transform_engine import DAY_NAMES as FULL_DAY_NAMES
+
+    name = day.strip().title()
+    for index, full_name in enumerate(FULL_DAY_NAMES):
+        if len(name) >= 3 and full_name.startswith(name):
+            return index
+    raise ValueError(f"Unknown day '{day}' (use a day name like monday or sat)")
+
+
+def predict(days, model_path=None):
+    """Predicted time period name for each day name (e.g. ["monday", "Sat"])"""
+    import joblib
+    import pandas as pd
+
+    model = joblib.load(model_path or model_file())
+    X = pd.DataFrame([[day_index(day)] for day in days], columns=['pickup_day_of_week'])
+    return [PERIOD_NAMES[int(round(value))] for value in model.predict(X)]
+
+
+if __name__ == "__main__":
+    # Incremental mode: only train on partitions that are new since the last run
+    # (see uber_ml_incremental.py)
+    if "--incremental" in sys.argv:
+        from uber_ml_incremental import main as incremental_main
+        result = incremental_main()
+    # Model selection mode: cross-validate several models (see uber_model_selection.py)
+    elif "--select" in sys.argv:
+        from uber_model_selection import main as selection_main
+        result = selection_main()
     else:
-        print(f"\n❌ {col} column missing!")
-
-# Check ALL columns with data
-print(f"\nColumns with actual data:")
-for col in df.columns:
-    count = len(df[col].dropna())
-    if count > 0:
-        print(f"  {col}: {count} values")
-
-# Since we don't have trip duration, let's check what we can predict
-print(f"\nLet's see what's in pickup_datetime:")
-print(f"Sample pickup_datetime values: {df['pickup_datetime'].dropna().head(5).tolist()}")
-
-# Instead of predicting trip duration, let's predict pickup_hour from day_of_week
-# This is just a demo to show the model works
-print(f"\n=== Creating Demo Model: Predict Time Period from Day of Week ===")
-
-# Clean the data we do have
-df['pickup_hour'] = pd.to_numeric(df['pickup_hour'], errors='coerce')
-days_map = {'monday':0, 'tuesday':1, 'wednesday':2, 'thursday':3, 'friday':4, 'saturday':5, 'sunday':6}
-df['pickup_day_of_week'] = df['pickup_day_of_week'].astype(str).str.lower().map(days_map)
-
-# Create a simple target: categorize hours into time periods
-df['time_period'] = df['pickup_hour'].apply(lambda x: 
-    0 if x < 6 else    # Early morning (0-5)
-    1 if x < 12 else   # Morning (6-11)  
-    2 if x < 18 else   # Afternoon (12-17)
-    3)                 # Evening (18-23)
-
-df_clean = df.dropna(subset=['pickup_hour', 'pickup_day_of_week'])
-print(f"Clean data available: {len(df_clean)} rows")
-
-if len(df_clean) > 0:
-    # Train model to predict time period from day of week
-    X = df_clean[['pickup_day_of_week']]
-    y = df_clean['time_period']
-    
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
-    model.fit(X_train, y_train)
-    
-    y_pred = model.predict(X_test)
-    mae = mean_absolute_error(y_test, y_pred)
-    
-    print(f"✅ Demo Model MAE: {mae:.3f} (predicting time period 0-3)")
-    print(f"Training samples: {len(X_train)}, Test samples: {len(X_test)}")
-    
-    # Show some predictions
-    print(f"\nSample predictions:")
-    for i in range(min(5, len(X_test))):
-        day_names = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
-        period_names = ['Early AM', 'Morning', 'Afternoon', 'Evening']
-        day = int(X_test.iloc[i]['pickup_day_of_week'])
-        actual_period = int(y_test.iloc[i])
-        pred_period = int(round(y_pred[i]))
-        print(f"  {day_names[day]} → Actual: {period_names[actual_period]}, Predicted: {period_names[pred_period]}")
-else:
-    print("❌ No valid data found. Check your CSV file!")
\ No newline at end of file
+        result = train()
+    if result is None:
+        sys.exit(1)
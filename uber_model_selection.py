@@ -0,0 +1,195 @@
+# uber_model_selection.py
+# Cross-validated model selection for the demo model in uber_ml_prediction.py.
+#
+# The feature matrix is built once from the transformed data and cached as
+# .npy files that are memory-mapped on later runs (and shared with the joblib
+# workers instead of being copied into each of them). The cache key is the
+# input file's size and modification time, so it is rebuilt when the data
+# changes.
+#
+# Candidates (model + hyperparameters) are scored with time-series
+# cross-validation: rows are ordered by pickup time and every fold trains on
+# the past and tests on the following block. Folds run in rounds, in parallel
+# with joblib; after each round only the better half of the candidates go on
+# to the next fold, so weak candidates stop early.
+#
+# The result is a leaderboard (MAE, fit time, predict latency) written to
+# <output>/models/leaderboard.csv.
+import hashlib
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import Ridge, SGDRegressor
+from sklearn.metrics import mean_absolute_error
+from sklearn.model_selection import ParameterGrid, TimeSeriesSplit
+from sklearn.tree import DecisionTreeRegressor
+
+from uber_config import output_path, transformed_file
+from uber_ml_incremental import DAYS_MAP, time_period
+
+INPUT_FILE = transformed_file()
+CACHE_DIR = output_path("models", "feature_cache")
+LEADERBOARD_FILE = output_path("models", "leaderboard.csv")
+
+FEATURES = ['day_of_week', 'month', 'day_of_month']
+
+CANDIDATES = {
+    "ridge": (Ridge(), {"alpha": [0.1, 1.0, 10.0]}),
+    "sgd": (SGDRegressor(random_state=42), {"alpha": [1e-4, 1e-3]}),
+    "decision_tree": (DecisionTreeRegressor(random_state=42), {"max_depth": [4, 8, None]}),
+    "random_forest": (RandomForestRegressor(random_state=42, n_jobs=1),
+                      {"n_estimators": [50, 100], "max_depth": [8, None]}),
+    "hist_gradient_boosting": (HistGradientBoostingRegressor(random_state=42),
+                               {"learning_rate": [0.05, 0.1], "max_iter": [100]}),
+}
+
+
+def _cache_key(input_file):
+    stat = os.stat(input_file)
+    raw = f"{os.path.abspath(input_file)}:{stat.st_size}:{stat.st_mtime_ns}:{','.join(FEATURES)}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def build_features(df):
+    """Feature matrix (float32) and target, ordered by pickup time"""
+    df = df.assign(
+        pickup_datetime=pd.to_datetime(df['pickup_datetime'], errors='coerce'),
+        pickup_hour=pd.to_numeric(df['pickup_hour'], errors='coerce'),
+        day_of_week=df['pickup_day_of_week'].astype(str).str.lower().map(DAYS_MAP),
+    )
+    df = df.dropna(subset=['pickup_datetime', 'pickup_hour', 'day_of_week'])
+    df = df.sort_values('pickup_datetime', kind='stable')
+    X = np.column_stack([
+        df['day_of_week'].to_numpy(),
+        df['pickup_datetime'].dt.month.to_numpy(),
+        df['pickup_datetime'].dt.day.to_numpy(),
+    ]).astype(np.float32)
+    return X, time_period(df['pickup_hour'].to_numpy()).astype(np.float32)
+
+
+def load_features(input_file=INPUT_FILE, cache_dir=CACHE_DIR):
+    """Return memory-mapped (X, y), building and caching them on first use"""
+    key = _cache_key(input_file)
+    x_path = os.path.join(cache_dir, f"X-{key}.npy")
+    y_path = os.path.join(cache_dir, f"y-{key}.npy")
+    if not (os.path.exists(x_path) and os.path.exists(y_path)):
+        os.makedirs(cache_dir, exist_ok=True)
+        df = pd.read_csv(input_file, usecols=['pickup_datetime', 'pickup_hour', 'pickup_day_of_week'],
+                         low_memory=False)
+        X, y = build_features(df)
+        for path, array in ((x_path, X), (y_path, y)):
+            tmp_path = path[:-len(".npy")] + ".tmp.npy"
+            np.save(tmp_path, array)
+            os.replace(tmp_path, path)
+        # Only the current data's cache is useful; drop older ones
+        for name in os.listdir(cache_dir):
+            if name.endswith(".npy") and key not in name:
+                os.remove(os.path.join(cache_dir, name))
+    return np.load(x_path, mmap_mode='r'), np.load(y_path, mmap_mode='r')
+
+
+def candidate_list(candidates=CANDIDATES):
+    """Expand the parameter grids into (name, params, estimator) tuples"""
+    result = []
+    for model_name, (estimator, grid) in candidates.items():
+        for params in ParameterGrid(grid):
+            label = model_name + ("(" + ", ".join(f"{k}={v}" for k, v in params.items()) + ")" if params else "")
+            result.append((label, params, clone(estimator).set_params(**params)))
+    return result
+
+
+def _score_fold(estimator, X, y, train_index, test_index):
+    """Fit on one fold; return (mae, fit seconds, predict ms per 1k rows, single-row ms)"""
+    model = clone(estimator)
+    start = time.perf_counter()
+    model.fit(X[train_index], y[train_index])
+    fit_seconds = time.perf_counter() - start
+
+    X_test = X[test_index]
+    start = time.perf_counter()
+    predictions = model.predict(X_test)
+    predict_ms = (time.perf_counter() - start) * 1000 / max(len(test_index), 1) * 1000
+
+    single = X_test[:1]
+    timings = []
+    for _ in range(5):
+        start = time.perf_counter()
+        model.predict(single)
+        timings.append(time.perf_counter() - start)
+    return mean_absolute_error(y[test_index], predictions), fit_seconds, predict_ms, float(np.median(timings) * 1000)
+
+
+def select_models(X, y, candidates=None, n_splits=5, keep_fraction=0.5,
+                  max_train_size=None, n_jobs=-1):
+    """Successive-halving time-series CV. Returns the leaderboard DataFrame."""
+    candidates = candidates or candidate_list()
+    folds = list(TimeSeriesSplit(n_splits=n_splits, max_train_size=max_train_size).split(X))
+    scores = {label: [] for label, _, _ in candidates}
+    active = list(candidates)
+    stopped_at = {}
+
+    with Parallel(n_jobs=n_jobs) as parallel:
+        for fold_number, (train_index, test_index) in enumerate(folds, 1):
+            results = parallel(
+                delayed(_score_fold)(estimator, X, y, train_index, test_index)
+                for _, _, estimator in active
+            )
+            for (label, _, _), result in zip(active, results):
+                scores[label].append(result)
+
+            if fold_number == len(folds):
+                break
+            # Early stopping: only the better part of the field runs the next fold
+            ranked = sorted(active, key=lambda c: np.mean([s[0] for s in scores[c[0]]]))
+            keep = max(1, int(np.ceil(len(ranked) * keep_fraction)))
+            for label, _, _ in ranked[keep:]:
+                stopped_at[label] = fold_number
+            active = ranked[:keep]
+
+    rows = []
+    for label, params, _ in candidates:
+        fold_scores = np.array(scores[label])
+        rows.append({
+            "model": label,
+            "folds": len(fold_scores),
+            "mae": fold_scores[:, 0].mean(),
+            "mae_std": fold_scores[:, 0].std(),
+            "fit_seconds": fold_scores[:, 1].mean(),
+            "predict_ms_per_1k": fold_scores[:, 2].mean(),
+            "single_row_ms": fold_scores[:, 3].mean(),
+            "status": f"stopped after fold {stopped_at[label]}" if label in stopped_at else "finished",
+        })
+    # Candidates that survived more folds first, then by error
+    leaderboard = pd.DataFrame(rows).sort_values(["folds", "mae"], ascending=[False, True])
+    return leaderboard.reset_index(drop=True)
+
+
+def main(input_file=INPUT_FILE, leaderboard_file=LEADERBOARD_FILE):
+    """Cross-validate the candidates. Returns the leaderboard (None on error)."""
+    print("Starting model selection...")
+    if not os.path.exists(input_file):
+        print(f"ERROR: {input_file} not found!")
+        print("Please run data_transformation.py first.")
+        return None
+
+    start = time.perf_counter()
+    X, y = load_features(input_file)
+    print(f"✅ Feature matrix {X.shape} ready in {time.perf_counter() - start:.2f}s (memory-mapped cache)")
+
+    candidates = candidate_list()
+    print(f"Evaluating {len(candidates)} candidates with time-series cross-validation...")
+    start = time.perf_counter()
+    leaderboard = select_models(X, y, candidates)
+    print(f"✅ Model selection took {time.perf_counter() - start:.1f}s")
+
+    os.makedirs(os.path.dirname(leaderboard_file), exist_ok=True)
+    leaderboard.to_csv(leaderboard_file, index=False)
+    print("\nLeaderboard:")
+    print(leaderboard.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+    print(f"\n✅ Leaderboard saved to {leaderboard_file}")
+    return leaderboard
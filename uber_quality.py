@@ -0,0 +1,321 @@
+# uber_quality.py
+# Declarative data-quality rules, checked per partition (source_file).
+#
+# Each rule in RULES is a plain dict: a check type, the column it reads and
+# the check's settings. The check types are
+#   not_null               the column has a value
+#   range                  numeric value between min and max (inclusive)
+#   allowed                value is one of values
+#   monotonic              the pickup time is not earlier than the one of the
+#                          row before it, in source row order
+#   cross_file_duplicates  the trip (fingerprint of keys, see uber_dedup.py)
+#                          also appears in another file
+#   invalid_datetimes      data_cleaning.py could parse the trip's date and time
+# A rule whose column is not in the data is left out of the results. A rule
+# with "informational": True is reported, but its failures are not problems
+# with the data (raw files are not sorted by time, so the monotonic rule only
+# says how far from sorted each file is).
+#
+# data_transformation.py runs update_quality() on the transformed trips. All
+# rules of a partition are evaluated together with vectorized pandas
+# operations. The results go into the quality_results table of uber_data.db,
+# with a signature of the columns the rules read, so unchanged partitions are
+# skipped on the next run.
+#
+# Cross-file duplicates are a property of the data before duplicates are
+# removed (afterwards there are none left), so they are not counted on the
+# transformed trips. data_cleaning.py calls record_input_fingerprints() on its
+# input just before it removes duplicates, with the same keys (UBER_DEDUP_KEYS).
+# That saves the trip fingerprints of each source file in <output>/quality/,
+# and update_quality() recounts the duplicates from those files. In the same
+# way data_cleaning.py saves how many rows of each source file had a date and
+# time it could not parse (record_invalid_datetimes()), before it drops them.
+#
+# data_analysis.py (ANALYSIS 7) and the dashboard read quality_report()
+# instead of scanning the data again.
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+from uber_config import database_file, output_path
+from uber_dedup import fingerprint, keys_from_env
+from uber_transform_engine import DAY_NAMES
+
+DB_PATH = database_file()
+FINGERPRINT_DIR = output_path("quality")
+INVALID_DATETIMES_FILE = "invalid_datetimes.json"
+
+# Checks counted from what data_cleaning.py saved, not from the partitions
+SAVED_CHECKS = ("cross_file_duplicates", "invalid_datetimes")
+
+RULES = [
+    {"name": "pickup_datetime present", "check": "not_null", "column": "pickup_datetime"},
+    {"name": "source_file present", "check": "not_null", "column": "source_file"},
+    {"name": "pickup_hour present", "check": "not_null", "column": "pickup_hour"},
+    {"name": "pickup_day_of_week present", "check": "not_null", "column": "pickup_day_of_week"},
+    {"name": "pickup_hour 0-23", "check": "range", "column": "pickup_hour", "min": 0, "max": 23},
+    {"name": "pickup_month 1-12", "check": "range", "column": "pickup_month", "min": 1, "max": 12},
+    {"name": "start_lat valid", "check": "range", "column": "start_lat", "min": -90, "max": 90},
+    {"name": "start_lng valid", "check": "range", "column": "start_lng", "min": -180, "max": 180},
+    {"name": "pickup_day_of_week is a day name", "check": "allowed", "column": "pickup_day_of_week",
+     "values": DAY_NAMES},
+    {"name": "pickup_datetime in file order", "check": "monotonic", "column": "pickup_datetime",
+     "informational": True},
+    {"name": "trip not in another file", "check": "cross_file_duplicates", "keys": keys_from_env()},
+    {"name": "date and time readable", "check": "invalid_datetimes"},
+]
+
+
+def connect(db_path=DB_PATH):
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS quality_results (
+        source_file TEXT NOT NULL,
+        rule TEXT NOT NULL,
+        checked INTEGER NOT NULL,
+        failed INTEGER NOT NULL,
+        PRIMARY KEY (source_file, rule)
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS quality_partitions (
+        source_file TEXT PRIMARY KEY,
+        signature TEXT NOT NULL,
+        rows INTEGER NOT NULL,
+        checked_at REAL NOT NULL
+    )
+    """)
+    return conn
+
+
+def rule_columns(df, rules=RULES):
+    """Columns of df that the per-partition rules read (what the signature covers)"""
+    columns = set()
+    for rule in rules:
+        if rule["check"] not in SAVED_CHECKS and rule["column"] in df.columns:
+            columns.add(rule["column"])
+    return sorted(columns)
+
+
+def partition_signature(part, rules=RULES):
+    columns = rule_columns(part, rules)
+    hashed = np.zeros(0, dtype=np.uint64)
+    if columns:
+        hashed = pd.util.hash_pandas_object(part[columns], index=False).to_numpy(dtype=np.uint64)
+    if any(rule["check"] == "monotonic" and rule["column"] in columns for rule in rules):
+        # Row order matters for the monotonic rule, so weight each hash by position
+        hashed = hashed * (np.arange(len(hashed), dtype=np.uint64) + np.uint64(1))
+    rule_text = repr([(rule["name"], sorted(rule.items())) for rule in rules])
+    rules_hash = hashlib.sha1(rule_text.encode("utf-8")).hexdigest()[:8]
+    return f"{len(part)}:{','.join(columns)}:{int(hashed.sum(dtype=np.uint64))}:{rules_hash}"
+
+
+def evaluate(part, rules=RULES):
+    """Check every per-partition rule. Returns {rule name: (checked, failed)}."""
+    n = len(part)
+    results = {}
+    for rule in rules:
+        check = rule["check"]
+        if check in SAVED_CHECKS or rule["column"] not in part.columns:
+            continue
+        values = part[rule["column"]]
+        if check == "not_null":
+            checked, failed = n, values.isna()
+        elif check == "range":
+            present = values.notna()
+            numeric = pd.to_numeric(values, errors="coerce")
+            checked, failed = present.sum(), present & ~numeric.between(rule["min"], rule["max"])
+        elif check == "allowed":
+            present = values.notna()
+            checked, failed = present.sum(), present & ~values.isin(rule["values"])
+        elif check == "monotonic":
+            # Rows of the partition are in source row order; missing times are skipped
+            stamps = pd.to_datetime(values, errors="coerce").dropna()
+            checked, failed = len(stamps), stamps.diff() < pd.Timedelta(0)
+        else:
+            raise ValueError(f"Unknown check '{check}' in rule '{rule['name']}'")
+        results[rule["name"]] = (int(checked), int(failed.sum()))
+    return results
+
+
+def _rule_prefix(rule):
+    return hashlib.sha1(rule["name"].encode("utf-8")).hexdigest()[:8] + "-"
+
+
+def _fingerprint_path(source_file, rule, fingerprint_dir):
+    name = hashlib.sha1(source_file.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(fingerprint_dir, f"{_rule_prefix(rule)}{name}.npy")
+
+
+def _source_groups(df):
+    if 'source_file' in df.columns:
+        return df.groupby(df['source_file'].astype(str), sort=True)
+    return [("all", df)]
+
+
+def record_input_fingerprints(df, rules=RULES, fingerprint_dir=FINGERPRINT_DIR):
+    """Save the trip fingerprints of every source file in df, for the duplicate rules.
+
+    df is the data before duplicates are removed. Fingerprints of source files
+    that are no longer in df are deleted. Returns the number of files saved.
+    """
+    os.makedirs(fingerprint_dir, exist_ok=True)
+    saved = set()
+    for source_file, part in _source_groups(df):
+        for rule in rules:
+            if rule["check"] == "cross_file_duplicates":
+                path = _fingerprint_path(source_file, rule, fingerprint_dir)
+                np.save(path, fingerprint(part, rule["keys"]))
+                saved.add(os.path.basename(path))
+    for name in os.listdir(fingerprint_dir):
+        if name.endswith(".npy") and name not in saved:
+            os.remove(os.path.join(fingerprint_dir, name))
+    return len(saved)
+
+
+def record_invalid_datetimes(df, fingerprint_dir=FINGERPRINT_DIR):
+    """Save the rows and unparsed pickup times (NaT) of every source file in df.
+
+    df is the data before the rows with invalid times are dropped. Returns the
+    number of invalid times.
+    """
+    os.makedirs(fingerprint_dir, exist_ok=True)
+    counts = {source_file: [len(part), int(part['pickup_datetime'].isna().sum())]
+              for source_file, part in _source_groups(df)}
+    path = os.path.join(fingerprint_dir, INVALID_DATETIMES_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(counts, f)
+    os.replace(path + ".tmp", path)
+    return sum(invalid for _, invalid in counts.values())
+
+
+def _count_invalid_datetimes(fingerprint_dir):
+    """{source_file: (rows, invalid times)} as saved by record_invalid_datetimes()"""
+    try:
+        with open(os.path.join(fingerprint_dir, INVALID_DATETIMES_FILE), encoding="utf-8") as f:
+            return {source: tuple(counts) for source, counts in json.load(f).items()}
+    except FileNotFoundError:
+        return {}
+
+
+def _count_cross_file(rule, partitions, fingerprint_dir):
+    """{source_file: (rows, rows whose fingerprint is also in another source file)}
+
+    Every saved source file counts, also one that has no rows left after
+    duplicates were removed; only the partitions get a result.
+    """
+    prefix = _rule_prefix(rule)
+    paths = [os.path.join(fingerprint_dir, name) for name in sorted(os.listdir(fingerprint_dir))
+             if name.startswith(prefix) and name.endswith(".npy")]
+    if not paths:
+        return {}
+    # A fingerprint seen in more than one source file is a cross-file duplicate
+    distinct = np.concatenate([np.unique(np.load(path)) for path in paths])
+    values, counts = np.unique(distinct, return_counts=True)
+    shared = values[counts > 1]
+    result = {}
+    for source in partitions:
+        path = _fingerprint_path(source, rule, fingerprint_dir)
+        if os.path.exists(path):
+            fingerprints = np.load(path)
+            result[source] = (len(fingerprints), int(np.isin(fingerprints, shared).sum()))
+    return result
+
+
+def update_quality(df, rules=RULES, db_path=DB_PATH, fingerprint_dir=FINGERPRINT_DIR, prune_missing=False):
+    """Check the partitions of df that changed since the last run.
+
+    Returns a dict with the partitions that were checked, skipped and removed.
+    """
+    groups = _source_groups(df)
+    saved_rules = [rule for rule in rules if rule["check"] in SAVED_CHECKS]
+
+    conn = connect(db_path)
+    known = dict(conn.execute("SELECT source_file, signature FROM quality_partitions"))
+    result = {"checked": [], "skipped": [], "removed": []}
+    seen = set()
+
+    for source_file, part in groups:
+        seen.add(source_file)
+        signature = partition_signature(part, rules)
+        if known.get(source_file) == signature:
+            result["skipped"].append(source_file)
+            continue
+
+        counts = evaluate(part, rules)
+        with conn:
+            conn.execute("DELETE FROM quality_results WHERE source_file = ?", (source_file,))
+            conn.executemany(
+                "INSERT INTO quality_results VALUES (?, ?, ?, ?)",
+                [(source_file, name, checked, failed) for name, (checked, failed) in counts.items()],
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO quality_partitions VALUES (?, ?, ?, ?)",
+                (source_file, signature, len(part), time.time()),
+            )
+        result["checked"].append(source_file)
+
+    if prune_missing:
+        for source_file in set(known) - seen:
+            with conn:
+                conn.execute("DELETE FROM quality_results WHERE source_file = ?", (source_file,))
+                conn.execute("DELETE FROM quality_partitions WHERE source_file = ?", (source_file,))
+            result["removed"].append(source_file)
+
+    # Cross-file duplicates: recount them from the fingerprints saved before
+    # duplicates were removed (no rows are read). Checked is the number of
+    # trips the source file had at that point. Invalid times are reported for
+    # every file cleaned, also one that had no valid rows left.
+    partitions = [row[0] for row in conn.execute("SELECT source_file FROM quality_partitions")]
+    for rule in saved_rules:
+        if not os.path.isdir(fingerprint_dir):
+            counts = {}
+        elif rule["check"] == "cross_file_duplicates":
+            counts = _count_cross_file(rule, partitions, fingerprint_dir)
+        else:
+            counts = _count_invalid_datetimes(fingerprint_dir)
+        with conn:
+            conn.execute("DELETE FROM quality_results WHERE rule = ?", (rule["name"],))
+            conn.executemany(
+                "INSERT INTO quality_results VALUES (?, ?, ?, ?)",
+                [(source, rule["name"], checked, failed) for source, (checked, failed) in counts.items()],
+            )
+
+    conn.close()
+    return result
+
+
+def _informational(rule_names, rules):
+    names = {rule["name"] for rule in rules if rule.get("informational")}
+    return rule_names.isin(names)
+
+
+def quality_report(db_path=DB_PATH, rules=RULES):
+    """Stored results per source_file and rule (empty if never checked)"""
+    if not os.path.exists(db_path):
+        return pd.DataFrame(columns=["source_file", "rule", "checked", "failed", "failed_pct", "informational"])
+    conn = connect(db_path)
+    report = pd.read_sql_query(
+        "SELECT source_file, rule, checked, failed FROM quality_results ORDER BY source_file, rule", conn
+    )
+    conn.close()
+    report["failed_pct"] = report["failed"] / report["checked"].clip(lower=1) * 100
+    report["informational"] = _informational(report["rule"], rules)
+    return report
+
+
+def summarize_report(report, rules=RULES):
+    """Totals per rule, in the order of rules"""
+    totals = report.groupby("rule")[["checked", "failed"]].sum()
+    order = [rule["name"] for rule in rules if rule["name"] in totals.index]
+    totals = totals.reindex(order)
+    totals["failed_pct"] = totals["failed"] / totals["checked"].clip(lower=1) * 100
+    totals = totals.reset_index()
+    totals["informational"] = _informational(totals["rule"], rules)
+    return totals
@@ -0,0 +1,214 @@
+# uber_rollups.py
+# Multi-resolution time rollups (minute, hour, day, week, month).
+#
+# Trip counts are stored per (level, bucket start, source_file) in the
+# time_rollups table of uber_data.db. Minute counts are computed once from the
+# trips and every coarser level is summed up from a finer level whose buckets
+# nest inside its own (see ROLLED_UP_FROM), so a rebuild never has to rescan
+# the rows more than once. Weeks cross month boundaries, so months are summed
+# from days, not from weeks.
+#
+# Updates are incremental per partition (source_file): a partition whose
+# pickup times have not changed is skipped, and a changed partition only
+# replaces its own rows, so only the buckets it touches are rewritten.
+#
+# query_range() picks the finest level that still fits the point budget for
+# the requested span, so e.g. a 5-year trend with a 2,000 point budget reads
+# about 1,800 precomputed daily values instead of scanning every trip.
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+from uber_config import database_file
+
+DB_PATH = database_file()
+
+# Levels from finest to coarsest, with their (average) bucket size in seconds
+LEVELS = [
+    ("minute", 60),
+    ("hour", 3600),
+    ("day", 86400),
+    ("week", 7 * 86400),
+    ("month", 2629746),
+]
+
+# The finer level each level is summed from; its buckets must nest cleanly
+ROLLED_UP_FROM = {
+    "hour": "minute",
+    "day": "hour",
+    "week": "day",
+    "month": "day",
+}
+
+
+def connect(db_path=DB_PATH):
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS time_rollups (
+        level TEXT NOT NULL,
+        bucket INTEGER NOT NULL,
+        source_file TEXT NOT NULL,
+        trips INTEGER NOT NULL,
+        PRIMARY KEY (level, bucket, source_file)
+    ) WITHOUT ROWID
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS rollup_partitions (
+        source_file TEXT PRIMARY KEY,
+        signature TEXT NOT NULL,
+        trips INTEGER NOT NULL,
+        built_at REAL NOT NULL
+    )
+    """)
+    return conn
+
+
+def _bucket_starts(seconds, level):
+    """Start of the bucket (epoch seconds) that each timestamp falls into"""
+    if level == "minute":
+        return seconds - seconds % 60
+    if level == "hour":
+        return seconds - seconds % 3600
+    days = np.floor_divide(seconds, 86400)
+    if level == "day":
+        return days * 86400
+    if level == "week":
+        # Weeks start on Monday; 1970-01-01 was a Thursday
+        return (days - (days + 3) % 7) * 86400
+    if level == "month":
+        months = days.astype("datetime64[D]").astype("datetime64[M]")
+        return months.astype("datetime64[D]").astype(np.int64) * 86400
+    raise ValueError(f"Unknown rollup level '{level}'")
+
+
+def build_pyramid(pickup):
+    """Count trips per bucket for every level. Returns {level: (buckets, counts)}"""
+    values = pickup.to_numpy(dtype="datetime64[ns]")
+    values = values[~np.isnat(values)]
+    seconds = values.astype("datetime64[s]").astype(np.int64)
+
+    pyramid = {}
+    pyramid["minute"] = np.unique(_bucket_starts(seconds, "minute"), return_counts=True)
+    for level, _ in LEVELS[1:]:
+        # Roll a finer level up instead of going back to the rows
+        buckets, counts = pyramid[ROLLED_UP_FROM[level]]
+        coarse, inverse = np.unique(_bucket_starts(buckets, level), return_inverse=True)
+        pyramid[level] = (coarse, np.bincount(inverse, weights=counts, minlength=len(coarse)).astype(np.int64))
+    return pyramid
+
+
+def partition_signature(pickup):
+    """Order-independent signature of a partition's pickup times"""
+    values = pickup.to_numpy(dtype="datetime64[ns]").view(np.int64)
+    hashed = pd.util.hash_array(values)
+    return f"{len(values)}:{int(hashed.sum(dtype=np.uint64))}"
+
+
+def update_rollups(df, db_path=DB_PATH, prune_missing=False):
+    """Bring the rollups up to date with df, one source_file partition at a time.
+
+    Returns a dict with the partitions that were rebuilt, skipped and removed.
+    With prune_missing=True, partitions no longer present in df are dropped.
+    """
+    if 'source_file' in df.columns:
+        groups = df.groupby(df['source_file'].astype(str), sort=True)
+    else:
+        groups = [("all", df)]
+
+    conn = connect(db_path)
+    known = dict(conn.execute("SELECT source_file, signature FROM rollup_partitions"))
+    result = {"rebuilt": [], "skipped": [], "removed": []}
+    seen = set()
+
+    for source_file, part in groups:
+        seen.add(source_file)
+        pickup = pd.to_datetime(part['pickup_datetime'], errors='coerce')
+        signature = partition_signature(pickup)
+        if known.get(source_file) == signature:
+            result["skipped"].append(source_file)
+            continue
+
+        pyramid = build_pyramid(pickup)
+        rows = [
+            (level, int(bucket), source_file, int(count))
+            for level, (buckets, counts) in pyramid.items()
+            for bucket, count in zip(buckets, counts)
+        ]
+        with conn:
+            conn.execute("DELETE FROM time_rollups WHERE source_file = ?", (source_file,))
+            conn.executemany("INSERT INTO time_rollups VALUES (?, ?, ?, ?)", rows)
+            conn.execute(
+                "INSERT OR REPLACE INTO rollup_partitions VALUES (?, ?, ?, ?)",
+                (source_file, signature, int(pickup.notna().sum()), time.time()),
+            )
+        result["rebuilt"].append(source_file)
+
+    if prune_missing:
+        for source_file in set(known) - seen:
+            with conn:
+                conn.execute("DELETE FROM time_rollups WHERE source_file = ?", (source_file,))
+                conn.execute("DELETE FROM rollup_partitions WHERE source_file = ?", (source_file,))
+            result["removed"].append(source_file)
+
+    conn.close()
+    return result
+
+
+def choose_level(start, end, max_points=2000, min_level="minute"):
+    """Finest level (not finer than min_level) whose bucket count fits max_points"""
+    span = max((pd.Timestamp(end) - pd.Timestamp(start)).total_seconds(), 1)
+    names = [name for name, _ in LEVELS]
+    candidates = LEVELS[names.index(min_level):]
+    for level, size in candidates:
+        if span / size <= max_points:
+            return level
+    return candidates[-1][0]
+
+
+def query_range(start, end, max_points=2000, level=None, min_level="minute",
+                sources=None, db_path=DB_PATH):
+    """Trips per bucket between start and end (inclusive).
+
+    Returns (level, DataFrame[bucket_start, trips]). The level is picked with
+    choose_level() unless given explicitly.
+    """
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    level = level or choose_level(start, end, max_points, min_level)
+    lo = int(_bucket_starts(np.array([start.value // 10**9]), level)[0])
+    hi = end.value // 10**9
+
+    sql = """
+    SELECT bucket, SUM(trips) FROM time_rollups
+    WHERE level = ? AND bucket BETWEEN ? AND ?
+    """
+    params = [level, lo, hi]
+    if sources:
+        sql += f" AND source_file IN ({', '.join('?' for _ in sources)})"
+        params += list(sources)
+    sql += " GROUP BY bucket ORDER BY bucket"
+
+    conn = connect(db_path)
+    rows = conn.execute(sql, params).fetchall()
+    conn.close()
+
+    result = pd.DataFrame(rows, columns=["bucket_start", "trips"])
+    result["bucket_start"] = pd.to_datetime(result["bucket_start"], unit="s")
+    return level, result
+
+
+def data_range(db_path=DB_PATH):
+    """(first, last) minute covered by the rollups, or (None, None)"""
+    if not os.path.exists(db_path):
+        return None, None
+    conn = connect(db_path)
+    first, last = conn.execute(
+        "SELECT MIN(bucket), MAX(bucket) FROM time_rollups WHERE level = 'minute'"
+    ).fetchone()
+    conn.close()
+    if first is None:
+        return None, None
+    return pd.to_datetime(first, unit="s"), pd.to_datetime(last, unit="s")
@@ -0,0 +1,163 @@
+# uber_sample.py
+# Stratified reservoir sample of the trips, for the dashboard map and previews.
+#
+# data_transformation.py keeps up to PER_STRATUM trips for every
+# (pickup_date, pickup_hour, source_file) stratum and writes them to
+# <output>/sample/trip_sample-<data version>.csv before it publishes that
+# version, so a reader keyed on a version reads the sample of that version
+# (the newest KEEP_SAMPLES are kept). Which trips are
+# kept is decided by a priority hashed from the trip itself (pickup time and
+# file), not by a random draw, so the sample is the same on every run and every
+# dashboard rerun.
+#
+# Each kept trip also records how many trips of its stratum it stands for.
+# representative_sample() gives every row of the (already filtered) reservoir
+# a share of the draw in proportion to those weights, so a fixed-size sample
+# matches the hour, day and file mix of the filtered trips. Its cost depends
+# on the number of strata, not on the number of trips. The draw orders rows by
+# a second hash, not by the priority: the kept rows are the lowest priorities
+# of their stratum, and the busier the stratum the lower they are, so reusing
+# them would skew the draw by stratum size.
+import os
+
+import numpy as np
+import pandas as pd
+
+from uber_config import output_path
+
+SAMPLE_DIR = output_path("sample")
+SAMPLE_FILE = os.path.join(SAMPLE_DIR, "trip_sample.csv")
+KEEP_SAMPLES = 3
+STRATA = ['pickup_date', 'pickup_hour', 'source_file']
+PER_STRATUM = int(os.environ.get("UBER_SAMPLE_PER_STRATUM", "10"))
+DRAW_ORDER = ['pickup_hour', 'pickup_date']  # rows are drawn in this order
+DRAW_HASH_KEY = "uber-sample-draw"  # 16 characters, as hash_array requires
+
+
+def sample_priority(df):
+    """Deterministic priority in (0, 1) for every row, hashed from the trip keys"""
+    keys = [col for col in ('pickup_datetime', 'source_file') if col in df.columns]
+    if keys:
+        # Number repeated keys so that every row gets its own priority
+        key_frame = df[keys].assign(_n=df.groupby(keys, sort=False, dropna=False).cumcount())
+    else:
+        key_frame = pd.DataFrame({'_n': np.arange(len(df))})
+    hashed = pd.util.hash_pandas_object(key_frame, index=False).to_numpy(dtype=np.uint64)
+    # Top 53 bits, so the value is exact as a float
+    return ((hashed >> np.uint64(11)).astype(np.float64) + 0.5) / 2.0**53
+
+
+def build_sample(df, per_stratum=PER_STRATUM):
+    """Keep the per_stratum lowest-priority rows of each stratum.
+
+    Adds _priority and _weight (trips in the stratum / trips kept from it).
+    """
+    strata = [col for col in STRATA if col in df.columns]
+    priority = sample_priority(df)
+    order = np.argsort(priority, kind="stable")
+
+    # Rank within the stratum on the key columns only, then take the kept rows
+    if strata:
+        groups = df[strata].iloc[order].groupby(strata, sort=False, dropna=False, observed=True)
+        rank = groups.cumcount().to_numpy()
+        group = groups.ngroup().to_numpy()
+        size = np.bincount(group)[group]
+    else:
+        rank = np.arange(len(df))
+        size = np.full(len(df), len(df))
+
+    keep = rank < per_stratum
+    rows = order[keep]
+    return df.iloc[rows].assign(
+        _priority=priority[rows],
+        _weight=size[keep] / np.minimum(size[keep], per_stratum),
+    ).reset_index(drop=True)
+
+
+def sample_path(version=None, sample_dir=SAMPLE_DIR):
+    """Sample file of a data version (trip_sample.csv without a version)"""
+    if version is None:
+        return os.path.join(sample_dir, os.path.basename(SAMPLE_FILE))
+    return os.path.join(sample_dir, f"trip_sample-{version}.csv")
+
+
+def write_sample(df, version=None, per_stratum=PER_STRATUM, sample_dir=SAMPLE_DIR):
+    """Build the sample and write it atomically. Returns the number of rows kept."""
+    sample = build_sample(df, per_stratum)
+    path = sample_path(version, sample_dir)
+    os.makedirs(sample_dir, exist_ok=True)
+    tmp_path = path + ".tmp"
+    sample.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    _cleanup_old_samples(sample_dir, keep=KEEP_SAMPLES)
+    return len(sample)
+
+
+def _cleanup_old_samples(sample_dir, keep):
+    """Delete all but the newest `keep` versioned samples"""
+    versions = sorted(
+        (name[len("trip_sample-"):-len(".csv")] for name in os.listdir(sample_dir)
+         if name.startswith("trip_sample-") and name.endswith(".csv")),
+        key=lambda version: (len(version), version),
+    )
+    for version in versions[:-keep]:
+        try:
+            os.remove(sample_path(version, sample_dir))
+        except OSError:
+            pass
+
+
+def read_sample(version=None, sample_dir=SAMPLE_DIR):
+    """The sample written for version (FileNotFoundError if there is none)"""
+    return pd.read_csv(sample_path(version, sample_dir), low_memory=False)
+
+
+def _draw_numbers(priority):
+    """Uniform numbers in (0, 1) for the draw, independent of the priorities themselves"""
+    hashed = pd.util.hash_array(np.asarray(priority, dtype=np.float64), hash_key=DRAW_HASH_KEY)
+    return ((hashed >> np.uint64(11)).astype(np.float64) + 0.5) / 2.0**53
+
+
+def _inclusion_probabilities(weight, n):
+    """Per-row probabilities proportional to weight and summing to n.
+
+    Rows whose share would go over 1 are always taken and the rest of n is
+    spread over the other rows.
+    """
+    probability = np.ones(len(weight))
+    open_rows = np.ones(len(weight), dtype=bool)
+    remaining = n
+    while True:
+        scale = remaining / weight[open_rows].sum()
+        full = open_rows & (weight * scale >= 1)
+        if not full.any():
+            break
+        open_rows &= ~full
+        remaining -= int(full.sum())
+    probability[open_rows] = weight[open_rows] * scale
+    return probability
+
+
+def representative_sample(sample, n):
+    """n rows drawn from the reservoir rows in proportion to the trips they stand for.
+
+    Systematic sampling: rows are ordered by hour and date, then by a hash u
+    within those, and a row is taken every time the running total of the
+    inclusion probabilities passes a whole number. Each hour and date gets
+    its share of n up to rounding, and the same filters always give the same
+    rows. The helper columns are dropped.
+    """
+    if len(sample) > n:
+        u = _draw_numbers(sample['_priority'].to_numpy())
+        # Sort by hour and date, then by u: one float key, group number + u
+        stratum = np.zeros(len(sample), dtype=np.int64)
+        for col in DRAW_ORDER:
+            if col in sample.columns:
+                codes, uniques = pd.factorize(sample[col], use_na_sentinel=False)
+                stratum = stratum * len(uniques) + codes
+        order = np.argsort(stratum + u)
+        probability = _inclusion_probabilities(sample['_weight'].to_numpy(dtype=np.float64)[order], n)
+        steps = np.floor(np.cumsum(probability) + u[order[0]])
+        taken = np.diff(steps, prepend=0) > 0
+        sample = sample.iloc[order[taken]]
+    return sample.drop(columns=['_priority', '_weight'])
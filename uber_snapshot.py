@@ -0,0 +1,137 @@
+# uber_snapshot.py
+# Memory-mapped columnar snapshot of the transformed trips.
+#
+# The pipeline writes each snapshot as an uncompressed Arrow IPC (Feather v2)
+# file next to the CSV output. Uncompressed Arrow buffers can be mapped straight
+# from disk, so every dashboard process shares the same OS page cache instead
+# of parsing the CSV into a private copy.
+#
+# Publishing is atomic: the data goes into a new versioned file, then a small
+# CURRENT pointer file is swapped with os.replace(). Readers that already have
+# an older snapshot mapped keep using it until they reload, which also works on
+# Windows where a mapped file cannot be replaced in place.
+import os
+import time
+
+from uber_config import output_path
+
+SNAPSHOT_DIR = output_path("snapshot")
+POINTER_FILE = "CURRENT"
+KEEP_SNAPSHOTS = 3
+
+
+def _prepare_frame(df):
+    """Make object columns Arrow-friendly (strings, like a CSV reload)"""
+    out = df.copy(deep=False)
+    for col in out.columns:
+        if out[col].dtype == object:
+            values = out[col]
+            out[col] = values.where(values.isna(), values.astype(str))
+    return out
+
+
+def new_version():
+    """A new data version: nanosecond timestamp, unique and sortable"""
+    return str(time.time_ns())
+
+
+def current_version(snapshot_dir=SNAPSHOT_DIR):
+    """Return the published snapshot version, or None if nothing is published"""
+    pointer = os.path.join(snapshot_dir, POINTER_FILE)
+    try:
+        with open(pointer, "r", encoding="utf-8") as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return version or None
+
+
+def snapshot_path(version, snapshot_dir=SNAPSHOT_DIR):
+    return os.path.join(snapshot_dir, f"trips-{version}.arrow")
+
+
+def write_snapshot(df, snapshot_dir=SNAPSHOT_DIR, version=None):
+    """Write df as a new snapshot and atomically publish it. Returns the version.
+
+    Pass a version from new_version() to publish files written for it first.
+    """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    os.makedirs(snapshot_dir, exist_ok=True)
+
+    version = version or new_version()
+    final_path = snapshot_path(version, snapshot_dir)
+    tmp_path = final_path + ".tmp"
+
+    table = pa.Table.from_pandas(_prepare_frame(df), preserve_index=False)
+    # compression must stay off, otherwise buffers cannot be memory-mapped
+    feather.write_feather(table, tmp_path, compression="uncompressed")
+    os.replace(tmp_path, final_path)
+
+    _write_pointer(version, snapshot_dir)
+    _cleanup_old_snapshots(snapshot_dir, keep=KEEP_SNAPSHOTS)
+    return version
+
+
+def publish_version(snapshot_dir=SNAPSHOT_DIR, version=None):
+    """Bump the data version without writing a snapshot (when pyarrow is missing).
+
+    Readers keyed on current_version() still see the new data; load_snapshot()
+    returns None for this version, so the dashboard reads the CSV.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    version = version or new_version()
+    _write_pointer(version, snapshot_dir)
+    return version
+
+
+def _write_pointer(version, snapshot_dir):
+    pointer_tmp = os.path.join(snapshot_dir, POINTER_FILE + ".tmp")
+    with open(pointer_tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer_tmp, os.path.join(snapshot_dir, POINTER_FILE))
+
+
+def _cleanup_old_snapshots(snapshot_dir, keep):
+    """Delete all but the newest `keep` snapshots (skips files still in use)"""
+    snapshots = sorted(
+        f for f in os.listdir(snapshot_dir)
+        if f.startswith("trips-") and f.endswith(".arrow")
+    )
+    for name in snapshots[:-keep]:
+        try:
+            os.remove(os.path.join(snapshot_dir, name))
+        except OSError:
+            # Still mapped by a reader on Windows; try again next publish
+            pass
+
+
+def load_snapshot(version=None, snapshot_dir=SNAPSHOT_DIR):
+    """Map the snapshot and return it as a DataFrame (None if there is none).
+
+    Numeric and timestamp columns without nulls are wrapped zero-copy around
+    the mapped buffers. String columns become string[pyarrow] columns, which
+    also stay backed by the mapped buffers instead of Python str objects.
+    """
+    import pandas as pd
+    import pyarrow as pa
+
+    if version is None:
+        version = current_version(snapshot_dir)
+    if version is None:
+        return None
+
+    path = snapshot_path(version, snapshot_dir)
+    if not os.path.exists(path):
+        # Version published by publish_version(), without a snapshot file
+        return None
+    source = pa.memory_map(path, "r")
+    table = pa.ipc.open_file(source).read_all()
+    strings = pd.StringDtype("pyarrow")
+    return table.to_pandas(
+        split_blocks=True,
+        types_mapper=lambda arrow_type: strings if pa.types.is_string(arrow_type) else None,
+    )
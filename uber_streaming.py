@@ -0,0 +1,467 @@
+# uber_streaming.py
+# Streaming ingestion of live trip events.
+#
+# Events (one JSON object per trip, with the same columns as the CSV files,
+# e.g. DATE / TIME / PICK UP ADDRESS / BASE) are read from a pluggable source:
+#   - kafka:  a Kafka topic (kafka-python)
+#   - file:   a JSON-lines file that is tailed like `tail -f`
+#   - socket: line-delimited JSON over TCP (handy for local testing)
+#
+# Events are processed in micro-batches with the same logic as the batch
+# pipeline (pickup_datetime parsing, fingerprint dedup, derived time columns).
+# Sources hand over the raw lines; the processor decodes and type-checks them,
+# so a malformed event (bad JSON, or a field of the wrong type) is counted as
+# rejected (and logged) instead of stopping the stream. Pickup times are parsed
+# event by event with the batch pipeline's formats: an event's own
+# pickup_datetime is used when it has one, otherwise its DATE and TIME.
+# Rolling hourly / daily / weekday counts are kept in memory for a bounded
+# window and flushed incrementally to the SQLite rollup table and to the
+# dashboard's live cube file.
+#
+# Usage:
+#   python uber_streaming.py --source socket --port 9999
+#   python uber_streaming.py --source file --path ../data/live_events.jsonl
+#   python uber_streaming.py --source kafka --topic uber-trips --bootstrap localhost:9092
+import argparse
+import json
+import os
+import queue
+import socketserver
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+import numpy as np
+import pandas as pd
+
+from uber_backend import parse_pickup_datetime
+from uber_config import database_file, output_path
+from uber_dedup import fingerprint, keys_from_env
+from uber_transform_engine import DAY_NAMES, transform_frame
+
+DB_PATH = database_file()
+CUBE_PATH = output_path("cube", "live_counts.json")
+LATENCY_SAMPLES = 10_000  # latency percentiles cover the most recent events
+REJECT_LOG_LIMIT = 10
+TEXT_FIELDS = ["pickup_datetime", "DATE", "TIME", "PICK UP ADDRESS", "BASE"]
+
+
+def decode_event(raw):
+    """Parse one JSON event (str or bytes). Returns the event dict, or None if it is malformed."""
+    try:
+        event = json.loads(raw)
+    except ValueError:
+        # JSONDecodeError and UnicodeDecodeError are both ValueErrors
+        return None
+    return event if isinstance(event, dict) else None
+
+
+def coerce_event(event):
+    """Check the field types of a decoded event.
+
+    Returns the event with emitted_at as a float, or None if a text field is
+    not a string or emitted_at is not a number.
+    """
+    for field in TEXT_FIELDS:
+        if event.get(field) is not None and not isinstance(event[field], str):
+            return None
+    emitted = event.get("emitted_at")
+    if emitted is not None:
+        if isinstance(emitted, bool) or not isinstance(emitted, (int, float, str)):
+            return None
+        try:
+            event = {**event, "emitted_at": float(emitted)}
+        except ValueError:
+            return None
+    return event
+
+
+def pickup_datetimes(df):
+    """Parse each event's pickup_datetime, or its DATE and TIME when it has none"""
+    text = pd.Series(np.nan, index=df.index, dtype=object)
+    if 'pickup_datetime' in df.columns:
+        text = df['pickup_datetime'].astype(object)
+    if 'DATE' in df.columns and 'TIME' in df.columns:
+        text = text.where(text.notna(), df['DATE'].astype(object) + ' ' + df['TIME'].astype(object))
+    return parse_pickup_datetime(text)
+
+
+# ---------------------------------------------------------------------------
+# Sources: poll(max_records, timeout) -> list of raw events (JSON str/bytes)
+# ---------------------------------------------------------------------------
+
+class KafkaSource:
+    """Consume JSON trip events from a Kafka topic"""
+
+    def __init__(self, topic, bootstrap_servers="localhost:9092", group_id="uber-analytics"):
+        from kafka import KafkaConsumer
+
+        self.consumer = KafkaConsumer(
+            topic,
+            bootstrap_servers=bootstrap_servers,
+            group_id=group_id,
+            auto_offset_reset="latest",
+        )
+
+    def poll(self, max_records, timeout):
+        records = self.consumer.poll(timeout_ms=int(timeout * 1000), max_records=max_records)
+        return [message.value for messages in records.values() for message in messages]
+
+    def close(self):
+        self.consumer.close()
+
+
+class FileSource:
+    """Tail a JSON-lines file, picking up lines appended after the last poll"""
+
+    def __init__(self, path, from_start=False):
+        self.path = path
+        self.file = open(path, "r", encoding="utf-8")
+        if not from_start:
+            self.file.seek(0, os.SEEK_END)
+        self.partial = ""
+
+    def poll(self, max_records, timeout):
+        events = []
+        deadline = time.monotonic() + timeout
+        while len(events) < max_records:
+            line = self.file.readline()
+            if not line:
+                if events or time.monotonic() >= deadline:
+                    break
+                time.sleep(0.01)
+                continue
+            line = self.partial + line
+            if not line.endswith("\n"):
+                # Writer has not finished this line yet
+                self.partial = line
+                continue
+            self.partial = ""
+            if line.strip():
+                events.append(line)
+        return events
+
+    def close(self):
+        self.file.close()
+
+
+class SocketSource:
+    """Accept line-delimited JSON events over TCP (a local stand-in for Kafka)"""
+
+    def __init__(self, host="127.0.0.1", port=9999, max_buffered=100_000):
+        self.events = queue.Queue(maxsize=max_buffered)
+        events = self.events
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    if line.strip():
+                        events.put(line)
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self.server = socketserver.ThreadingTCPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.address = self.server.server_address
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def poll(self, max_records, timeout):
+        events = []
+        try:
+            events.append(self.events.get(timeout=timeout))
+            while len(events) < max_records:
+                events.append(self.events.get_nowait())
+        except queue.Empty:
+            pass
+        return events
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+# ---------------------------------------------------------------------------
+# Rolling counts
+# ---------------------------------------------------------------------------
+
+class RollingCounts:
+    """Hourly and daily trip counts for a bounded window of recent event time.
+
+    Buckets older than the window (relative to the newest event seen) are
+    evicted from memory. Every increment is also recorded as a pending delta
+    until the next flush, so nothing is lost in the persistent rollups.
+    """
+
+    def __init__(self, window_hours=48, window_days=14):
+        self.window_hours = window_hours
+        self.window_days = window_days
+        self.hourly = Counter()
+        self.daily = Counter()
+        self.pending = Counter()
+        self.newest = None
+
+    def add(self, df):
+        """Count a transformed micro-batch"""
+        hours = df['pickup_datetime'].dt.floor('h').value_counts()
+        days = df['pickup_date'].value_counts()
+        weekdays = df['pickup_day_of_week'].value_counts()
+
+        for bucket, count in hours.items():
+            self.hourly[bucket] += int(count)
+            self.pending[("hour", bucket.strftime("%Y-%m-%d %H:00"))] += int(count)
+        for bucket, count in days.items():
+            self.daily[bucket] += int(count)
+            self.pending[("day", pd.Timestamp(bucket).strftime("%Y-%m-%d"))] += int(count)
+        for name, count in weekdays.items():
+            if count:
+                self.pending[("weekday", str(name))] += int(count)
+
+        newest = df['pickup_datetime'].max()
+        if self.newest is None or newest > self.newest:
+            self.newest = newest
+        self._evict()
+
+    def _evict(self):
+        hour_cutoff = self.newest.floor('h') - pd.Timedelta(hours=self.window_hours)
+        day_cutoff = self.newest.normalize() - pd.Timedelta(days=self.window_days)
+        for bucket in [b for b in self.hourly if b <= hour_cutoff]:
+            del self.hourly[bucket]
+        for bucket in [b for b in self.daily if pd.Timestamp(b) <= day_cutoff]:
+            del self.daily[bucket]
+
+    def weekday_counts(self):
+        """Trips per weekday over the days still in the window"""
+        counts = dict.fromkeys(DAY_NAMES, 0)
+        for bucket, count in self.daily.items():
+            counts[DAY_NAMES[pd.Timestamp(bucket).dayofweek]] += count
+        return counts
+
+    def take_pending(self):
+        pending, self.pending = self.pending, Counter()
+        return pending
+
+
+# ---------------------------------------------------------------------------
+# Sinks
+# ---------------------------------------------------------------------------
+
+def ensure_rollup_table(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS stream_rollups (
+        granularity TEXT NOT NULL,
+        bucket TEXT NOT NULL,
+        trips INTEGER NOT NULL,
+        updated_at REAL,
+        PRIMARY KEY (granularity, bucket)
+    )
+    """)
+
+
+def flush_rollups(conn, pending):
+    """Add the pending deltas to the SQLite rollups (one transaction)"""
+    now = time.time()
+    rows = [(granularity, bucket, count, now) for (granularity, bucket), count in pending.items()]
+    with conn:
+        conn.executemany("""
+        INSERT INTO stream_rollups (granularity, bucket, trips, updated_at)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (granularity, bucket)
+        DO UPDATE SET trips = trips + excluded.trips, updated_at = excluded.updated_at
+        """, rows)
+
+
+def write_cube(counts, path, stats):
+    """Atomically write the in-memory window for the dashboard"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    cube = {
+        "flushed_at": time.time(),
+        "newest_event": counts.newest.isoformat() if counts.newest is not None else None,
+        "hourly": {b.strftime("%Y-%m-%d %H:00"): c for b, c in sorted(counts.hourly.items())},
+        "daily": {pd.Timestamp(b).strftime("%Y-%m-%d"): c for b, c in sorted(counts.daily.items())},
+        "weekday": counts.weekday_counts(),
+        "stats": stats,
+    }
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cube, f)
+    os.replace(tmp_path, path)
+
+
+# ---------------------------------------------------------------------------
+# Stream processor
+# ---------------------------------------------------------------------------
+
+class StreamProcessor:
+    """Micro-batch events through cleaning + transformation and keep rolling counts"""
+
+    def __init__(self, db_path=DB_PATH, cube_path=CUBE_PATH, window_hours=48,
+                 window_days=14, dedup_keys=None):
+        self.counts = RollingCounts(window_hours, window_days)
+        self.dedup_keys = dedup_keys or keys_from_env()
+        self.seen = {}  # fingerprint -> hour bucket, bounded by the window
+        self.seen_cutoff = None
+        self.cube_path = cube_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        # The processor may be driven from a worker thread (see uber_benchmark.py)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        ensure_rollup_table(self.conn)
+
+        self.events_in = 0
+        self.trips_counted = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.rejected = 0
+        self.started = time.monotonic()
+        self.pending_emitted = []
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def _decode(self, events):
+        """Event dicts from raw JSON lines; malformed ones are counted and dropped"""
+        decoded = []
+        for raw in events:
+            event = raw if isinstance(raw, dict) else decode_event(raw)
+            if event is not None:
+                event = coerce_event(event)
+            if event is not None:
+                decoded.append(event)
+                continue
+            self.rejected += 1
+            if self.rejected <= REJECT_LOG_LIMIT:
+                text = raw.decode("utf-8", "replace") if isinstance(raw, bytes) else str(raw)
+                print(f"⚠️  Rejected malformed event: {text.strip()[:200]!r}")
+                if self.rejected == REJECT_LOG_LIMIT:
+                    print("⚠️  Not logging further rejected events (see 'rejected' in the stats)")
+        return decoded
+
+    def process(self, events):
+        """Clean, transform and count one micro-batch of events (dicts or raw JSON lines)"""
+        if not events:
+            return
+        self.events_in += len(events)
+        events = self._decode(events)
+        if not events:
+            return
+        df = pd.DataFrame.from_records(events)
+        if "emitted_at" in df.columns:
+            self.pending_emitted.append(df["emitted_at"].to_numpy(dtype=float))
+            df = df.drop(columns=["emitted_at"])
+
+        # Same steps as data_cleaning.py / data_transformation.py
+        df['pickup_datetime'] = pickup_datetimes(df)
+        df = transform_frame(df)
+        valid = df['pickup_datetime'].notna()
+        self.invalid += int((~valid).sum())
+        df = df[valid]
+
+        fps = fingerprint(df, self.dedup_keys)
+        _, first = np.unique(fps, return_index=True)
+        keep = np.zeros(len(df), dtype=bool)
+        keep[first] = True
+        keep &= np.array([fp not in self.seen for fp in fps.tolist()], dtype=bool)
+        self.duplicates += int(len(df) - keep.sum())
+        df = df[keep]
+        hours = df['pickup_datetime'].dt.floor('h')
+        self.seen.update(zip(fps[keep].tolist(), hours))
+
+        if len(df):
+            self.counts.add(df)
+            self.trips_counted += len(df)
+            # Forget fingerprints once their hour has left the window
+            cutoff = self.counts.newest.floor('h') - pd.Timedelta(hours=self.counts.window_hours)
+            if self.seen_cutoff is None or cutoff > self.seen_cutoff:
+                self.seen = {fp: h for fp, h in self.seen.items() if h > cutoff}
+                self.seen_cutoff = cutoff
+
+    def flush(self):
+        """Write pending deltas to SQLite and the live cube"""
+        pending = self.counts.take_pending()
+        if pending:
+            flush_rollups(self.conn, pending)
+        flushed_at = time.time()
+        if self.pending_emitted:
+            emitted = np.concatenate(self.pending_emitted)
+            emitted = emitted[~np.isnan(emitted)]  # events sent without emitted_at
+            self.latencies.extend((flushed_at - emitted).tolist())
+            self.pending_emitted = []
+        write_cube(self.counts, self.cube_path, self.stats())
+
+    def stats(self):
+        elapsed = time.monotonic() - self.started
+        stats = {
+            "events": self.events_in,
+            "trips_counted": self.trips_counted,
+            "duplicates": self.duplicates,
+            "invalid": self.invalid,
+            "rejected": self.rejected,
+            "events_per_sec": self.events_in / elapsed if elapsed else 0.0,
+        }
+        if self.latencies:
+            latencies = np.fromiter(self.latencies, dtype=float, count=len(self.latencies))
+            stats["latency_p50_ms"] = float(np.percentile(latencies, 50) * 1000)
+            stats["latency_p99_ms"] = float(np.percentile(latencies, 99) * 1000)
+        return stats
+
+    def close(self):
+        self.conn.close()
+
+
+def run_stream(source, processor, batch_size=5000, batch_timeout=0.2,
+               flush_interval=1.0, stop=None, max_events=None):
+    """Poll the source until stop is set (or max_events is reached)"""
+    last_flush = time.monotonic()
+    try:
+        while not (stop is not None and stop.is_set()):
+            processor.process(source.poll(batch_size, batch_timeout))
+            if time.monotonic() - last_flush >= flush_interval:
+                processor.flush()
+                last_flush = time.monotonic()
+            if max_events is not None and processor.events_in >= max_events:
+                break
+    finally:
+        processor.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream live trip events into rolling counts")
+    parser.add_argument("--source", choices=["kafka", "file", "socket"], default="socket")
+    parser.add_argument("--topic", default="uber-trips")
+    parser.add_argument("--bootstrap", default="localhost:9092")
+    parser.add_argument("--path", help="JSON-lines file for --source file")
+    parser.add_argument("--from-start", action="store_true", help="read the file from the beginning")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9999)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--flush-interval", type=float, default=1.0)
+    parser.add_argument("--window-hours", type=int, default=48)
+    parser.add_argument("--window-days", type=int, default=14)
+    args = parser.parse_args()
+
+    print("Starting uber_streaming.py...")
+    if args.source == "kafka":
+        source = KafkaSource(args.topic, args.bootstrap)
+        print(f"✅ Consuming Kafka topic '{args.topic}' from {args.bootstrap}")
+    elif args.source == "file":
+        if not args.path:
+            print("ERROR: --path is required for --source file")
+            sys.exit(1)
+        source = FileSource(args.path, from_start=args.from_start)
+        print(f"✅ Tailing {args.path}")
+    else:
+        source = SocketSource(args.host, args.port)
+        print(f"✅ Listening for JSON lines on {args.host}:{args.port}")
+
+    processor = StreamProcessor(window_hours=args.window_hours, window_days=args.window_days)
+    print("Press Ctrl+C to stop.")
+    try:
+        run_stream(source, processor, batch_size=args.batch_size, flush_interval=args.flush_interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        source.close()
+        processor.close()
+        print(f"\n✅ Stream stopped: {processor.stats()}")
+
+
+if __name__ == "__main__":
+    main()
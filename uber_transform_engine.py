@@ -0,0 +1,217 @@
+# uber_transform_engine.py
+# Partitioned transformation engine used by data_transformation.py.
+#
+# The frame is split into partitions (one per source_file, or one per month)
+# and each partition is transformed in its own worker process. Workers parse
+# pickup_datetime, derive the time columns and write their own CSV part, so
+# both the datetime parsing and the (slow) CSV formatting run in parallel.
+#
+# The time columns are computed with integer arithmetic on the datetime64
+# values instead of the .dt accessors, and the weekday comes out as a
+# categorical (small integer codes) instead of one Python string per row.
+#
+# Every partition gets the same dtypes (pickup_hour and pickup_month are
+# nullable integers even when a partition has invalid times), so the parts
+# format numbers the same way and their concatenation is byte-identical to
+# transforming the whole frame at once. Pool workers hand their frame back as
+# an Arrow file next to the CSV part rather than pickling it through the result
+# pipe (Arrow buffers need no per-object serialisation); without pyarrow they
+# pickle it.
+import datetime
+import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from uber_config import output_path
+
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+PARTITION_DIR = output_path("partitions", "transformed")
+
+NS_PER_HOUR = 3600 * 10**9
+NS_PER_DAY = 24 * NS_PER_HOUR
+
+
+def _month_from_days(days):
+    """Month (1-12) of days since 1970-01-01 (Howard Hinnant's civil_from_days)"""
+    z = days + 719468
+    era = np.floor_divide(z, 146097)
+    doe = z - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    return np.where(mp < 10, mp + 3, mp - 9)
+
+
+def derive_time_columns(pickup):
+    """Return pickup_date, pickup_hour, pickup_day_of_week and pickup_month for a datetime Series"""
+    values = pickup.to_numpy(dtype="datetime64[ns]")
+    valid = ~np.isnat(values)
+    ns = values.view(np.int64)
+    days = np.floor_divide(ns, NS_PER_DAY)
+
+    hour = (ns - days * NS_PER_DAY) // NS_PER_HOUR
+    weekday = (days + 3) % 7  # 1970-01-01 was a Thursday
+    month = _month_from_days(days)
+
+    # Date objects like .dt.date, but one object per distinct day, not per row
+    unique_days, day_codes = np.unique(np.where(valid, days, 0), return_inverse=True)
+    epoch = datetime.date(1970, 1, 1)
+    day_objects = np.array([epoch + datetime.timedelta(days=int(d)) for d in unique_days] + [None],
+                           dtype=object)
+    pickup_date = day_objects[np.where(valid, day_codes.ravel(), len(unique_days))]
+    weekday_codes = np.where(valid, weekday, -1).astype(np.int8)
+
+    hour = hour.astype(np.int8)
+    month = month.astype(np.int8)
+    if not valid.all():
+        # Nullable, so that a partition with invalid times still writes 5, not 5.0
+        hour = pd.arrays.IntegerArray(hour, ~valid)
+        month = pd.arrays.IntegerArray(month, ~valid)
+
+    return {
+        'pickup_date': pd.Series(pickup_date, index=pickup.index),
+        'pickup_hour': pd.Series(hour, index=pickup.index),
+        'pickup_day_of_week': pd.Series(
+            pd.Categorical.from_codes(weekday_codes, categories=DAY_NAMES),
+            index=pickup.index,
+        ),
+        'pickup_month': pd.Series(month, index=pickup.index),
+    }
+
+
+def ensure_pickup_datetime(df):
+    """Parse or build pickup_datetime the same way the transformation step always has"""
+    if 'pickup_datetime' in df.columns:
+        df['pickup_datetime'] = pd.to_datetime(df['pickup_datetime'], errors='coerce')
+    elif 'DATE' in df.columns and 'TIME' in df.columns:
+        df['pickup_datetime'] = pd.to_datetime(df['DATE'] + ' ' + df['TIME'], errors='coerce')
+    else:
+        df['pickup_datetime'] = pd.NaT
+    return df
+
+
+def transform_frame(df):
+    """Add the derived columns to df (in place) and return it"""
+    df = ensure_pickup_datetime(df)
+
+    # Since there is no dropoff time in the data, create placeholder columns
+    df['dropoff_datetime'] = pd.NaT
+    df['trip_duration_mins'] = None
+
+    # Always add the time columns so every partition has the same schema
+    for col, values in derive_time_columns(df['pickup_datetime']).items():
+        df[col] = values
+    return df
+
+
+def _safe_name(key):
+    return re.sub(r'[^A-Za-z0-9._-]+', '_', str(key)).strip('_') or 'partition'
+
+
+def _write_arrow_part(frame, path):
+    """Write frame as an uncompressed Arrow file. Returns False if that is not possible."""
+    try:
+        import pyarrow as pa
+        import pyarrow.feather as feather
+
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+    except (ImportError, TypeError, ValueError):
+        # No pyarrow, or a column Arrow cannot hold as it is (mixed types)
+        return False
+    feather.write_feather(table, path, compression="uncompressed")
+    return True
+
+
+def _read_arrow_part(path):
+    import pyarrow.feather as feather
+
+    # Not memory-mapped, so the file can be deleted right away (also on Windows)
+    frame = feather.read_table(path, memory_map=False).to_pandas()
+    os.remove(path)
+    return frame
+
+
+def write_csv(frame, path):
+    """Write frame like frame.to_csv(path, index=False), only faster.
+
+    pandas formats categoricals and all-NaT datetime columns slowly, so those
+    are handed to it as plain objects (same text in the file).
+    """
+    out = frame.copy(deep=False)
+    for col in out.columns:
+        column = out[col]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            out[col] = column.astype(object)
+        elif pd.api.types.is_datetime64_any_dtype(column) and column.isna().all():
+            out[col] = np.full(len(out), None, dtype=object)
+    out.to_csv(path, index=False)
+
+
+def _transform_partition(task):
+    """Worker: transform one partition and write its CSV part"""
+    index, key, part, out_dir, in_process = task
+    part = transform_frame(part)
+    path = os.path.join(out_dir, f"part-{index:05d}-{_safe_name(key)}.csv")
+    write_csv(part, path)
+    if in_process:
+        return key, path, part
+    # Pool worker: hand the frame back through a file instead of the pipe
+    arrow_path = path[:-len(".csv")] + ".arrow"
+    if _write_arrow_part(part, arrow_path):
+        return key, path, arrow_path
+    return key, path, part
+
+
+def split_partitions(df, by="source_file"):
+    """Split df into (key, frame) partitions by source_file or by pickup month"""
+    if by == "source_file" and 'source_file' in df.columns:
+        keys = df['source_file'].astype(str)
+    elif by == "month":
+        df = ensure_pickup_datetime(df)
+        keys = df['pickup_datetime'].dt.strftime('%Y-%m').fillna('unknown')
+    else:
+        return [("all", df)]
+    return [(key, part) for key, part in df.groupby(keys, sort=True, observed=True)]
+
+
+def run_partitioned(df, by="source_file", workers=None, out_dir=PARTITION_DIR):
+    """Transform df partition by partition across a process pool.
+
+    Returns a list of (key, part_path, transformed_frame) in partition order.
+    Old parts in out_dir are removed first so the directory always matches
+    the latest run.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    for name in os.listdir(out_dir):
+        if name.startswith("part-") and name.endswith((".csv", ".arrow")):
+            os.remove(os.path.join(out_dir, name))
+
+    partitions = split_partitions(df, by)
+    workers = min(workers or os.cpu_count() or 1, len(partitions))
+    tasks = [(i, key, part, out_dir, workers <= 1) for i, (key, part) in enumerate(partitions)]
+
+    if workers <= 1:
+        return [_transform_partition(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_transform_partition, tasks))
+    return [
+        (key, path, _read_arrow_part(part) if isinstance(part, str) else part)
+        for key, path, part in results
+    ]
+
+
+def combine_parts(part_paths, output_file):
+    """Concatenate CSV parts into one file, keeping only the first header"""
+    tmp_file = output_file + ".tmp"
+    with open(tmp_file, "wb") as out:
+        for i, path in enumerate(part_paths):
+            with open(path, "rb") as part:
+                header = part.readline()
+                if i == 0:
+                    out.write(header)
+                shutil.copyfileobj(part, out, length=1024 * 1024)
+    os.replace(tmp_file, output_file)
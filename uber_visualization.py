@@ -1,33 +1,47 @@
 # uber_visualization.py
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-
-# Load transformed data from output folder
-df = pd.read_csv("../output/transformed_uber_data.csv")
-
-# Trips by hour
-df['hour'] = pd.to_datetime(df['pickup_datetime']).dt.hour
-plt.figure(figsize=(10, 6))
-sns.countplot(x='hour', data=df, palette="viridis")
-plt.title("Number of Trips by Hour")
-plt.xlabel("Hour of Day")
-plt.ylabel("Trip Count")
-plt.savefig("../output/trips_by_hour.png")
-plt.close()
-
-# Trips by weekday
-df['weekday'] = pd.to_datetime(df['pickup_datetime']).dt.day_name()
-plt.figure(figsize=(10, 6))
-sns.countplot(
-    x='weekday',
-    data=df,
-    order=['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-)
-plt.title("Number of Trips by Weekday")
-plt.xlabel("Weekday")
-plt.ylabel("Trip Count")
-plt.savefig("../output/trips_by_weekday.png")
-plt.close()
-
-print("✅ Charts saved in output folder.")
+import os
+import uber_config
+
+
+def make_charts(input_file=None, output_dir=None):
+    """Save the trips-by-hour and trips-by-weekday charts. Returns the chart paths."""
+    import pandas as pd
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    output_dir = output_dir or uber_config.output_dir()
+    charts = [os.path.join(output_dir, "trips_by_hour.png"), os.path.join(output_dir, "trips_by_weekday.png")]
+
+    # Load transformed data from output folder
+    df = pd.read_csv(input_file or uber_config.transformed_file())
+
+    # Trips by hour
+    df['hour'] = pd.to_datetime(df['pickup_datetime']).dt.hour
+    plt.figure(figsize=(10, 6))
+    sns.countplot(x='hour', data=df, palette="viridis")
+    plt.title("Number of Trips by Hour")
+    plt.xlabel("Hour of Day")
+    plt.ylabel("Trip Count")
+    plt.savefig(charts[0])
+    plt.close()
+
+    # Trips by weekday
+    df['weekday'] = pd.to_datetime(df['pickup_datetime']).dt.day_name()
+    plt.figure(figsize=(10, 6))
+    sns.countplot(
+        x='weekday',
+        data=df,
+        order=['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+    )
+    plt.title("Number of Trips by Weekday")
+    plt.xlabel("Weekday")
+    plt.ylabel("Trip Count")
+    plt.savefig(charts[1])
+    plt.close()
+
+    print("✅ Charts saved in output folder.")
+    return charts
+
+
+if __name__ == "__main__":
+    make_charts()
@@ -0,0 +1,260 @@
+# uber_warmup.py
+# On-disk cache of the dashboard's aggregates, warmed up in the background
+# when data_transformation.py publishes new data.
+#
+# Every filter state of the dashboard (ride types, start and end hour) maps to
+# one payload: the key metrics, the hour/weekday/ride type counts, the duration
+# statistics and the correlation matrix. Payloads are pickled under
+# <output>/cache/<data version>/, so they are shared by every dashboard session
+# and process, and a new version never sees old results.
+#
+# Single flight: the first session that needs a payload creates a .lock file
+# (O_EXCL) and computes it; other sessions and the warm-up worker wait for the
+# result instead of doing the same groupbys again. A lock older than
+# LOCK_TIMEOUT is treated as left behind by a crashed process and broken.
+# Each lock holds a unique token, and a lock is only removed (released or
+# broken) while it still holds the token that was read, so a slow holder never
+# removes the lock of the caller that took over from it.
+#
+# After publishing, data_transformation.py calls start_warmup(), which runs
+# this file as a detached process that loads the trips once and fills the
+# cache for the PRESETS, so the first visitor finds the default view ready.
+# Set UBER_WARMUP=0 to skip the worker.
+#
+# Usage:
+#   python uber_warmup.py [--version VERSION]
+import argparse
+import hashlib
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from uber_config import output_path, transformed_file
+from uber_snapshot import current_version, load_snapshot
+
+CACHE_DIR = output_path("cache")
+KEEP_VERSIONS = 3
+LOCK_TIMEOUT = 300  # seconds
+POLL_SECONDS = 0.05
+
+# Hour ranges warmed up for every version (all ride types); "All day" is the
+# dashboard's default view
+PRESETS = {
+    "All day": (0, 23),
+    "Morning rush": (6, 9),
+    "Evening rush": (16, 19),
+    "Night": (0, 5),
+}
+
+
+def load_trips(version=None):
+    """Transformed trips as the dashboard sees them (snapshot, else the CSV)"""
+    df = None
+    if version is not None:
+        # Map the published snapshot instead of parsing the CSV
+        try:
+            df = load_snapshot(version)
+        except ImportError:
+            df = None
+    if df is None:
+        df = pd.read_csv(transformed_file())
+
+    # Handle duplicate columns with a simpler approach
+    cols = df.columns.tolist()
+    seen = {}
+    for i, col in enumerate(cols):
+        if col in seen:
+            seen[col] += 1
+            cols[i] = f"{col}_{seen[col]}"
+        else:
+            seen[col] = 0
+    df.columns = cols
+    return df
+
+
+def filter_trips(frame, ride_types, start_hour, end_hour):
+    """The dashboard filters: ride types (all if empty) and an hour range"""
+    mask = pd.Series(True, index=frame.index)
+
+    if 'ride_type' in frame.columns and ride_types:
+        mask &= frame['ride_type'].isin(ride_types)
+
+    if 'pickup_hour' in frame.columns:
+        mask &= (frame['pickup_hour'] >= start_hour) & (frame['pickup_hour'] <= end_hour)
+    # Only the kept rows are copied (none when nothing is filtered out)
+    return frame if mask.all() else frame[mask]
+
+
+def view_payload(filtered_df):
+    """Aggregates behind the dashboard's metrics and charts for one filtered view"""
+    payload = {"rows": len(filtered_df)}
+
+    if 'trip_duration_mins' in filtered_df.columns:
+        payload["avg_duration"] = filtered_df['trip_duration_mins'].mean()
+    if 'fare_amount' in filtered_df.columns:
+        payload["total_revenue"] = filtered_df['fare_amount'].sum()
+
+    if 'pickup_hour' in filtered_df.columns:
+        by_hour = filtered_df.groupby('pickup_hour').size()
+        payload["trips_by_hour"] = by_hour.reset_index(name='trip_count')
+        payload["peak_hour"] = by_hour.idxmax() if not by_hour.empty else None
+    if 'pickup_day_of_week' in filtered_df.columns:
+        payload["trips_by_weekday"] = filtered_df.groupby('pickup_day_of_week').size().reset_index(name='trip_count')
+    if 'ride_type' in filtered_df.columns:
+        payload["ride_type_counts"] = filtered_df['ride_type'].value_counts()
+        if 'trip_duration_mins' in filtered_df.columns:
+            payload["ride_type_stats"] = filtered_df.groupby('ride_type')['trip_duration_mins'].agg([
+                'count', 'mean', 'median', 'std'
+            ]).round(2)
+
+    numeric_cols = filtered_df.select_dtypes(include=[np.number]).columns
+    if len(numeric_cols) > 1:
+        payload["corr_matrix"] = filtered_df[numeric_cols].corr()
+    return payload
+
+
+def view_key(ride_types, start_hour, end_hour):
+    """Cache key of a filter state; None ride types means all of them"""
+    ride_part = "all" if ride_types is None else ",".join(sorted(map(str, ride_types)))
+    return f"view:{ride_part}:{int(start_hour)}-{int(end_hour)}"
+
+
+def _cache_path(version, key, cache_dir):
+    name = hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+    return os.path.join(cache_dir, str(version), f"{name}.pkl")
+
+
+def _read(path):
+    try:
+        with open(path, "rb") as f:
+            return True, pickle.load(f)
+    except FileNotFoundError:
+        return False, None
+
+
+def _lock_token(lock_path):
+    try:
+        with open(lock_path, encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _remove_lock(lock_path, token):
+    """Remove the lock if it still holds token (it may be gone or taken over)"""
+    if _lock_token(lock_path) != token:
+        return
+    try:
+        os.remove(lock_path)
+    except FileNotFoundError:
+        pass
+
+
+def cached(version, key, compute, cache_dir=CACHE_DIR):
+    """Return the cached value for (version, key), computing it at most once.
+
+    Concurrent callers (threads or processes) wait for the one that holds the
+    lock rather than calling compute() themselves.
+    """
+    path = _cache_path(version, key, cache_dir)
+    lock_path = path[:-len(".pkl")] + ".lock"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    while True:
+        found, value = _read(path)
+        if found:
+            return value
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            token = _lock_token(lock_path)
+            try:
+                if token is not None and time.time() - os.path.getmtime(lock_path) > LOCK_TIMEOUT:
+                    _remove_lock(lock_path, token)
+            except OSError:
+                pass  # released (or broken) meanwhile
+            time.sleep(POLL_SECONDS)
+            continue
+
+        token = f"{os.getpid()}-{uuid.uuid4().hex}"
+        try:
+            try:
+                os.write(fd, token.encode("utf-8"))
+            finally:
+                os.close(fd)
+            # Another caller may have finished between our read and the lock
+            found, value = _read(path)
+            if not found:
+                value = compute()
+                tmp_path = f"{path}.{token}.tmp"
+                with open(tmp_path, "wb") as f:
+                    pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, path)
+            return value
+        finally:
+            _remove_lock(lock_path, token)
+
+
+def cleanup_old_versions(cache_dir=CACHE_DIR, keep=KEEP_VERSIONS):
+    """Delete the cache folders of all but the newest `keep` versions"""
+    if not os.path.isdir(cache_dir):
+        return
+    versions = sorted(
+        (name for name in os.listdir(cache_dir) if os.path.isdir(os.path.join(cache_dir, name))),
+        key=lambda name: (len(name), name),
+    )
+    for name in versions[:-keep]:
+        shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+
+
+def warm_up(version=None, cache_dir=CACHE_DIR):
+    """Fill the cache with the PRESETS views. Returns the number of payloads."""
+    version = version or current_version()
+    if version is None:
+        return 0
+    df = load_trips(version)
+    for start_hour, end_hour in PRESETS.values():
+        key = view_key(None, start_hour, end_hour)
+        cached(version, key, lambda: view_payload(filter_trips(df, None, start_hour, end_hour)), cache_dir)
+    cleanup_old_versions(cache_dir)
+    return len(PRESETS)
+
+
+def start_warmup(version, cache_dir=CACHE_DIR):
+    """Run warm_up() for version in a detached process. Returns the process (None if disabled)."""
+    if os.environ.get("UBER_WARMUP", "1") == "0":
+        return None
+    os.makedirs(os.path.join(cache_dir, str(version)), exist_ok=True)
+    log = open(os.path.join(cache_dir, str(version), "warmup.log"), "ab")
+    kwargs = {}
+    if os.name == "nt":
+        kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP | subprocess.DETACHED_PROCESS
+    else:
+        kwargs["start_new_session"] = True
+    try:
+        # Paths come from the environment (UBER_OUTPUT_DIR), which is inherited
+        return subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--version", str(version)],
+            stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT, **kwargs,
+        )
+    finally:
+        log.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute the dashboard views for a data version")
+    parser.add_argument("--version", help="data version (default: the published one)")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    count = warm_up(args.version)
+    if count == 0:
+        print("❌ No data version published yet, run data_transformation.py first")
+        sys.exit(1)
+    print(f"✅ Warmed up {count} dashboard views in {time.perf_counter() - start:.1f}s")